@@ -1,117 +1,607 @@
-import requests
+import hashlib
+import math
+import json
+import operator
+import tempfile
+import time
 from werkzeug.utils import secure_filename
 import os
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-from textblob import TextBlob
-import spacy
-from docx import Document as DocxDocument
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
 from flask_migrate import Migrate
 from flask_cors import CORS
 from config import Config
-from models import db, Document, Paragraph, Sentence, Keyword, User
-from openai import OpenAI
+from models import (db, utcnow, Document, Paragraph, Sentence, Keyword, User, IngestionJob, ChunkSummary,
+                    KeywordPosting, UploadSession, PARAGRAPH_SEPARATOR)
+from llm_cache import LLMCache, cache_key
+from keyword_index import (index_document_terms, normalize_term, rebuild_keyword_index, search_documents,
+                           sentence_postings, top_document_terms, update_document_terms)
+from uploads import (ChunkTooLarge, OffsetMismatch, UploadGone, create_upload, discard_upload, expire_uploads,
+                     hold_upload, partial_path, release_upload, upload_digest, write_chunk)
+from pagination import KeysetPage, decode_keyset_cursor, encode_keyset_cursor
+from fulltext import (create_fulltext_tables, include_in_migrations, index_spans, rebuild_fulltext_index,
+                      search_fulltext)
+from search_client import SearchClient, SearchError
+from semantic import SemanticIndex
+from spans import DocumentTexts, sentence_spans
+from streams import StreamRegistry
+from summarizer import MapReduceSummarizer, chunk_paragraphs
+from jobs import (JOB_FAILED, JOB_QUEUED, JOB_RUNNING, enqueue_job, claim_next_job, claimed_job, finish_job, fail_job,
+                  keep_lease, mean_job_seconds, pending_update, queued_job_counts, record_duplicate_job, renew_lease)
+from ingestion import (aggregate_sentiment, analyze_file, analyze_paragraphs, analyze_sentiment, analyze_text,
+                       extract_keywords, extract_text, extract_text_from_docx, extract_text_from_image,
+                       extract_text_from_pdf, extract_text_from_txt, init_worker, iter_text, paragraph_hash,
+                       paragraph_rows, split_into_paragraphs, score_sentiment, split_into_sentences, spool_analysis,
+                       ExtractionReport, Sentiment, StageTimer)
+from ingestion import warm_up as warm_up_ingestion
+from metrics import (CONTENT_TYPE, errors, http_request_seconds, ingest_job_seconds, ingest_jobs, ingest_queue_depth,
+                     ingest_queue_oldest_age, ingest_queue_wait_seconds, ingest_stage_seconds,
+                     ingest_worker_busy_seconds, ingest_workers, ingest_workers_busy, registry, track_external,
+                     track_worker)
 from flask import request
 
+import multiprocessing
 import threading
-from queue import Queue
-from flask import Flask, redirect, url_for, flash, jsonify, session
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from queue import Queue, Empty, Full
+from flask import Flask, Response, g, redirect, url_for, flash, jsonify, session, stream_with_context
 
-from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin, current_user
-from flask_dance.contrib.google import make_google_blueprint, google
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# ai
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
+# ai: the client is built on first use (see get_openai_client); importing openai alone takes a noticeable
+# part of a second
+_openai_client = None
+_openai_client_lock = threading.Lock()
 
 GOOGLE_SEARCH_API_URL = "https://www.googleapis.com/customsearch/v1"
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CX = os.getenv("GOOGLE_CX")
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 app = Flask(__name__)
 app.config.from_object('config.Config')
 app.config['SESSION_COOKIE_HTTPONLY'] = False
-CORS(app, supports_credentials=True)
-nlp = spacy.load("en_core_web_sm")
+CORS(app, supports_credentials=True, expose_headers=['Retry-After', 'X-Next-Cursor'])
 db.init_app(app)
-migrate = Migrate(app, db)
-print(app.config['SQLALCHEMY_DATABASE_URI'])
+migrate = Migrate(app, db, render_as_batch=True, include_object=include_in_migrations)
+llm_cache = LLMCache(app.config['LLM_CACHE_MAX_ENTRIES'], app.config['LLM_CACHE_TTL_SECONDS'],
+                     app.config['LLM_CACHE_DB_MAX_ENTRIES'])
+semantic_index = SemanticIndex(app.config['SEMANTIC_INDEX_DIR'], app.config['EMBEDDING_DIMENSIONS'])
+search_client = SearchClient(GOOGLE_SEARCH_API_URL, {'key': GOOGLE_API_KEY, 'cx': GOOGLE_CX},
+                             app.config['SEARCH_CONNECT_TIMEOUT'], app.config['SEARCH_READ_TIMEOUT'],
+                             app.config['SEARCH_DEADLINE_SECONDS'], app.config['SEARCH_MAX_RETRIES'],
+                             app.config['SEARCH_BACKOFF_SECONDS'], app.config['SEARCH_CACHE_TTL_SECONDS'],
+                             app.config['SEARCH_CACHE_MAX_ENTRIES'], app.config['SEARCH_POOL_SIZE'])
+# In-flight streamed summaries by (document id, content hash)
+summary_streams = StreamRegistry()
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+
+# Number of ingestion workers: threads, or processes when INGEST_WORKER_MODE is 'process'
+num_workers = app.config['INGEST_WORKERS']
+
+# Wake-up channel for the workers; the durable queue is the IngestionJob table. One pending
+# wake-up per worker is enough, since a woken worker drains every job it may claim.
+file_processing_queue = Queue(maxsize=num_workers)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        http_request_seconds.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unmatched',
+                                     method=request.method, status=response.status_code)
+    return response
 
-file_processing_queue = Queue()
 
-# Number of worker threads
-num_worker_threads = 3  # Example: 5 threads
+def wait_for_work():
+    try:
+        file_processing_queue.get(timeout=app.config['JOB_POLL_INTERVAL'])
+        file_processing_queue.task_done()
+    except Empty:
+        pass  # poll anyway so jobs left behind by a restart are picked up
 
 
 def process_file_from_queue():
     while True:
-        task = file_processing_queue.get()
-        filepath, filename, user_id = task  # Unpack userId
+        wait_for_work()
         with app.app_context():
             try:
-                process_file(filepath, filename, user_id)  # Pass userId
-            finally:
-                file_processing_queue.task_done()
+                run_pending_jobs()
+            except Exception as e:
+                db.session.rollback()
+                log_error(e)
 
 
-# Start multiple worker threads
-for i in range(num_worker_threads):
-    t = threading.Thread(target=process_file_from_queue, daemon=True)
-    t.start()
+def run_pending_jobs():
+    """Claim and process jobs until none are left."""
+    while True:
+        job = claim_next_job(app.config['JOB_LEASE_SECONDS'], app.config['JOB_MAX_ATTEMPTS'],
+                             app.config['INGEST_USER_MAX_RUNNING'])
+        if job is None:
+            return
+        with track_worker():
+            if finish_if_duplicate(job):
+                continue
+            report = ExtractionReport()
+            try:
+                with keep_lease(job, app.config['JOB_HEARTBEAT_SECONDS']):
+                    document = ingest_file(job.filepath, job.filename, job.user_id, report, job.content_hash,
+                                           job.updates_document_id)
+            except Exception as e:
+                record_failure(job, e)
+            else:
+                complete_job(job, document, report.to_dict())
+
+
+def process_files_in_pool():
+    """Dispatcher for INGEST_WORKER_MODE='process'.
+
+    Text extraction, sentiment and spaCy run in a process pool, one job per worker, so they
+    are not serialized by the GIL. Each worker loads the spaCy model once in ``init_worker``.
+    All database access, claims, lease renewals and bulk writes included, stays in this thread.
+    """
+    context = multiprocessing.get_context(app.config['INGEST_MP_CONTEXT'])
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context, initializer=init_worker) as pool:
+        in_flight = {}
+        renewed = time.monotonic()
+        while True:
+            with app.app_context():
+                try:
+                    while len(in_flight) < num_workers:
+                        job = claim_next_job(app.config['JOB_LEASE_SECONDS'], app.config['JOB_MAX_ATTEMPTS'],
+                                             app.config['INGEST_USER_MAX_RUNNING'])
+                        if job is None:
+                            break
+                        if finish_if_duplicate(job):
+                            continue
+                        unchanged = (stored_paragraph_hashes(job.updates_document_id)
+                                     if job.updates_document_id else None)
+                        in_flight[pool.submit(analyze_file, job.filepath, job.filename, unchanged)] = \
+                            job.id, job.claimed_attempt, time.perf_counter()
+                        ingest_workers_busy.inc()
+                except Exception as e:
+                    db.session.rollback()
+                    log_error(e)
+            if not in_flight:
+                wait_for_work()
+                continue
+            done, _ = wait(in_flight, timeout=app.config['JOB_POLL_INTERVAL'], return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id, attempt, submitted = in_flight.pop(future)
+                ingest_workers_busy.dec()
+                ingest_worker_busy_seconds.inc(time.perf_counter() - submitted)
+                with app.app_context():
+                    store_job_result(claimed_job(job_id, attempt), future)
+            if in_flight and time.monotonic() - renewed >= app.config['JOB_HEARTBEAT_SECONDS']:
+                renewed = time.monotonic()
+                with app.app_context():
+                    try:
+                        for job_id, attempt, _ in in_flight.values():
+                            renew_lease(db.session, job_id, attempt)
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        log_error(e)
+
+
+def store_job_result(job, future):
+    try:
+        analyzed_paragraphs, report = future.result()
+        timer = StageTimer()
+        if job.updates_document_id:
+            document = update_document(db.session.get(Document, job.updates_document_id), analyzed_paragraphs,
+                                       job.content_hash, timer)
+        else:
+            document = store_document(job.filename, job.user_id, analyzed_paragraphs, job.content_hash, timer)
+        report.setdefault('stageSeconds', {})['db'] = timer.to_dict()['db']
+    except Exception as e:
+        record_failure(job, e)
+    else:
+        complete_job(job, document, report)
 
 
-def process_file(filepath, filename, user_id):
-    text = ""
-    if filename.lower().endswith('.pdf'):
-        text = extract_text_from_pdf(filepath)
-    elif filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-        text = extract_text_from_image(filepath)
-    elif filename.lower().endswith('.txt'):
-        text = extract_text_from_txt(filepath)
-    elif filename.lower().endswith('.docx'):
-        text = extract_text_from_docx(filepath)
-    full_text = text
-
-    document_sentiment = analyze_sentiment(full_text)
-    document = Document(content=full_text, sentiment=document_sentiment, filename=filename,
-                        user_id=user_id)  # Use user_id
-    db.session.add(document)
-
-    paragraphs_text = split_into_paragraphs(full_text)
-    for paragraph_text in paragraphs_text:
-        paragraph_sentiment = analyze_sentiment(paragraph_text)
-        paragraph = Paragraph(document=document, content=paragraph_text, sentiment=paragraph_sentiment)
-        db.session.add(paragraph)
-
-        sentences_text = split_into_sentences(paragraph_text)
-        for sentence_text in sentences_text:
-            sentence_sentiment = analyze_sentiment(sentence_text)
-            sentence = Sentence(paragraph=paragraph, content=sentence_text, sentiment=sentence_sentiment)
-            db.session.add(sentence)
-
-            keywords = extract_keywords(sentence_text)
-            for word in keywords:
-                keyword = Keyword(sentence=sentence, word=word)
-                db.session.add(keyword)
+def complete_job(job, document, report):
+    """Finish ``job`` as having produced ``document``; with INGEST_TRACE the trace is stored on the document."""
+    if app.config['INGEST_TRACE']:
+        document.trace = json.dumps(job_trace(job, report))
+    if finish_job(job, document.id, report):
+        record_job_metrics(job, 'done', report)
+    else:
+        app.logger.warning('Ingestion job %s was claimed again after its lease expired; document %s is not its '
+                           'result', job.id, document.id)
+
+
+def record_failure(job, error):
+    """Roll back the failed attempt and mark ``job`` failed, unless its claim was lost meanwhile."""
+    db.session.rollback()
+    if fail_job(job, error):
+        record_job_metrics(job, 'failed')
+
+
+def job_trace(job, report):
+    """Where one ingestion job spent its time: queue wait, per-stage seconds and pages."""
+    return {
+        'jobId': job.id,
+        'attempts': job.attempts,
+        'queuedSeconds': round((job.started_at - job.created_at).total_seconds(), 4),
+        'runSeconds': round((utcnow() - job.started_at).total_seconds(), 4),
+        'workerMode': app.config['INGEST_WORKER_MODE'],
+        'pages': report.get('pages'),
+        'failedPages': len(report.get('failures', [])),
+        'stageSeconds': report.get('stageSeconds', {}),
+    }
 
-    db.session.commit()
 
-    return jsonify({'message': f'{filename} uploaded successfully', 'sentiment': document_sentiment}), 200
+def record_job_metrics(job, outcome, report=None):
+    """Count a finished job and observe its queue wait, run time and (when analyzed) stage times."""
+    ingest_jobs.inc(outcome=outcome)
+    if job.started_at is not None:
+        ingest_queue_wait_seconds.observe((job.started_at - job.created_at).total_seconds())
+        ingest_job_seconds.observe((job.finished_at - job.started_at).total_seconds(), outcome=outcome)
+    for stage, seconds in (report or {}).get('stageSeconds', {}).items():
+        ingest_stage_seconds.observe(seconds, stage=stage)
+
+
+_workers_started = False
+_workers_lock = threading.Lock()
+
+
+def start_workers():
+    """Start the ingestion worker threads (or the process-pool dispatcher), once per process.
+
+    Importing this module never starts threads: a pre-fork server must start them in each
+    worker after the fork, since threads do not survive ``fork()``.
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+    ingest_workers.set(num_workers)
+    if app.config['INGEST_WORKER_MODE'] == 'process':
+        threading.Thread(target=process_files_in_pool, daemon=True).start()
+    else:
+        for i in range(num_workers):
+            t = threading.Thread(target=process_file_from_queue, daemon=True)
+            t.start()
+
 
+def warm_up():
+    """Load the spaCy model, TextBlob and the OpenAI client now rather than on first use.
 
-threading.Thread(target=process_file_from_queue, daemon=True).start()
+    Meant to run once in a pre-fork server's master (e.g. gunicorn's ``on_starting`` hook with
+    ``preload_app``) so every forked worker starts with them already in memory.
+    """
+    warm_up_ingestion()
+    get_openai_client()
+
+
+def create_app():
+    """Application factory: the configured app with its ingestion workers running.
+
+    ``flask --app app:create_app run`` and WSGI servers should use this; importing ``app``
+    directly (tests, CLI commands, migrations) gives the same app without background threads.
+    """
+    start_workers()
+    return app
+
+
+def process_file(filepath, filename, user_id):
+    document = ingest_file(filepath, filename, user_id)
+    return jsonify({'message': f'{filename} uploaded successfully', 'sentiment': document.sentiment}), 200
+
+
+def finish_if_duplicate(job):
+    """Finish ``job`` without extraction or NLP if its content was analyzed before; returns whether it did."""
+    try:
+        document = reuse_analysis(job)
+    except Exception as e:
+        record_failure(job, e)
+        return True
+    if document is None:
+        return False
+    if finish_job(job, document.id, duplicate=True):
+        record_job_metrics(job, 'duplicate')
+    return True
+
+
+def reuse_analysis(job):
+    """The document holding an earlier analysis of ``job``'s content, or None.
+
+    The user's own document is reused as is. Another user's analysis is copied into a new
+    document for this user from the stored rows, which is a few bulk inserts. An update only
+    counts as a duplicate of the very version it would replace.
+    """
+    if not job.content_hash:
+        return None
+    if job.updates_document_id:
+        document = db.session.get(Document, job.updates_document_id)
+        return document if document.content_hash == job.content_hash else None
+    source = (Document.query.filter_by(content_hash=job.content_hash)
+              .order_by(Document.user_id != job.user_id, Document.id).first())
+    if source is None:
+        return None
+    if source.user_id == job.user_id:
+        return source
+    return store_document(job.filename, job.user_id, stored_paragraphs(source.id), job.content_hash)
+
+
+def stored_paragraphs(document_id):
+    """A stored document's analysis in the ``(paragraph_text, Sentiment, sentences)`` shape of ``analyze_text``."""
+    content = db.session.scalar(select(Document.content).where(Document.id == document_id))
+    keywords = {}
+    for sentence_id, word in db.session.execute(
+            select(Keyword.sentence_id, Keyword.word).join(Sentence).join(Paragraph)
+            .where(Paragraph.document_id == document_id).order_by(Keyword.id)):
+        keywords.setdefault(sentence_id, []).append(word)
+    sentences = {}
+    for row in db.session.execute(
+            select(Sentence.id, Sentence.paragraph_id, Sentence.start_offset, Sentence.end_offset,
+                   Sentence.sentiment, Sentence.polarity, Sentence.subjectivity).join(Paragraph)
+            .where(Paragraph.document_id == document_id).order_by(Sentence.start_offset)):
+        text = content[row.start_offset:row.end_offset]
+        sentences.setdefault(row.paragraph_id, []).append((text, stored_sentiment(row, text), keywords.get(row.id, [])))
+    paragraphs = db.session.execute(
+        select(Paragraph.id, Paragraph.start_offset, Paragraph.end_offset, Paragraph.sentiment, Paragraph.polarity,
+               Paragraph.subjectivity)
+        .where(Paragraph.document_id == document_id).order_by(Paragraph.start_offset)).all()
+    return [(content[row.start_offset:row.end_offset],
+             stored_sentiment(row, content[row.start_offset:row.end_offset]), sentences.get(row.id, []))
+            for row in paragraphs]
+
+
+def stored_sentiment(row, text):
+    if row.polarity is None:  # stored before scores were kept
+        return score_sentiment(text)
+    return Sentiment(row.sentiment, row.polarity, row.subjectivity)
+
+
+def ingest_file(filepath, filename, user_id, report=None, content_hash=None, updates_document_id=None):
+    """Extract, analyze and store a file; returns the committed Document.
+
+    Text streams page by page from extraction through paragraph splitting and spaCy, and the
+    analysis is spooled to the end before the bulk writer opens its transaction, so slow PDF
+    pages or OCR never hold the database write lock. Per-page timings, failures and per-stage
+    times are recorded in ``report``.
+    With ``updates_document_id`` the file is a new version of that document, and only its
+    changed paragraphs are analyzed (see ``update_document``).
+    """
+    report = report if report is not None else ExtractionReport()
+    if updates_document_id is None:
+        analyzed_paragraphs = analyze_text(iter_text(filepath, filename, report), report.stages)
+        return store_document(filename, user_id, analyzed_paragraphs, content_hash, report.stages)
+    analyzed_paragraphs = analyze_text(iter_text(filepath, filename, report), report.stages,
+                                       stored_paragraph_hashes(updates_document_id))
+    return update_document(db.session.get(Document, updates_document_id), analyzed_paragraphs, content_hash,
+                           report.stages)
+
+
+def store_document(filename, user_id, analyzed_paragraphs, content_hash=None, timer=None):
+    """Write a Document and its analyzed paragraphs, bulk inserting every INGEST_CHUNK_ROWS rows.
+
+    The document content is the paragraphs joined back together, which is exactly the extracted text;
+    paragraphs and sentences are stored as offsets into it.
+
+    The document sentiment is the length-weighted aggregate of the paragraph scores, and the
+    keyword index (postings, per-document term frequencies, document frequencies) is updated
+    in the same transaction. Database time is charged to the 'db' stage of ``timer``.
+
+    A lazy ``analyzed_paragraphs`` is spooled to the end (see ``spool_analysis``) before the
+    first write, so extraction and NLP never run inside the transaction.
+    """
+    timer = timer if timer is not None else StageTimer()
+    analyzed_paragraphs = materialized(analyzed_paragraphs)
+    document = Document(content='', sentiment='neutral', filename=filename,
+                        user_id=user_id, content_hash=content_hash)  # Use user_id
+    with timer.stage('db'):
+        db.session.add(document)
+        db.session.flush()  # assigns document.id for the bulk inserts below
+
+    chunk, chunk_rows, offset = [], 0, 0
+    paragraph_texts, paragraph_scores = [], []
+    term_counts = Counter()
+    for paragraph_text, paragraph_sentiment, sentences in analyzed_paragraphs:
+        chunk.append((paragraph_text, paragraph_sentiment, sentences))
+        paragraph_texts.append(paragraph_text)
+        paragraph_scores.append((paragraph_sentiment, len(paragraph_text)))
+        term_counts.update(term for _, _, keywords in sentences for term in map(normalize_term, keywords) if term)
+        chunk_rows += paragraph_rows(sentences)
+        if chunk_rows >= app.config['INGEST_CHUNK_ROWS']:
+            with timer.stage('db'):
+                offset = write_paragraph_chunk(document.id, chunk, offset)
+            chunk, chunk_rows = [], 0
+    with timer.stage('db'):
+        write_paragraph_chunk(document.id, chunk, offset)
+        index_document_terms(document, term_counts, app.config['INGEST_CHUNK_ROWS'])
+
+        document.content = PARAGRAPH_SEPARATOR.join(paragraph_texts)
+        document.sentiment, document.polarity, document.subjectivity = aggregate_sentiment(paragraph_scores)
+        db.session.commit()
+
+    return document
+
+
+def materialized(analyzed_paragraphs):
+    """``analyzed_paragraphs`` as is if it is already in memory, else spooled to the end."""
+    if isinstance(analyzed_paragraphs, (list, tuple)):
+        return analyzed_paragraphs
+    return spool_analysis(analyzed_paragraphs, app.config['INGEST_CHUNK_ROWS'])
+
+
+def stored_paragraph_hashes(document_id):
+    """How many of a document's paragraphs have each text hash, for ``analyze_text(unchanged=...)``."""
+    return Counter(db.session.scalars(select(Paragraph.content_hash).where(Paragraph.document_id == document_id)))
+
+
+def update_document(document, analyzed_paragraphs, content_hash=None, timer=None):
+    """Make ``document`` the new version in ``analyzed_paragraphs``, touching only what changed.
+
+    ``analyzed_paragraphs`` comes from ``analyze_text`` with the document's paragraph hashes, so
+    unchanged paragraphs arrive as ``(text, None, None)``. Those keep their rows, ids, sentences,
+    keywords and postings, and are only moved to their new offsets. New paragraphs are bulk
+    inserted, and stored paragraphs that no longer occur are deleted. Term counts, document
+    frequencies and the document sentiment are adjusted in the same transaction, which only
+    opens once a lazy ``analyzed_paragraphs`` has been spooled to the end.
+    """
+    timer = timer if timer is not None else StageTimer()
+    analyzed_paragraphs = materialized(analyzed_paragraphs)
+    with timer.stage('db'):
+        stored = {}
+        for row in db.session.execute(
+                select(Paragraph.id, Paragraph.content_hash, Paragraph.start_offset, Paragraph.sentiment,
+                       Paragraph.polarity, Paragraph.subjectivity)
+                .where(Paragraph.document_id == document.id).order_by(Paragraph.start_offset)):
+            stored.setdefault(row.content_hash, deque()).append(row)
+
+    moved, new_run, run_rows, run_start, offset = [], [], 0, 0, 0
+    paragraph_texts, paragraph_scores = [], []
+    added_terms = Counter()
+    for paragraph_text, paragraph_sentiment, sentences in analyzed_paragraphs:
+        if paragraph_sentiment is None:
+            rows = stored.get(paragraph_hash(paragraph_text))
+            if not rows:
+                raise ValueError('The document changed while its new version was being analyzed')
+            row = rows.popleft()
+            if row.start_offset != offset:
+                moved.append({'row_id': row.id, 'shift': offset - row.start_offset})
+            paragraph_sentiment = stored_sentiment(row, paragraph_text)
+            if new_run:
+                with timer.stage('db'):
+                    write_paragraph_chunk(document.id, new_run, run_start)
+                new_run, run_rows = [], 0
+        else:
+            if not new_run:
+                run_start = offset
+            new_run.append((paragraph_text, paragraph_sentiment, sentences))
+            added_terms.update(term for _, _, keywords in sentences
+                               for term in map(normalize_term, keywords) if term)
+            run_rows += paragraph_rows(sentences)
+            if run_rows >= app.config['INGEST_CHUNK_ROWS']:
+                with timer.stage('db'):
+                    write_paragraph_chunk(document.id, new_run, run_start)
+                new_run, run_rows = [], 0
+        paragraph_texts.append(paragraph_text)
+        paragraph_scores.append((paragraph_sentiment, len(paragraph_text)))
+        offset += len(paragraph_text) + len(PARAGRAPH_SEPARATOR)
+
+    with timer.stage('db'):
+        write_paragraph_chunk(document.id, new_run, run_start)
+        removed_ids = [row.id for rows in stored.values() for row in rows]
+        removed_terms = delete_paragraphs(document.id, removed_ids)
+        if moved:
+            paragraphs, sentences = Paragraph.__table__, Sentence.__table__
+            db.session.execute(update(paragraphs).where(paragraphs.c.id == bindparam('row_id')).values(
+                start_offset=paragraphs.c.start_offset + bindparam('shift'),
+                end_offset=paragraphs.c.end_offset + bindparam('shift')), moved)
+            db.session.execute(update(sentences).where(sentences.c.paragraph_id == bindparam('row_id')).values(
+                start_offset=sentences.c.start_offset + bindparam('shift'),
+                end_offset=sentences.c.end_offset + bindparam('shift')), moved)
+        update_document_terms(document, removed_terms, added_terms)
+
+        # Only now: the FTS delete triggers above read the removed spans out of the old content
+        document.content = PARAGRAPH_SEPARATOR.join(paragraph_texts)
+        document.content_hash = content_hash or document.content_hash
+        document.sentiment, document.polarity, document.subjectivity = aggregate_sentiment(paragraph_scores)
+        db.session.commit()
+
+    return document
+
+
+def delete_paragraphs(document_id, paragraph_ids):
+    """Delete paragraphs of a document with their sentences, keywords and postings; returns the removed terms.
+
+    Children go first: the FTS triggers find a sentence's text through its paragraph.
+    """
+    removed = Counter()
+    if not paragraph_ids:
+        return removed
+    for term, tf in db.session.execute(
+            select(KeywordPosting.term, func.sum(KeywordPosting.tf))
+            .where(KeywordPosting.paragraph_id.in_(paragraph_ids)).group_by(KeywordPosting.term)):
+        removed[term] = tf
+    sentence_ids = select(Sentence.id).where(Sentence.paragraph_id.in_(paragraph_ids))
+    semantic_index.stage(db.session, document_id, removed_ids=db.session.scalars(sentence_ids).all())
+    db.session.execute(delete(KeywordPosting).where(KeywordPosting.paragraph_id.in_(paragraph_ids)))
+    db.session.execute(delete(Keyword).where(Keyword.sentence_id.in_(sentence_ids)))
+    db.session.execute(delete(Sentence).where(Sentence.paragraph_id.in_(paragraph_ids)))
+    db.session.execute(delete(Paragraph).where(Paragraph.id.in_(paragraph_ids)))
+    return removed
+
+
+def write_paragraph_chunk(document_id, chunk, offset=0):
+    """Bulk insert a chunk of analyzed paragraphs with their sentences and keywords.
+
+    ``chunk`` holds ``(paragraph_text, Sentiment, [(sentence_text, Sentiment, [keyword, ...]), ...])``
+    tuples. Each level is written with a single executemany-style INSERT; ids come back through
+    RETURNING in parameter order so the child rows can reference their parents. Spans are stored
+    as offsets into the document content, the first paragraph starting at ``offset``; returns the
+    offset of the paragraph after the chunk.
+    """
+    if not chunk:
+        return offset
+    starts = []
+    for text, _, _ in chunk:
+        starts.append(offset)
+        offset += len(text) + len(PARAGRAPH_SEPARATOR)
+    paragraph_ids = db.session.scalars(
+        insert(Paragraph).returning(Paragraph.id, sort_by_parameter_order=True),
+        [{'document_id': document_id, 'start_offset': start, 'end_offset': start + len(text),
+          'content_hash': paragraph_hash(text), 'sentiment': sentiment.label, 'polarity': sentiment.polarity,
+          'subjectivity': sentiment.subjectivity}
+         for start, (text, sentiment, _) in zip(starts, chunk)]
+    ).all()
+    index_spans('paragraph', [{'rowid': paragraph_id, 'content': text}
+                              for paragraph_id, (text, _, _) in zip(paragraph_ids, chunk)])
+
+    sentence_rows, sentence_texts, sentence_keywords = [], [], []
+    for paragraph_id, start, (text, _, sentences) in zip(paragraph_ids, starts, chunk):
+        spans = sentence_spans(text, start, [sentence_text for sentence_text, _, _ in sentences])
+        for (sentence_start, sentence_end), (sentence_text, sentence_sentiment, keywords) in zip(spans, sentences):
+            sentence_rows.append({'paragraph_id': paragraph_id, 'start_offset': sentence_start,
+                                  'end_offset': sentence_end, 'sentiment': sentence_sentiment.label,
+                                  'polarity': sentence_sentiment.polarity,
+                                  'subjectivity': sentence_sentiment.subjectivity})
+            sentence_texts.append(sentence_text)
+            sentence_keywords.append((paragraph_id, keywords))
+    if not sentence_rows:
+        return offset
+    sentence_ids = db.session.scalars(
+        insert(Sentence).returning(Sentence.id, sort_by_parameter_order=True), sentence_rows
+    ).all()
+    index_spans('sentence', [{'rowid': sentence_id, 'content': text}
+                             for sentence_id, text in zip(sentence_ids, sentence_texts)])
+    semantic_index.stage(db.session, document_id, added=zip(sentence_ids, sentence_texts))
+
+    keyword_rows, posting_rows = [], []
+    for sentence_id, (paragraph_id, keywords) in zip(sentence_ids, sentence_keywords):
+        keyword_rows.extend({'sentence_id': sentence_id, 'word': word} for word in keywords)
+        posting_rows.extend(sentence_postings(document_id, paragraph_id, sentence_id, keywords))
+    if keyword_rows:
+        db.session.execute(insert(Keyword), keyword_rows)
+    if posting_rows:
+        db.session.execute(insert(KeywordPosting), posting_rows)
+    return offset
 
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    # A client that announces ``userId`` and the number of ``files`` in the query string is turned
+    # away before the multipart body is parsed; reading request.files spools every file first
+    announced = request.args.get('files', type=int)
+    if request.args.get('userId') and announced:
+        rejected = check_queue_capacity(request.args['userId'], announced)
+        if rejected:
+            return rejected
     files = request.files.getlist('file')
     userId = request.form.get('userId')
     if not userId:
@@ -120,45 +610,341 @@ def upload_file():
     if not files or all(file.filename == '' for file in files):
         response = jsonify({'error': 'No files selected'}), 400
         return response
+    rejected = check_queue_capacity(userId, sum(1 for file in files if file))
+    if rejected:
+        return rejected
+    # update=true: a file named like one of the user's documents is a new version of it
+    update_existing = request.form.get('update', '').lower() in ('1', 'true', 'yes')
+    if update_existing:
+        for file in files:
+            busy = check_pending_update(secure_filename(file.filename), userId) if file else None
+            if busy:
+                return busy
 
     processed_files = []
+    jobs = []
 
     for file in files:
         if file:
-            ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'csv'}
-
-            def allowed_file(filename):
-                return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
             # In the upload_file function:
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
             else:
                 return jsonify({'error': 'File type not allowed'}), 400
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            file_processing_queue.put((filepath, filename, userId))  # Include userId in the queue
-            processed_files.append(filename)
+            temporary_path, content_hash = save_upload(file, app.config['UPLOAD_FOLDER'])
+            job = queue_upload(temporary_path, filename, userId, content_hash, update_existing)
+            jobs.append(job)
+            processed_files.append(job.filename)
 
     if not processed_files:
         response = jsonify({'error': 'No valid files were processed'}), 400
         return response
 
-    response = jsonify({'message': f'Files queued for processing: {", ".join(processed_files)}'}), 202
+    saved = [job.filepath for job in jobs if job.status == JOB_QUEUED]
+    rejected = recheck_queue_capacity(userId, jobs)
+    if rejected:
+        for path in saved:
+            os.remove(path)
+        return rejected
+    db.session.commit()
+    wake_workers(jobs)
+
+    response = jsonify({'message': f'Files queued for processing: {", ".join(processed_files)}',
+                        'jobs': [upload_job_entry(job) for job in jobs]}), 202
     return response
 
 
+ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'csv'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def queue_upload(temporary_path, filename, user_id, content_hash, update_existing=False):
+    """Turn a fully received upload into a job: a finished duplicate, or a queued job for the file.
+
+    With ``update_existing``, a file named like one of the user's documents is queued as an
+    update of that document. The file at ``temporary_path`` is removed or moved into
+    UPLOAD_FOLDER. The caller commits.
+    """
+    target = update_target(filename, user_id) if update_existing else None
+    if target is not None:
+        if target.content_hash == content_hash:
+            os.remove(temporary_path)
+            return record_duplicate_job(target.filename, user_id, content_hash, target)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename(filename))
+        os.replace(temporary_path, filepath)
+        return enqueue_job(filepath, target.filename, user_id, content_hash, updates_document_id=target.id)
+    existing = Document.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+    if existing is not None:
+        # Same bytes as a document this user already has: nothing to extract or analyze
+        os.remove(temporary_path)
+        return record_duplicate_job(filename, user_id, content_hash, existing)
+    filename = unique_filename(filename)
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    os.replace(temporary_path, filepath)
+    return enqueue_job(filepath, filename, user_id, content_hash)
+
+
+def update_target(filename, user_id):
+    """The user's document that an upload of ``filename`` in update mode replaces, or None."""
+    return Document.query.filter_by(user_id=user_id, filename=filename).first()
+
+
+def check_pending_update(filename, user_id):
+    """A 409 response if the document an update of ``filename`` targets is already being updated, else None.
+
+    Updates of one document run one at a time, each against the version the previous one left.
+    """
+    target = update_target(filename, user_id)
+    if target is None or pending_update(target.id) is None:
+        return None
+    return jsonify({'error': f'An update of {filename} is already being processed', 'documentId': target.id}), 409
+
+
+def wake_workers(jobs):
+    for job in jobs:
+        if job.status == JOB_QUEUED:
+            try:
+                file_processing_queue.put_nowait(job.id)  # wake up a worker
+            except Full:
+                break  # every worker already has a wake-up pending
+
+
+def upload_job_entry(job):
+    return {'jobId': job.id, 'filename': job.filename, 'duplicate': job.duplicate, 'documentId': job.document_id,
+            'updatesDocumentId': job.updates_document_id}
+
+
+def check_queue_capacity(user_id, new_jobs):
+    """A response turning away ``new_jobs`` more jobs of ``user_id`` if they would overfill the queue, else None.
+
+    413 if ``new_jobs`` alone exceed a queue bound, since no wait makes room for them. Otherwise
+    429 with Retry-After, how long the workers need at the recent mean job time to make room.
+    Callers check before saving any file, so a rejected upload costs no disk, and again with
+    ``recheck_queue_capacity`` once the jobs are added.
+    """
+    limit = min(app.config['INGEST_QUEUE_MAX_JOBS'], app.config['INGEST_USER_MAX_QUEUED'])
+    if new_jobs > limit:
+        return jsonify({'error': f'At most {limit} files can be queued at once', 'maxFiles': limit}), 413
+    queued, user_queued = queued_job_counts(user_id)
+    excess = max(queued + new_jobs - app.config['INGEST_QUEUE_MAX_JOBS'], 0)
+    user_excess = max(user_queued + new_jobs - app.config['INGEST_USER_MAX_QUEUED'], 0)
+    if not excess and not user_excess:
+        return None
+    job_seconds = mean_job_seconds() or app.config['JOB_POLL_INTERVAL']
+    wait_seconds = max(job_seconds * excess / num_workers,
+                       job_seconds * user_excess / min(app.config['INGEST_USER_MAX_RUNNING'], num_workers))
+    retry_after = min(max(math.ceil(wait_seconds), 1), 3600)
+    response = jsonify({'error': 'Too many files are waiting to be processed, try again later',
+                        'queued': user_queued, 'retryAfter': retry_after})
+    return response, 429, {'Retry-After': str(retry_after)}
+
+
+def recheck_queue_capacity(user_id, jobs):
+    """``check_queue_capacity`` once ``jobs`` are flushed; on rejection they are rolled back.
+
+    Concurrent uploads may have filled the queue since the first check. The job inserts hold
+    SQLite's write lock until the commit, so this count is exact and nobody adds jobs before
+    the caller commits. The caller removes the files of rejected jobs.
+    """
+    if not any(job.status == JOB_QUEUED for job in jobs):
+        return None  # duplicates take no room in the queue
+    db.session.flush()
+    rejected = check_queue_capacity(user_id, 0)
+    if rejected:
+        db.session.rollback()
+    return rejected
+
+
+def save_upload(file, folder):
+    """Stream an uploaded file into ``folder`` under a temporary name, hashing it on the way.
+
+    Returns ``(path, sha256 hex digest)``.
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(dir=folder, suffix='.part')
+    with os.fdopen(fd, 'wb') as out:
+        for block in iter(lambda: file.stream.read(UPLOAD_BLOCK_SIZE), b''):
+            digest.update(block)
+            out.write(block)
+    return path, digest.hexdigest()
+
+
+def unique_filename(filename):
+    """``filename``, or ``name-2.ext``, ``name-3.ext``... if a document or pending job already has it."""
+    stem, extension = os.path.splitext(filename)
+    candidate, number = filename, 1
+    while (Document.query.filter_by(filename=candidate).first() is not None
+           or IngestionJob.query.filter(IngestionJob.filename == candidate,
+                                        IngestionJob.status != JOB_FAILED).first() is not None):
+        number += 1
+        candidate = f'{stem}-{number}{extension}'
+    return candidate
+
+
+@app.route('/api/uploads', methods=['POST'])
+def start_chunked_upload():
+    """Start a resumable upload of ``size`` bytes; JSON body with ``filename``, ``size``, ``userId`` and
+    optionally ``update`` (as for ``/upload``).
+
+    Send the bytes with ``PUT /api/uploads/<uploadId>?offset=N``, one chunk of at most ``chunkSize``
+    per request. After an interruption, ``GET /api/uploads/<uploadId>`` tells where to resume.
+    ``POST /api/uploads/<uploadId>/complete`` queues the file like ``/upload`` does.
+    """
+    data = request.json or {}
+    user_id = data.get('userId')
+    filename = data.get('filename')
+    if not user_id:
+        return jsonify({'error': 'UserId is required'}), 400
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Size must be an integer'}), 400
+    if size < 0:
+        return jsonify({'error': 'Size must not be negative'}), 400
+    if size > app.config['UPLOAD_MAX_BYTES']:
+        return jsonify({'error': f"Uploads are limited to {app.config['UPLOAD_MAX_BYTES']} bytes"}), 413
+    rejected = check_queue_capacity(user_id, 1)
+    if rejected:
+        return rejected
+    update_existing = bool(data.get('update'))
+    busy = check_pending_update(secure_filename(filename), user_id) if update_existing else None
+    if busy:
+        return busy
+
+    expire_uploads(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_SESSION_TTL_SECONDS'])
+    upload = create_upload(user_id, secure_filename(filename), size, app.config['UPLOAD_FOLDER'], update_existing)
+    db.session.commit()
+    return jsonify({**upload.to_dict(), 'chunkSize': app.config['UPLOAD_CHUNK_BYTES']}), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict()), 200
+
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Write the raw request body at ``offset``, streaming it to disk; 409 with the offset to resume from."""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        offset = int(request.args['offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Offset is required'}), 400
+    max_bytes = app.config['UPLOAD_CHUNK_BYTES']
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'error': f'Chunks are limited to {max_bytes} bytes', 'offset': upload.received}), 413
+    try:
+        write_chunk(upload, app.config['UPLOAD_FOLDER'], offset, request.stream, UPLOAD_BLOCK_SIZE, max_bytes)
+    except UploadGone:
+        return jsonify({'error': 'Upload was already completed or discarded'}), 409
+    except OffsetMismatch as e:
+        return jsonify({'error': 'Chunk does not start at the current offset', 'offset': e.expected}), 409
+    except ChunkTooLarge as e:
+        return jsonify({'error': str(e), 'offset': upload.received}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e), 'offset': upload.received}), 400
+    return jsonify(upload.to_dict()), 200
+
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Queue a fully received upload for processing; an optional ``sha256`` in the body is verified.
+
+    Runs holding the upload, so of two completions of one upload the second gets 409.
+    """
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    expected_hash = (request.get_json(silent=True) or {}).get('sha256')
+    if expected_hash is not None and not isinstance(expected_hash, str):
+        return jsonify({'error': 'sha256 must be a hex string'}), 400
+    try:
+        with hold_upload(upload, app.config['UPLOAD_FOLDER']):
+            return queue_chunked_upload(upload, expected_hash)
+    except UploadGone:
+        return jsonify({'error': 'Upload was already completed or discarded'}), 409
+
+
+def queue_chunked_upload(upload, expected_hash):
+    """The rest of ``complete_chunked_upload``, run while holding ``upload``."""
+    if upload.received != upload.size:
+        return jsonify({'error': 'Upload is incomplete', 'offset': upload.received}), 409
+    content_hash = upload_digest(upload, app.config['UPLOAD_FOLDER'], UPLOAD_BLOCK_SIZE)
+    if expected_hash and expected_hash.lower() != content_hash:
+        discard_upload(upload, app.config['UPLOAD_FOLDER'])
+        db.session.commit()
+        return jsonify({'error': 'Checksum mismatch, the upload was discarded', 'sha256': content_hash}), 400
+
+    # Checked again here: the queue may have filled up while the chunks were arriving
+    rejected = check_queue_capacity(upload.user_id, 1)
+    if rejected:
+        return rejected
+    busy = check_pending_update(upload.filename, upload.user_id) if upload.update_existing else None
+    if busy:
+        return busy
+    job = queue_upload(partial_path(app.config['UPLOAD_FOLDER'], upload.id), upload.filename, upload.user_id,
+                       content_hash, upload.update_existing)
+    saved = job.filepath if job.status == JOB_QUEUED else None
+    rejected = recheck_queue_capacity(upload.user_id, [job])
+    if rejected:
+        os.replace(saved, partial_path(app.config['UPLOAD_FOLDER'], upload.id))  # kept for the retry
+        return rejected
+    release_upload(upload)
+    db.session.commit()
+    wake_workers([job])
+    return jsonify({'message': f'Files queued for processing: {job.filename}', 'jobs': [upload_job_entry(job)]}), 202
+
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    discard_upload(upload, app.config['UPLOAD_FOLDER'])
+    db.session.commit()
+    return jsonify({'message': 'Upload discarded'}), 200
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = db.session.get(IngestionJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
 @app.route('/api/documents/user/<user_id>', methods=['GET'])
 def get_user_documents(user_id):
+    """A user's documents, oldest first, as a JSON array streamed in keyset batches.
+
+    Only the listed columns are read, never the document content. With ``limit`` the response
+    is one page and the ``X-Next-Cursor`` header, when present, is the ``after`` value for the next.
+    """
     try:
-        documents = Document.query.filter_by(user_id=user_id).all()
-        documents_data = [
-            {'filename': doc.filename, 'documentId': doc.id, 'sentiment': doc.sentiment}
-            for doc in documents
-        ]
-        return jsonify(documents_data), 200
-    except Exception as e:
-        return jsonify({'error': 'Internal Server Error', 'message': str(e)}), 500
+        limit = max(1, min(int(request.args['limit']), 1000)) if 'limit' in request.args else None
+        after = int(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Limit and after must be integers'}), 400
+    statement = (select(Document.id, Document.filename, Document.sentiment, Document.polarity)
+                 .where(Document.user_id == user_id))
+    page = KeysetPage(statement, Document.id, after, limit, app.config['LIST_BATCH_ROWS'])
+    documents_data = page.iter_json(lambda doc: {'filename': doc.filename, 'documentId': doc.id,
+                                                 'sentiment': doc.sentiment, 'polarity': doc.polarity})
+    if limit is None:
+        return Response(stream_with_context(documents_data), mimetype='application/json'), 200
+    body = ''.join(documents_data)  # a bounded page; read it all so the cursor can go in a header
+    headers = {'X-Next-Cursor': str(page.next_after)} if page.next_after is not None else {}
+    return Response(body, mimetype='application/json', headers=headers), 200
 
 
 @app.route('/document/summary', methods=['POST'])
@@ -173,26 +959,101 @@ def document_summary():
 
     # Generate summary
     print(f"An error occurred")
-    document_summary = get_document_summary(document.content)
+    document_summary = summarize_document(document)
 
     return jsonify({'filename': filename, 'summary': document_summary})
 
 
+@app.route('/document/summary/stream', methods=['GET'])
+def document_summary_stream():
+    """The summary of ``filename`` as Server-Sent Events, relayed while the completion is generated.
+
+    A ``start`` event goes out at once, then one unnamed event per piece of text (``{"text": ...}``)
+    and finally ``done`` with the whole summary, or ``error``. A request for a document whose
+    summary is already being generated attaches to that generation instead of starting another.
+    The finished text goes to the LLM cache, where ``/document/summary`` finds it too.
+    """
+    filename = request.args.get('filename')
+    if not filename:
+        return jsonify({'error': 'Filename is required'}), 400
+    document = Document.query.filter_by(filename=filename).first()
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+
+    document_id = document.id
+    stream, attached = summary_streams.attach((document_id, document.content_hash),
+                                              lambda append: produce_summary(document_id, append))
+    heartbeat = app.config['SUMMARY_STREAM_HEARTBEAT_SECONDS']
+
+    def events():
+        yield sse_event({'filename': filename, 'attached': attached}, 'start')
+        pieces = []
+        try:
+            for piece in stream.follow(heartbeat):
+                if piece is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                pieces.append(piece)
+                yield sse_event({'text': piece})
+        except Exception:
+            yield sse_event({'error': 'Failed to summarize the document'}, 'error')
+            return
+        yield sse_event({'filename': filename, 'summary': ''.join(pieces)}, 'done')
+
+    # No request context inside: the events only read the stream
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def sse_event(data, event=None):
+    return (f'event: {event}\n' if event else '') + f'data: {json.dumps(data)}\n\n'
+
+
+def produce_summary(document_id, append):
+    """Generate a document's summary into ``append`` piece by piece, then cache the whole text.
+
+    Runs on the stream's own thread. A cached summary is appended in one piece.
+    """
+    with app.app_context():
+        messages = summary_messages(db.session.get(Document, document_id))
+        key = cache_key(LLM_MODEL, messages)
+        summary = llm_cache.get(key)
+        if summary is not None:
+            append(summary)
+            return
+        pieces = []
+        for piece in stream_chat_completion(messages):
+            pieces.append(piece)
+            append(piece)
+        llm_cache.set(key, LLM_MODEL, ''.join(pieces))
+
+
 @app.route('/document/keywords', methods=['POST'])
 def document_keywords():
+    """A document's top ``limit`` keywords from the per-document term frequency table.
+
+    ``weighting`` is 'tf' (raw counts, the default) or 'tfidf' (counts weighted against the corpus).
+    """
     data = request.json
     filename = data.get('filename')  # Now using filename to identify the document
 
     if not filename:
         return jsonify({'error': 'Filename is required'}), 400
+    weighting = str(data.get('weighting', 'tf')).lower()
+    if weighting not in ('tf', 'tfidf'):
+        return jsonify({'error': "Weighting must be 'tf' or 'tfidf'"}), 400
+    try:
+        limit = max(1, min(int(data.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
 
-    # Query keywords through the relationship chain: Document -> Paragraph -> Sentence -> Keyword
-    # Filter by Document.filename instead of Document.id
-    keywords_query = db.session.query(Keyword.word).join(Sentence).join(Paragraph).join(Document).filter(
-        Document.filename == filename).all()
-    keywords = [keyword[0] for keyword in keywords_query]  # Extracting the keyword strings from the query result
+    document_id = db.session.scalar(select(Document.id).where(Document.filename == filename))
+    if document_id is None:
+        return jsonify({'error': 'Document not found'}), 404
+    terms = top_document_terms(document_id, limit, weighting)
 
-    return jsonify({'keywords': keywords})
+    return jsonify({'keywords': [term for term, _, _ in terms],
+                    'counts': [{'keyword': term, 'count': tf, 'score': score} for term, tf, score in terms]})
 
 
 @app.route('/keyword/definition', methods=['POST'])
@@ -219,142 +1080,408 @@ def search_articles():
     if not re.match("^[a-zA-Z0-9 ]*$", keyword):
         return jsonify({'error': 'Invalid keyword format'}), 400
 
-    params = {
-        'key': GOOGLE_API_KEY,
-        'cx': GOOGLE_CX,
-        'q': keyword,
-    }
-
-    response = requests.get(GOOGLE_SEARCH_API_URL, params=params)
-    if response.status_code == 200:
-        search_results = response.json()
-        links = [item['link'] for item in search_results.get('items', [])]
-        return jsonify({'keyword': keyword, 'links': links})
-    else:
-        return jsonify({'error': 'Failed to fetch search results'}), response.status_code
+    try:
+        search_results = search_client.search(keyword)
+    except SearchError as e:
+        return jsonify({'error': 'Failed to fetch search results'}), e.status
+    links = [item['link'] for item in search_results.get('items', [])]
+    return jsonify({'keyword': keyword, 'links': links})
 
 
 def log_error(e):
-    pass
+    errors.inc(type=type(e).__name__)
+    app.logger.error('Unhandled error: %s', e, exc_info=e)
+
+
+def queue_depth():
+    counts = dict(db.session.query(IngestionJob.status, db.func.count()).filter(
+        IngestionJob.status.in_((JOB_QUEUED, JOB_RUNNING))).group_by(IngestionJob.status))
+    return {(status,): counts.get(status, 0) for status in (JOB_QUEUED, JOB_RUNNING)}
+
+
+def queue_oldest_age():
+    oldest = db.session.scalar(select(db.func.min(IngestionJob.created_at)).where(IngestionJob.status == JOB_QUEUED))
+    return (utcnow() - oldest).total_seconds() if oldest is not None else 0
+
+
+ingest_queue_depth.set_function(queue_depth)
+ingest_queue_oldest_age.set_function(queue_oldest_age)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """All metrics in the Prometheus text format.
+
+    Queue depth and age are read from the job table on each scrape. Everything else is per
+    process and labelled with its ``pid``, so scrape each server process (or run one) and
+    sum across ``pid`` to get complete numbers.
+    """
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+SENTIMENT_THRESHOLDS = {
+    'min_polarity': ('polarity', operator.gt),
+    'max_polarity': ('polarity', operator.lt),
+    'min_subjectivity': ('subjectivity', operator.gt),
+    'max_subjectivity': ('subjectivity', operator.lt),
+}
+
+
+def sentiment_filters(model, sentiment, thresholds):
+    """Label filter (skipped for 'any') plus exclusive numeric bounds on the stored scores."""
+    filters = [] if sentiment == 'any' else [model.sentiment == sentiment]
+    for arg, value in thresholds.items():
+        column, compare = SENTIMENT_THRESHOLDS[arg]
+        filters.append(compare(getattr(model, column), value))
+    return filters
 
 
 @app.route('/api/filter/sentiment/<sentiment>', methods=['GET'])
 def filter_by_sentiment(sentiment):
+    """A user's paragraphs and sentences with the given sentiment, streamed as chunked JSON.
+
+    Both lists are read in keyset batches of LIST_BATCH_ROWS rows. With ``limit`` each list is
+    cut to that many rows and ``nextCursor`` fetches the rest; it is null on the last page.
+    """
+    user_id = request.args.get('userId')
+    if not user_id:
+        return jsonify({'error': 'UserId is required'}), 400
     try:
-        paragraphs = Paragraph.query.filter_by(sentiment=sentiment).all()
-        sentences = Sentence.query.filter_by(sentiment=sentiment).all()
+        thresholds = {arg: float(request.args[arg]) for arg in SENTIMENT_THRESHOLDS if arg in request.args}
+    except ValueError:
+        return jsonify({'error': 'Thresholds must be numbers'}), 400
+    try:
+        limit = max(1, int(request.args['limit'])) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    cursor = request.args.get('cursor')
+    try:
+        # a list missing from the cursor was already returned in full
+        positions = decode_keyset_cursor(cursor) if cursor else {'paragraphs': None, 'sentences': None}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    columns = ('id', 'start_offset', 'end_offset', 'sentiment', 'polarity', 'subjectivity')
+    statements = {
+        'paragraphs': (select(*(getattr(Paragraph, column) for column in columns), Paragraph.document_id)
+                       .join(Document)
+                       .where(Document.user_id == user_id, *sentiment_filters(Paragraph, sentiment, thresholds)),
+                       Paragraph.id),
+        'sentences': (select(*(getattr(Sentence, column) for column in columns), Paragraph.document_id)
+                      .join(Paragraph).join(Document)
+                      .where(Document.user_id == user_id, *sentiment_filters(Sentence, sentiment, thresholds)),
+                      Sentence.id),
+    }
+    texts = DocumentTexts()
 
-        paragraphs_data = [{'id': p.id, 'content': p.content, 'sentiment': p.sentiment} for p in paragraphs]
-        sentences_data = [{'id': s.id, 'content': s.content, 'sentiment': s.sentiment} for s in sentences]
+    def serialize(row):
+        return {'id': row.id, 'content': texts.slice(row.document_id, row.start_offset, row.end_offset),
+                'sentiment': row.sentiment, 'polarity': row.polarity, 'subjectivity': row.subjectivity}
 
-        return jsonify({'paragraphs': paragraphs_data, 'sentences': sentences_data}), 200
-    except Exception as e:
-        return jsonify({'error': 'An internal error occurred'}), 500
+    def generate():
+        next_positions = {}
+        for number, (name, (statement, key)) in enumerate(statements.items()):
+            yield ('{' if number == 0 else ',') + json.dumps(name) + ':'
+            if name not in positions:
+                yield '[]'
+                continue
+            page = KeysetPage(statement, key, positions[name], limit, app.config['LIST_BATCH_ROWS'])
+            yield from page.iter_json(serialize)
+            if page.next_after is not None:
+                next_positions[name] = page.next_after
+        next_cursor = encode_keyset_cursor(next_positions) if next_positions else None
+        yield ',"nextCursor":' + json.dumps(next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json'), 200
 
 
 @app.route('/api/search/keyword', methods=['POST'])
 def search_by_keyword():
-    keyword = request.json.get('keyword')
-    if not keyword:
+    """BM25-ranked keyword search over the inverted index.
+
+    Accepts ``keyword`` or a ``terms`` list of strings, ``mode`` ('or'/'and'), ``limit`` and the
+    ``cursor`` returned by the previous page. Sentences and paragraphs are those of the documents
+    on this page, at most ``hitsPerDocument`` matching sentences (and their paragraphs) per
+    document; each result's ``hits`` is how many sentences of it match in all.
+    """
+    data = request.json
+    terms = data.get('terms')
+    if terms is None:
+        terms = [data['keyword']] if data.get('keyword') else []
+    if not isinstance(terms, list) or not all(isinstance(term, str) for term in terms):
+        return jsonify({'error': 'Terms must be a list of strings'}), 400
+    if not terms:
         return jsonify({'error': 'Keyword is required'}), 400
+    mode = str(data.get('mode', 'or')).lower()
+    if mode not in ('and', 'or'):
+        return jsonify({'error': "Mode must be 'and' or 'or'"}), 400
+    try:
+        limit = max(1, min(int(data.get('limit', 20)), 100))
+        hits_per_document = max(1, min(int(data.get('hitsPerDocument', 10)), 100))
+        ranked, next_cursor = search_documents(terms, mode, limit, data.get('cursor'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    scores = dict(ranked)
+    normalized = {normalize_term(term) for term in terms}
+    matches = (select(KeywordPosting.document_id, KeywordPosting.paragraph_id, KeywordPosting.sentence_id)
+               .where(KeywordPosting.term.in_(normalized), KeywordPosting.document_id.in_(scores))
+               .distinct().subquery())
+    numbered = select(matches, func.row_number().over(partition_by=matches.c.document_id,
+                                                      order_by=matches.c.sentence_id).label('hit'),
+                      func.count().over(partition_by=matches.c.document_id).label('hits')).subquery()
+    postings = db.session.execute(select(numbered.c.document_id, numbered.c.paragraph_id, numbered.c.sentence_id,
+                                         numbered.c.hits).where(numbered.c.hit <= hits_per_document)).all()
+    sentence_ids = {posting.sentence_id for posting in postings}
+    paragraph_ids = {posting.paragraph_id for posting in postings}
+    hits = {posting.document_id: posting.hits for posting in postings}
+    filenames = dict(db.session.query(Document.id, Document.filename).filter(Document.id.in_(scores)))
+
+    sentences = db.session.query(Sentence.id, Paragraph.document_id, Sentence.start_offset, Sentence.end_offset) \
+        .join(Paragraph).filter(Sentence.id.in_(sentence_ids)).order_by(Sentence.id) if sentence_ids else []
+    paragraphs = db.session.query(Paragraph.id, Paragraph.document_id, Paragraph.start_offset, Paragraph.end_offset) \
+        .filter(Paragraph.id.in_(paragraph_ids)).order_by(Paragraph.id) if paragraph_ids else []
+
+    texts = DocumentTexts()
+    sentences_data = [{'id': sentence_id, 'documentId': document_id, 'content': texts.slice(document_id, start, end)}
+                      for sentence_id, document_id, start, end in sentences]
+    paragraphs_data = [{'id': paragraph_id, 'documentId': document_id,
+                        'content': texts.slice(document_id, start, end)}
+                       for paragraph_id, document_id, start, end in paragraphs]
+    results = [{'documentId': document_id, 'filename': filenames.get(document_id), 'score': score,
+                'hits': hits.get(document_id, 0)}
+               for document_id, score in ranked]
+
+    return jsonify({'results': results, 'sentences': sentences_data, 'paragraphs': paragraphs_data,
+                    'nextCursor': next_cursor}), 200
+
+
+@app.route('/api/search/fulltext', methods=['GET'])
+def search_full_text():
+    """Full-text search over a user's sentences (default) or paragraphs, using SQLite FTS5.
+
+    ``q`` takes FTS5 query syntax: ``"exact phrase"``, ``prefix*``, AND/OR/NOT. Paginate with
+    ``limit`` and ``offset``; matches come back rank-ordered with snippets and highlights.
+    """
+    query = request.args.get('q', '').strip()
+    user_id = request.args.get('userId')
+    scope = request.args.get('scope', 'sentence')
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    if not user_id:
+        return jsonify({'error': 'UserId is required'}), 400
+    if scope not in ('sentence', 'paragraph'):
+        return jsonify({'error': "Scope must be 'sentence' or 'paragraph'"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'Limit and offset must be integers'}), 400
+    try:
+        results = search_fulltext(query, user_id, scope, limit, offset)
+    except OperationalError:
+        db.session.rollback()
+        return jsonify({'error': 'Invalid search query'}), 400
+    return jsonify({'query': query, 'scope': scope, 'results': results}), 200
+
+
+@app.route('/api/search/semantic', methods=['GET'])
+def search_semantic():
+    """Sentences of a user's documents closest in meaning to ``q``, from the local embedding index.
+
+    Unlike keyword and full-text search, a sentence matches without sharing the exact word form.
+    """
+    query = request.args.get('q', '').strip()
+    user_id = request.args.get('userId')
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    if not user_id:
+        return jsonify({'error': 'UserId is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    documents = dict(db.session.execute(
+        select(Document.id, Document.filename).where(Document.user_id == user_id)).all())
+    matches = semantic_index.search_sentences(query, limit, list(documents))
+    spans = {row.id: row for row in db.session.execute(
+        select(Sentence.id, Paragraph.document_id, Sentence.start_offset, Sentence.end_offset).join(Paragraph)
+        .where(Sentence.id.in_([sentence_id for sentence_id, _, _ in matches])))}
+    texts = DocumentTexts()
+    results = [{'sentenceId': sentence_id, 'documentId': document_id, 'filename': documents[document_id],
+                'content': texts.slice(document_id, spans[sentence_id].start_offset, spans[sentence_id].end_offset),
+                'score': round(score, 4)}
+               for sentence_id, document_id, score in matches
+               # the index trails the database by a commit; skip rows it no longer agrees with
+               if sentence_id in spans and spans[sentence_id].document_id == document_id]
+    return jsonify({'query': query, 'results': results}), 200
+
+
+@app.route('/api/documents/<int:document_id>/related', methods=['GET'])
+def related_documents(document_id):
+    """The user's documents most similar to ``document_id``, by cosine similarity of their embeddings."""
+    user_id = request.args.get('userId')
+    if not user_id:
+        return jsonify({'error': 'UserId is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    document = db.session.get(Document, document_id)
+    if document is None or document.user_id != user_id:
+        return jsonify({'error': 'Document not found'}), 404
+    documents = {row.id: row for row in db.session.execute(
+        select(Document.id, Document.filename, Document.sentiment).where(Document.user_id == user_id))}
+    related = [{'documentId': related_id, 'filename': documents[related_id].filename,
+                'sentiment': documents[related_id].sentiment, 'score': round(score, 4)}
+               for related_id, score in semantic_index.related_documents(document_id, limit, list(documents))
+               if related_id in documents]
+    return jsonify({'documentId': document_id, 'related': related}), 200
+
+
+@app.cli.command('rebuild-fulltext-index')
+def rebuild_fulltext_index_command():
+    """Create the FTS5 tables if needed and re-index all sentences and paragraphs."""
+    create_fulltext_tables()
+    rebuild_fulltext_index()
+    db.session.commit()
 
-    sentences = Sentence.query.join(Sentence.keywords).filter(Keyword.word == keyword).all()
-    sentence_ids = [sentence.id for sentence in sentences]
 
-    paragraphs = Paragraph.query.join(Paragraph.sentences).filter(Sentence.id.in_(sentence_ids)).all()
+@app.cli.command('rebuild-keyword-index')
+def rebuild_keyword_index_command():
+    """Rebuild the keyword postings and term statistics from the Keyword table."""
+    rebuild_keyword_index(app.config['INGEST_CHUNK_ROWS'])
+    db.session.commit()
 
-    sentences_data = [{'id': sentence.id, 'content': sentence.content} for sentence in sentences]
-    paragraphs_data = [{'id': paragraph.id, 'content': paragraph.content} for paragraph in paragraphs]
 
-    return jsonify({'sentences': sentences_data, 'paragraphs': paragraphs_data}), 200
+@app.cli.command('rebuild-semantic-index')
+def rebuild_semantic_index_command():
+    """Re-embed every sentence into a fresh semantic index, e.g. after changing EMBEDDING_DIMENSIONS."""
+    texts = DocumentTexts()
+    rows = db.session.execute(
+        select(Sentence.id, Paragraph.document_id, Sentence.start_offset, Sentence.end_offset).join(Paragraph)
+        .order_by(Paragraph.document_id, Sentence.id).execution_options(yield_per=app.config['INGEST_CHUNK_ROWS']))
+    semantic_index.rebuild(((row.id, row.document_id, texts.slice(row.document_id, row.start_offset, row.end_offset))
+                            for row in rows), app.config['INGEST_CHUNK_ROWS'])
 
 
-def get_document_summary(document_text):
-    try:
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an intelligent assistant."},
-                {"role": "user", "content": f"Summarize the following document:\n\n{document_text}"}
-            ],
-            model="gpt-3.5-turbo"
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        # Handle exceptions or log error and return an informative message or raise the error
-        print(f"An error occurred: {str(e)}")
-        raise
+LLM_MODEL = "gpt-3.5-turbo"
 
 
-def get_keyword_definition(keyword):
-    try:
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an intelligent assistant."},
-                {"role": "user", "content": f"Define the word: {keyword}."}
-            ],
-            model="gpt-3.5-turbo"
-        )
+def get_openai_client():
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            _openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _openai_client
+
+
+def chat_completion(messages, model=LLM_MODEL):
+    """Chat completion through the LLM cache; identical prompts only hit OpenAI once per TTL."""
+    def create():
+        with track_external('openai'):
+            completion = get_openai_client().chat.completions.create(messages=messages, model=model)
         return completion.choices[0].message.content
-    except Exception as e:
-        # Handle exceptions or log error and return an informative message or raise the error
-        print(f"An error occurred: {str(e)}")
-        raise
+    return llm_cache.get_or_create(model, messages, create)
 
 
-def analyze_sentiment(text):
-    """Simple sentiment analysis using TextBlob."""
-    blob = TextBlob(text)
-    return 'positive' if blob.sentiment.polarity > 0 else 'negative' if blob.sentiment.polarity < 0 else 'neutral'
+def stream_chat_completion(messages, model=LLM_MODEL):
+    """Yield a chat completion's text in pieces as OpenAI generates it. Bypasses the LLM cache."""
+    with track_external('openai'):
+        for chunk in get_openai_client().chat.completions.create(messages=messages, model=model, stream=True):
+            piece = chunk.choices[0].delta.content if chunk.choices else None
+            if piece:
+                yield piece
 
 
-def split_into_paragraphs(text):
-    """Split text into paragraphs based on newline characters."""
-    return text.split('\n\n')
+def document_summary_messages(document_text):
+    return [
+        {"role": "system", "content": "You are an intelligent assistant."},
+        {"role": "user", "content": f"Summarize the following document:\n\n{document_text}"}
+    ]
 
 
-def split_into_sentences(paragraph):
-    """Split paragraph into sentences using spaCy."""
-    doc = nlp(paragraph)
-    return [sent.text for sent in doc.sents]
+def get_document_summary(document_text):
+    try:
+        return chat_completion(document_summary_messages(document_text))
+    except Exception as e:
+        # Handle exceptions or log error and return an informative message or raise the error
+        print(f"An error occurred: {str(e)}")
+        raise
 
 
-def extract_keywords(sentence):
-    """Extract keywords from a sentence using spaCy."""
-    doc = nlp(sentence)
-    return [token.lemma_ for token in doc if token.pos_ in ['NOUN', 'PROPN']]
+def summarize_document(document):
+    """Summarize a document, map-reducing over its stored paragraphs when it is too long for one prompt."""
+    chunks = document_chunks(document)
+    if len(chunks) <= 1:
+        return get_document_summary(document.content)
+    return chat_completion(map_reduce_messages(document, chunks))
+
+
+def summary_messages(document):
+    """The messages of the one completion that yields ``document``'s summary, after any map-reduce rounds."""
+    chunks = document_chunks(document)
+    if len(chunks) <= 1:
+        return document_summary_messages(document.content)
+    return map_reduce_messages(document, chunks)
+
+
+def document_chunks(document):
+    spans = db.session.query(Paragraph.start_offset, Paragraph.end_offset) \
+        .filter_by(document_id=document.id).order_by(Paragraph.start_offset)
+    paragraphs = [document.content[start:end] for start, end in spans] or [document.content]
+    return chunk_paragraphs(paragraphs, app.config['SUMMARY_CHUNK_TOKENS'])
+
+
+def map_reduce_messages(document, chunks):
+    """Summarize the chunks and run the intermediate reduce rounds; returns the final reduce prompt.
+
+    Chunk summaries are kept in ChunkSummary, so only chunks whose text changed are sent again.
+    A concurrent summary of the same document may store a chunk first; its row is kept.
+    """
+    def complete(messages):
+        with app.app_context():  # chunk calls run on pool threads
+            return chat_completion(messages)
+
+    summarizer = MapReduceSummarizer(complete, app.config['SUMMARY_CHUNK_TOKENS'],
+                                     app.config['SUMMARY_MAX_CONCURRENCY'])
+    stored = {row.content_hash: row.summary for row in ChunkSummary.query.filter_by(document_id=document.id)}
+    summaries, created = summarizer.map(chunks, stored)
+    if created:
+        db.session.execute(
+            sqlite_insert(ChunkSummary).on_conflict_do_nothing(
+                index_elements=[ChunkSummary.document_id, ChunkSummary.content_hash]),
+            [{'document_id': document.id, 'content_hash': content_hash, 'summary': summary}
+             for content_hash, summary in created.items()])
+    db.session.commit()
+    return summarizer.reduce_messages(summaries)
 
 
-def extract_text_from_pdf(filepath):
-    import fitz  # Make sure this import is at the function level if you are patching it in tests
-    text = ""
+def get_keyword_definition(keyword):
     try:
-        doc = fitz.open(filepath)
-        for page in doc:
-            text += page.get_text()
+        return chat_completion([
+            {"role": "system", "content": "You are an intelligent assistant."},
+            {"role": "user", "content": f"Define the word: {keyword}."}
+        ])
     except Exception as e:
-        print(f"Failed to extract text: {e}")
-    return text
-
-def extract_text_from_image(filepath):
-    return pytesseract.image_to_string(Image.open(filepath))
+        # Handle exceptions or log error and return an informative message or raise the error
+        print(f"An error occurred: {str(e)}")
+        raise
 
 
-def extract_text_from_txt(filepath):
-    with open(filepath, 'r', encoding='utf-8') as file:
-        text = file.read()
-    return text
+@app.route('/api/cache/llm', methods=['GET'])
+def llm_cache_stats():
+    return jsonify(llm_cache.stats()), 200
 
 
-def extract_text_from_docx(filepath):
-    try:
-        doc = DocxDocument(filepath)
-        return '\n'.join(para.text for para in doc.paragraphs if para.text)
-    except Exception as e:
-        print(f"Error reading {filepath}: {str(e)}")
-        return ''
+@app.route('/api/cache/llm', methods=['DELETE'])
+def invalidate_llm_cache():
+    removed = llm_cache.invalidate(request.args.get('model'))
+    return jsonify({'message': 'LLM cache cleared', 'removed': removed}), 200
 
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()  # Ensure database tables are created
-    app.run(debug=True)
+    create_app().run(debug=True)
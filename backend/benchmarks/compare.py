@@ -0,0 +1,57 @@
+"""Compare two benchmark result files by median time.
+
+    python -m benchmarks.compare baseline.json results.json --fail-above 1.2
+
+Prints new/old median ratios for every measurement present in both files; with
+``--fail-above`` the exit status is 1 when any ratio exceeds the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def medians(results):
+    """``{name: median ms}`` for every measurement in a results file."""
+    flat = {}
+    for extension, entry in results.get('ingestion', {}).items():
+        flat[f'ingestion.{extension}.total'] = entry['total']['medianMs']
+        for stage, stats in entry['stages'].items():
+            flat[f'ingestion.{extension}.{stage}'] = stats['medianMs']
+    for size, queries in results.get('queries', {}).items():
+        for name, stats in queries.items():
+            flat[f'queries.{size}.{name}'] = stats['medianMs']
+    return flat
+
+
+def compare(old, new):
+    """``(name, old ms, new ms, ratio)`` for the measurements in both results."""
+    old, new = medians(old), medians(new)
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] else float('inf') if new[name] else 1.0
+        rows.append((name, old[name], new[name], ratio))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--fail-above', type=float, help='exit 1 if any new/old median ratio is above this')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as old, open(args.new) as new:
+        rows = compare(json.load(old), json.load(new))
+    width = max((len(name) for name, *_ in rows), default=0)
+    regressions = []
+    for name, old_ms, new_ms, ratio in rows:
+        flag = ''
+        if args.fail_above is not None and ratio > args.fail_above:
+            regressions.append(name)
+            flag = '  <-- slower'
+        print(f'{name:<{width}}  {old_ms:>10.3f}  {new_ms:>10.3f}  {ratio:>6.2f}x{flag}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Deterministic synthetic documents for the benchmarks.
+
+The same seed always produces the same text, so numbers from two runs measure the code and
+not the data. Nouns are pseudo-words drawn with Zipf-like weights, which gives the keyword
+and full-text indexes a realistic mix of very common and very rare terms.
+"""
+import random
+from itertools import accumulate, product
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'po', 'da', 'fe', 'gu', 'hi', 'ja', 'xo']
+ADJECTIVES = {
+    'positive': ['excellent', 'great', 'good', 'happy', 'wonderful', 'reliable'],
+    'negative': ['terrible', 'bad', 'poor', 'awful', 'broken', 'disappointing'],
+    'neutral': ['blue', 'annual', 'local', 'northern', 'weekly', 'wooden'],
+}
+# TextBlob-like (polarity, subjectivity) for each mood, used when rows are generated without the NLP stage
+SCORES = {'positive': (0.6, 0.7), 'negative': (-0.6, 0.7), 'neutral': (0.0, 0.1)}
+VERBS = ['reviewed', 'shipped', 'approved', 'described', 'replaced', 'measured', 'audited', 'delivered']
+
+
+class CorpusGenerator:
+    """Sentences of the form "The <adjective> <noun> <verb> the <noun> of <Noun>."."""
+
+    def __init__(self, seed=0, vocabulary=5000, sentences_per_paragraph=5):
+        self.random = random.Random(seed)
+        self.sentences_per_paragraph = sentences_per_paragraph
+        words = (''.join(parts) for parts in product(SYLLABLES, repeat=3))
+        self.nouns = [word for word, _ in zip(words, range(vocabulary))]
+        self.noun_weights = list(accumulate(1 / rank for rank in range(1, len(self.nouns) + 1)))
+
+    def _noun(self):
+        return self.random.choices(self.nouns, cum_weights=self.noun_weights)[0]
+
+    def sentence(self):
+        """``(text, mood, keywords)`` for one sentence."""
+        mood = self.random.choice(('positive', 'negative', 'neutral'))
+        subject, obj, place = self._noun(), self._noun(), self._noun()
+        text = (f"The {self.random.choice(ADJECTIVES[mood])} {subject} {self.random.choice(VERBS)} "
+                f"the {obj} of {place.capitalize()}.")
+        return text, mood, [subject, obj, place]
+
+    def paragraphs(self, sentences):
+        """``sentences`` sentences grouped into paragraphs, each a list of ``sentence()`` tuples."""
+        result = []
+        while sentences > 0:
+            size = min(self.sentences_per_paragraph, sentences)
+            result.append([self.sentence() for _ in range(size)])
+            sentences -= size
+        return result
+
+    def text(self, sentences):
+        return '\n\n'.join(' '.join(text for text, _, _ in paragraph) for paragraph in self.paragraphs(sentences))
+
+    def analyzed_paragraphs(self, sentences):
+        """Rows in the shape ``analyze_text`` yields, for filling a database without the NLP stage."""
+        # Imported here: ingestion reads Config, which the runner points at its own database first
+        from ingestion import Sentiment
+
+        scores = {mood: Sentiment(mood, *score) for mood, score in SCORES.items()}
+        for paragraph in self.paragraphs(sentences):
+            analyzed = [(text, scores[mood], keywords) for text, mood, keywords in paragraph]
+            moods = [mood for _, mood, _ in paragraph]
+            yield ' '.join(text for text, _, _ in paragraph), scores[max(set(moods), key=moods.count)], analyzed
+
+
+def write_txt(path, text):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def write_docx(path, text):
+    from docx import Document as DocxDocument
+    document = DocxDocument()
+    for paragraph in text.split('\n\n'):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_pdf(path, text, lines_per_page=60, chars_per_line=95):
+    import fitz
+    lines = []
+    for paragraph in text.split('\n\n'):
+        line = ''
+        for word in paragraph.split():
+            if line and len(line) + len(word) + 1 > chars_per_line:
+                lines.append(line)
+                line = ''
+            line = f'{line} {word}' if line else word
+        lines.extend([line, ''])
+    document = fitz.open()
+    for start in range(0, len(lines), lines_per_page):
+        page = document.new_page()
+        for number, line in enumerate(lines[start:start + lines_per_page]):
+            page.insert_text((40, 40 + 12 * number), line, fontsize=9)
+    document.save(path)
+    document.close()
+
+
+WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf}
@@ -0,0 +1,209 @@
+"""Ingestion and query benchmarks against a throwaway SQLite database.
+
+Run from backend/::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Ingestion runs ``ingest_file`` on generated txt/docx/pdf files and reports the per-stage
+times from ExtractionReport. The query benchmarks fill the database to each ``--sizes``
+sentence count in turn (rows are generated directly, skipping the NLP stage) and time the
+endpoints through the Flask test client. OpenAI and Google are stubbed, so no network is used.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+from benchmarks.corpus import WRITERS, CorpusGenerator
+
+USER_ID = 'benchmark'
+SENTENCES_PER_DOCUMENT = 1000
+
+
+def summarize(samples):
+    """Milliseconds statistics for a list of durations in seconds."""
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'minMs': round(ordered[0] * 1000, 3),
+        'medianMs': round(statistics.median(ordered) * 1000, 3),
+        'p95Ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        'meanMs': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def stub_external_services():
+    """Patch the OpenAI client and the Google search call with canned, instant responses."""
+    from app import app as flask_app  # noqa: F401  (the patch targets need the module loaded)
+    completion = mock.Mock()
+    completion.choices = [mock.Mock(message=mock.Mock(content='Benchmark summary.'))]
+    client = mock.Mock()
+    client.chat.completions.create.return_value = completion
+    search = mock.Mock(status_code=200)
+    search.json.return_value = {'items': [{'link': f'https://example.com/{number}'} for number in range(10)]}
+    return [mock.patch('app.get_openai_client', return_value=client),
+            mock.patch('requests.Session.get', return_value=search)]
+
+
+def bench_ingestion(formats, sentences, repeat, workdir, seed):
+    from app import app, ingest_file
+    from ingestion import ExtractionReport
+
+    text = CorpusGenerator(seed).text(sentences)
+    results = {}
+    for extension in formats:
+        path = os.path.join(workdir, f'ingest.{extension}')
+        WRITERS[extension](path, text)
+        runs = []
+        for number in range(repeat):
+            report = ExtractionReport()
+            started = time.perf_counter()
+            with app.app_context():
+                ingest_file(path, f'ingest-{number}.{extension}', USER_ID, report)
+            runs.append((time.perf_counter() - started, report.to_dict()['stageSeconds']))
+        results[extension] = {
+            'sentences': sentences,
+            'bytes': os.path.getsize(path),
+            'total': summarize([seconds for seconds, _ in runs]),
+            'stages': {stage: summarize([stages[stage] for _, stages in runs]) for stage in runs[0][1]},
+        }
+    return results
+
+
+def populate(generator, sentences):
+    """Add generated documents until the benchmark user has ``sentences`` sentences."""
+    from app import app, store_document
+    from models import Document, Paragraph, Sentence, db
+
+    with app.app_context():
+        existing = db.session.query(Sentence.id).join(Paragraph).join(Document) \
+            .filter(Document.user_id == USER_ID).count()
+        started = time.perf_counter()
+        number = db.session.query(Document.id).count()
+        while existing < sentences:
+            size = min(SENTENCES_PER_DOCUMENT, sentences - existing)
+            store_document(f'corpus-{number}.txt', USER_ID, generator.analyzed_paragraphs(size))
+            existing += size
+            number += 1
+        return time.perf_counter() - started
+
+
+def query_cases(generator):
+    """``(name, method, url, payload)`` for each timed request."""
+    common, middle = generator.nouns[0], generator.nouns[len(generator.nouns) // 2]
+    return [
+        ('documents.list', 'get', f'/api/documents/user/{USER_ID}?limit=100', None),
+        ('documents.listAll', 'get', f'/api/documents/user/{USER_ID}', None),
+        ('filter.sentiment.page', 'get', f'/api/filter/sentiment/negative?userId={USER_ID}&limit=100', None),
+        ('search.keyword.common', 'post', '/api/search/keyword', {'keyword': common}),
+        ('search.keyword.rare', 'post', '/api/search/keyword', {'keyword': middle}),
+        ('search.keyword.and', 'post', '/api/search/keyword', {'terms': [common, middle], 'mode': 'and'}),
+        ('search.fulltext', 'get', f'/api/search/fulltext?userId={USER_ID}&q={common}', None),
+        ('document.keywords', 'post', '/document/keywords', {'filename': 'corpus-0.txt', 'weighting': 'tfidf'}),
+        ('document.summary', 'post', '/document/summary', {'filename': 'corpus-0.txt'}),
+        ('search.google', 'post', '/search', {'keyword': common}),
+    ]
+
+
+def bench_queries(generator, repeat):
+    from app import app
+
+    client = app.test_client()
+    results = {}
+    for name, method, url, payload in query_cases(generator):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, json=payload)
+            response.get_data()  # streamed bodies are generated here
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{name}: {url} returned {response.status_code}')
+        results[name] = summarize(samples)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def run(args):
+    from app import app, db
+
+    results = {'meta': metadata(), 'settings': vars(args).copy(), 'ingestion': {}, 'populate': {}, 'queries': {}}
+    with app.app_context():
+        db.create_all()
+    if args.formats:
+        results['ingestion'] = bench_ingestion(args.formats, args.ingest_sentences, args.repeat, args.workdir,
+                                               args.seed)
+    with app.app_context():  # the query databases hold generated documents only
+        db.drop_all()
+        db.create_all()
+    generator = CorpusGenerator(args.seed)
+    for size in sorted(args.sizes):
+        results['populate'][str(size)] = round(populate(generator, size), 3)
+        results['queries'][str(size)] = bench_queries(generator, args.repeat)
+        print(f'{size} sentences: done', file=sys.stderr)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10_000, 100_000, 1_000_000],
+                        help='sentence counts to run the query benchmarks at')
+    parser.add_argument('--formats', nargs='*', default=sorted(WRITERS), choices=sorted(WRITERS))
+    parser.add_argument('--ingest-sentences', type=int, default=2000, help='sentences per ingested file')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='where the database and generated files go (default: a temp dir)')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as temporary:
+        args.workdir = args.workdir or temporary
+        # Config reads these when app is first imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(os.path.abspath(args.workdir), 'benchmark.db')
+        os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+        os.environ['OCR_CACHE_DIR'] = ''
+        os.environ['SEMANTIC_INDEX_DIR'] = os.path.join(os.path.abspath(args.workdir), 'semantic_index')
+        patches = stub_external_services()
+        for patch in patches:
+            patch.start()
+        try:
+            results = run(args)
+        finally:
+            for patch in patches:
+                patch.stop()
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,91 @@ import os
 class Config(object):
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     # Directly use BASE_DIR since Config.BASE_DIR cannot be used within the class definition
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'app.db')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB limit
+    # Chunked uploads (/api/uploads) bypass MAX_CONTENT_LENGTH: each PUT carries one chunk of at most
+    # UPLOAD_CHUNK_BYTES, up to UPLOAD_MAX_BYTES in total; unfinished uploads idle for the TTL are discarded.
+    UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_BYTES', 8 * 1024 * 1024))
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 8 * 1024 ** 3))
+    UPLOAD_SESSION_TTL_SECONDS = int(os.getenv('UPLOAD_SESSION_TTL_SECONDS', 24 * 60 * 60))
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key_if_none_found')
     # Define the endpoint for the login page
     # For example, if your login route is '/login', then LOGIN_VIEW = 'login'
     LOGIN_VIEW = 'login'
+    # spaCy ingestion stage: paragraphs are parsed in batches through nlp.pipe.
+    # Set NLP_N_PROCESS to -1 to use one process per CPU core.
+    NLP_MODEL = os.getenv('NLP_MODEL', 'en_core_web_sm')
+    NLP_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', 64))
+    NLP_N_PROCESS = int(os.getenv('NLP_N_PROCESS', 1))
+    # Components we never read from; with the parser gone, sentence boundaries come from 'senter'
+    NLP_EXCLUDED_PIPES = [pipe for pipe in os.getenv('NLP_EXCLUDED_PIPES', 'parser,ner').split(',') if pipe]
+    # Paragraph/sentence/keyword rows buffered per document before they are bulk inserted
+    INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 2000))
+    # Ingestion jobs: workers poll the job table at this interval even without a wake-up, and renew
+    # the lease of a job they run every JOB_HEARTBEAT_SECONDS; a 'running' job whose last renewal is
+    # older than the lease is treated as orphaned by a crash and re-run.
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 30 * 60))
+    JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 60))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    # 'thread' runs ingestion on worker threads; 'process' runs extraction/NLP in a process pool
+    # (one spaCy model per process) and keeps database writes in the parent.
+    INGEST_WORKER_MODE = os.getenv('INGEST_WORKER_MODE', 'thread')
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1))
+    # Start method of the ingestion and PDF process pools. Forking a process that already runs
+    # worker threads can copy a lock some other thread holds, so workers are spawned instead.
+    INGEST_MP_CONTEXT = os.getenv('INGEST_MP_CONTEXT', 'spawn')
+    # Backpressure: /upload answers 429 once INGEST_QUEUE_MAX_JOBS jobs are queued, or INGEST_USER_MAX_QUEUED
+    # for one user. Workers take jobs round robin across users, at most INGEST_USER_MAX_RUNNING per user.
+    INGEST_QUEUE_MAX_JOBS = int(os.getenv('INGEST_QUEUE_MAX_JOBS', 1000))
+    INGEST_USER_MAX_QUEUED = int(os.getenv('INGEST_USER_MAX_QUEUED', 200))
+    INGEST_USER_MAX_RUNNING = int(os.getenv('INGEST_USER_MAX_RUNNING', max(1, INGEST_WORKERS - 1)))
+    # OpenAI response cache: in-process LRU in front of the llm_cache_entry table
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 512))
+    LLM_CACHE_DB_MAX_ENTRIES = int(os.getenv('LLM_CACHE_DB_MAX_ENTRIES', 50000))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    # Documents larger than one chunk are summarized map-reduce style, chunk calls running concurrently
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 3000))
+    SUMMARY_MAX_CONCURRENCY = int(os.getenv('SUMMARY_MAX_CONCURRENCY', 4))
+    # /document/summary/stream sends an SSE comment after this many idle seconds, e.g. during the map phase
+    SUMMARY_STREAM_HEARTBEAT_SECONDS = float(os.getenv('SUMMARY_STREAM_HEARTBEAT_SECONDS', 15))
+    # PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted PDF_PAGES_PER_TASK pages at a time
+    # by a pool of PDF_WORKERS processes, one pool per process shared by all its ingestion jobs
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 200))
+    PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 50))
+    # OCR: images are grayscaled, scans above OCR_TARGET_DPI are downscaled, tall scans are cut
+    # into OCR_TILE_HEIGHT bands and frames/bands run through up to OCR_WORKERS tesseract processes,
+    # a limit shared by all ingestion jobs of a process.
+    # Results are cached on disk by content hash, least recently used files deleted beyond
+    # OCR_CACHE_MAX_BYTES (0 for no limit); set OCR_CACHE_DIR to '' to disable the cache.
+    OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', 300))
+    OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', 2000))
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+    OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.join(BASE_DIR, 'ocr_cache'))
+    OCR_CACHE_MAX_BYTES = int(os.getenv('OCR_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Path of the tesseract executable; on Linux/macOS usually just 'tesseract' (found on PATH)
+    TESSERACT_CMD = os.getenv('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+    # Store document text zlib-compressed; paragraphs and sentences are offsets into it either way
+    COMPRESS_DOCUMENTS = os.getenv('COMPRESS_DOCUMENTS', '').lower() in ('1', 'true', 'yes')
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))
+    # Google search proxy (/search): pooled keep-alive connections, per-attempt timeouts within an
+    # overall deadline, jittered retries, and results cached by normalized query
+    SEARCH_CONNECT_TIMEOUT = float(os.getenv('SEARCH_CONNECT_TIMEOUT', 3.05))
+    SEARCH_READ_TIMEOUT = float(os.getenv('SEARCH_READ_TIMEOUT', 5))
+    SEARCH_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEADLINE_SECONDS', 10))
+    SEARCH_MAX_RETRIES = int(os.getenv('SEARCH_MAX_RETRIES', 2))
+    SEARCH_BACKOFF_SECONDS = float(os.getenv('SEARCH_BACKOFF_SECONDS', 0.25))
+    SEARCH_CACHE_TTL_SECONDS = int(os.getenv('SEARCH_CACHE_TTL_SECONDS', 60 * 60))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 1024))
+    SEARCH_POOL_SIZE = int(os.getenv('SEARCH_POOL_SIZE', 10))
+    # Semantic search: sentence and document embeddings, memory-mapped from SEMANTIC_INDEX_DIR and
+    # updated as documents are stored; set SEMANTIC_INDEX_DIR to '' to disable the index.
+    SEMANTIC_INDEX_DIR = os.getenv('SEMANTIC_INDEX_DIR', os.path.join(BASE_DIR, 'semantic_index'))
+    EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 128))
+    # Listing endpoints read rows in keyset batches of this size while streaming the response
+    LIST_BATCH_ROWS = int(os.getenv('LIST_BATCH_ROWS', 500))
+    # Store each ingestion job's stage timings and queue wait on its Document (the trace column)
+    INGEST_TRACE = os.getenv('INGEST_TRACE', '').lower() in ('1', 'true', 'yes')
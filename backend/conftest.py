@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Tests create and drop every table, so point the app at a throwaway database before it is
+# imported, whatever DATABASE_URL says, instead of the development app.db
+DATABASE_DIR = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DATABASE_DIR, 'test.db')
+
+import app as app_module  # noqa: E402
+from semantic import SemanticIndex  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """A test client on freshly created tables, saving uploads to the test's own directory."""
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        app_module.llm_cache.invalidate()  # the generation row is new, so drop answers cached under the old one
+        yield app_module.app.test_client()
+        app_module.db.session.remove()
+        app_module.db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def semantic_index(tmp_path, monkeypatch):
+    """Send the embeddings of documents a test stores to its own directory, not SEMANTIC_INDEX_DIR.
+
+    Every test database reuses the same document ids, so rows left in the development index
+    would show up as stale matches there.
+    """
+    index = SemanticIndex(str(tmp_path / 'semantic_index'), app_module.app.config['EMBEDDING_DIMENSIONS'])
+    monkeypatch.setattr(app_module, 'semantic_index', index)
+    return index
@@ -0,0 +1,111 @@
+from sqlalchemy import DDL, event, text
+
+from models import db, Paragraph, Sentence
+
+# FTS5 tables index span text in place (external content), so the text is not stored twice.
+# Spans only hold offsets, so the content each FTS table reads is a view slicing it out of the
+# document (FTS_VIEWS). Rows are indexed by ``index_spans`` as they are written, since the document
+# content is only complete once every chunk is in; a trigger removes them before a span is deleted.
+FTS_TABLES = {'sentence': 'sentence_fts', 'paragraph': 'paragraph_fts'}
+FTS_VIEWS = {'sentence': 'sentence_text', 'paragraph': 'paragraph_text'}
+
+# Same expression as models.span_text; plain text is sliced natively, compressed content by the UDF
+_SPAN_TEXT = ("CASE WHEN typeof(d.content) = 'blob' THEN span_text(d.content, {0}.start_offset, {0}.end_offset) "
+              "ELSE substr(d.content, {0}.start_offset + 1, {0}.end_offset - {0}.start_offset) END")
+_VIEW_QUERIES = {
+    'sentence': f"SELECT s.id AS id, p.document_id AS document_id, {_SPAN_TEXT.format('s')} AS content "
+                "FROM sentence s JOIN paragraph p ON p.id = s.paragraph_id JOIN document d ON d.id = p.document_id",
+    'paragraph': f"SELECT p.id AS id, p.document_id AS document_id, {_SPAN_TEXT.format('p')} AS content "
+                 "FROM paragraph p JOIN document d ON d.id = p.document_id",
+}
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+
+def _create_statements(source, fts):
+    view = FTS_VIEWS[source]
+    return [
+        f"CREATE VIEW IF NOT EXISTS {view} AS {_VIEW_QUERIES[source]}",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"content, content='{view}', content_rowid='id', tokenize='porter unicode61')",
+        # BEFORE, so the view still has the text that was indexed
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_bd BEFORE DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) "
+        f"SELECT 'delete', old.id, content FROM {view} WHERE id = old.id; END",
+    ]
+
+
+def _drop_statements(source, fts):
+    return [f"DROP TRIGGER IF EXISTS {fts}_bd", f"DROP TABLE IF EXISTS {fts}",
+            f"DROP VIEW IF EXISTS {FTS_VIEWS[source]}"]
+
+
+# The views read document, paragraph and sentence, so everything hangs off sentence, the table
+# created last and dropped first of the three.
+for model in (Sentence, Paragraph):
+    source, fts = model.__tablename__, FTS_TABLES[model.__tablename__]
+    for statement in _create_statements(source, fts):
+        event.listen(Sentence.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in _drop_statements(source, fts):
+        event.listen(Sentence.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def include_in_migrations(object_, name, type_, reflected, compare_to):
+    """Alembic ``include_object`` hook: the FTS tables, their shadow tables and views are managed here, not by autogenerate."""
+    return not (type_ == 'table' and (name in FTS_VIEWS.values() or
+                                      any(name == fts or name.startswith(fts + '_') for fts in FTS_TABLES.values())))
+
+
+def create_fulltext_tables():
+    """Create the views, FTS tables and triggers on a database whose source tables already exist."""
+    for source, fts in FTS_TABLES.items():
+        for statement in _create_statements(source, fts):
+            db.session.execute(text(statement))
+
+
+def rebuild_fulltext_index():
+    """Re-index every row, e.g. for data written before the FTS tables existed."""
+    for fts in FTS_TABLES.values():
+        db.session.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def index_spans(source, rows):
+    """Add freshly inserted spans to the FTS index; ``rows`` are ``{'rowid': id, 'content': text}`` dicts.
+
+    The text is passed in rather than read back through the view, which cannot slice it yet
+    while a document is still being written.
+    """
+    if rows and db.session.get_bind().dialect.name == 'sqlite':
+        fts = FTS_TABLES[source]
+        db.session.execute(text(f"INSERT INTO {fts}(rowid, content) VALUES (:rowid, :content)"), rows)
+
+
+def search_fulltext(query, user_id, scope, limit, offset):
+    """Run an FTS5 ``MATCH`` query over one user's sentences or paragraphs.
+
+    ``query`` uses FTS5 syntax, so ``"exact phrase"``, ``prefix*``, ``AND``/``OR``/``NOT`` and
+    ``NEAR`` all work. Results are ordered by FTS5's bm25 rank (best first) and carry a
+    snippet plus the fully highlighted text. Raises ``sqlalchemy.exc.OperationalError`` for
+    malformed queries.
+    """
+    fts = FTS_TABLES[scope]
+    if scope == 'sentence':
+        joins = f"JOIN sentence s ON s.id = {fts}.rowid JOIN paragraph p ON p.id = s.paragraph_id"
+        columns = 's.id AS id, p.id AS "paragraphId"'
+    else:
+        joins = f"JOIN paragraph p ON p.id = {fts}.rowid"
+        columns = 'p.id AS id, p.id AS "paragraphId"'
+    statement = text(
+        f'SELECT {columns}, d.id AS "documentId", d.filename AS filename, '
+        f"snippet({fts}, 0, :open, :close, '…', :tokens) AS snippet, "
+        f"highlight({fts}, 0, :open, :close) AS highlight, bm25({fts}) AS rank "
+        f"FROM {fts} {joins} JOIN document d ON d.id = p.document_id "
+        f"WHERE {fts} MATCH :query AND d.user_id = :user_id "
+        f"ORDER BY rank LIMIT :limit OFFSET :offset")
+    rows = db.session.execute(statement, {
+        'query': query, 'user_id': user_id, 'limit': limit, 'offset': offset,
+        'open': HIGHLIGHT_OPEN, 'close': HIGHLIGHT_CLOSE, 'tokens': SNIPPET_TOKENS,
+    })
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,501 @@
+import hashlib
+import multiprocessing
+import pickle
+import tempfile
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from config import Config
+from ocr import OCRCache, iter_frames, ocr_images, preprocess_image, split_tiles
+
+# spaCy, TextBlob (NLTK) and python-docx are imported where they are first used: together
+# they account for most of the import time, and a process that never ingests never needs them.
+_nlp = None
+_nlp_lock = threading.Lock()
+# Overridden to 1 inside pool workers, which must not start nested process pools
+nlp_n_process = Config.NLP_N_PROCESS
+pdf_workers = Config.PDF_WORKERS
+ocr_workers = Config.OCR_WORKERS
+# One PDF extraction pool per process, shared by every job, so concurrent jobs never run
+# more than pdf_workers extraction processes between them
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+# Analyzed documents up to this size stay in memory while they wait for the database writer
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+
+ocr_cache = OCRCache(Config.OCR_CACHE_DIR, (Config.OCR_TARGET_DPI, Config.OCR_TILE_HEIGHT),
+                     Config.OCR_CACHE_MAX_BYTES)
+
+
+def get_nlp():
+    """Load the spaCy pipeline on first use, once per process."""
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+            nlp = spacy.load(Config.NLP_MODEL, exclude=Config.NLP_EXCLUDED_PIPES)
+            if 'senter' in nlp.disabled:
+                nlp.enable_pipe('senter')  # cheap sentence boundaries in place of the excluded parser
+            _nlp = nlp
+    return _nlp
+
+
+def init_worker():
+    """Process pool initializer: load the model up front so every job in this worker reuses it."""
+    global nlp_n_process, pdf_workers, ocr_workers
+    nlp_n_process = 1
+    pdf_workers = 1
+    ocr_workers = 1
+    get_nlp()
+
+
+def warm_up():
+    """Load everything ingestion needs up front instead of on the first upload.
+
+    A pre-fork server calls this once in the master process so the workers share the loaded
+    model pages copy-on-write.
+    """
+    get_nlp()
+    score_sentiment('warm up')  # imports TextBlob and loads its lexicon
+
+
+Sentiment = namedtuple('Sentiment', ['label', 'polarity', 'subjectivity'])
+
+
+def analyze_sentiment(text):
+    """Simple sentiment analysis using TextBlob."""
+    return score_sentiment(text).label
+
+
+def sentiment_label(polarity):
+    return 'positive' if polarity > 0 else 'negative' if polarity < 0 else 'neutral'
+
+
+def score_sentiment(text):
+    """Score one piece of text with TextBlob, keeping the numeric polarity and subjectivity."""
+    from textblob import TextBlob
+    blob = TextBlob(text)
+    polarity, subjectivity = blob.sentiment.polarity, blob.sentiment.subjectivity
+    return Sentiment(sentiment_label(polarity), polarity, subjectivity)
+
+
+def aggregate_sentiment(weighted_scores):
+    """Length-weighted mean of ``(Sentiment, weight)`` pairs, so larger parts count for more.
+
+    This is how paragraph and document scores are derived from the sentence scores
+    instead of running TextBlob over the same text again.
+    """
+    total = polarity = subjectivity = 0.0
+    for sentiment, weight in weighted_scores:
+        total += weight
+        polarity += sentiment.polarity * weight
+        subjectivity += sentiment.subjectivity * weight
+    if not total:
+        return Sentiment('neutral', 0.0, 0.0)
+    return Sentiment(sentiment_label(polarity / total), polarity / total, subjectivity / total)
+
+
+def split_into_paragraphs(text):
+    """Split text into paragraphs based on newline characters."""
+    return text.split('\n\n')
+
+
+def split_into_sentences(paragraph):
+    """Split paragraph into sentences using spaCy."""
+    doc = get_nlp()(paragraph)
+    return [sent.text for sent in doc.sents]
+
+
+KEYWORD_POS = {'NOUN', 'PROPN'}
+
+
+def extract_keywords(sentence):
+    """Extract keywords from a sentence using spaCy."""
+    doc = get_nlp()(sentence)
+    return [token.lemma_ for token in doc if token.pos_ in KEYWORD_POS]
+
+
+class StageTimer:
+    """Exclusive wall time per ingestion stage.
+
+    Stages nest the way the streaming pipeline does (spaCy pulls paragraphs, which pull pages
+    from extraction); entering a stage pauses the enclosing one, so each second is charged to
+    exactly one stage. The spaCy parse yields sentence boundaries and POS tags together and is
+    charged to 'splitting'; 'keywords' is picking the NOUN/PROPN lemmas out of it.
+    """
+
+    STAGES = ('extraction', 'splitting', 'keywords', 'sentiment', 'db')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self._stack = []
+        self._since = None
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._since
+        self._stack.append(name)
+        self._since = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.seconds[self._stack.pop()] += now - self._since
+            self._since = now
+
+    def timed(self, name, iterable):
+        """Yield from ``iterable``, charging the time spent producing each item to ``name``."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                return
+            yield item
+
+    def to_dict(self):
+        return {stage: round(seconds, 4) for stage, seconds in self.seconds.items()}
+
+
+_EXHAUSTED = object()
+
+
+def analyze_paragraphs(paragraphs, timer=None):
+    """Parse paragraphs once, in batches, and yield their sentences and keywords.
+
+    ``paragraphs`` may be any iterable, including a generator fed by page-by-page extraction.
+    Yields ``(paragraph_text, [(sentence_text, [lemma, ...]), ...])`` in input order.
+    Sentence boundaries and NOUN/PROPN lemmas both come from the same parse.
+    """
+    timer = timer if timer is not None else StageTimer()
+    docs = get_nlp().pipe(((paragraph, paragraph) for paragraph in paragraphs), as_tuples=True,
+                          batch_size=Config.NLP_BATCH_SIZE, n_process=nlp_n_process)
+    for doc, paragraph_text in timer.timed('splitting', docs):
+        with timer.stage('keywords'):
+            sentences = [
+                (sent.text, [token.lemma_ for token in sent if token.pos_ in KEYWORD_POS])
+                for sent in doc.sents
+            ]
+        yield paragraph_text, sentences
+
+
+def iter_paragraphs(pieces):
+    """Split a stream of text pieces (e.g. PDF pages) into paragraphs as they arrive.
+
+    Produces exactly ``''.join(pieces).split('\\n\\n')`` while only buffering the current paragraph.
+    """
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        parts = buffer.split('\n\n')
+        buffer = parts.pop()
+        yield from parts
+    yield buffer
+
+
+def paragraph_hash(text):
+    """sha256 hex digest of a paragraph's text, stored on Paragraph to spot unchanged paragraphs."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def analyze_text(pieces, timer=None, unchanged=None):
+    """Run sentiment and the spaCy stage over extracted text.
+
+    ``pieces`` is the text itself or an iterable of consecutive fragments of it, such as
+    the pages from ``iter_text``. Returns a generator of
+    ``(paragraph_text, Sentiment, [(sentence_text, Sentiment, [keyword, ...]), ...])``
+    tuples, which is the shape the bulk writer in app.py consumes. TextBlob only sees each
+    sentence once; paragraph scores are aggregated from them. Stage times go to ``timer``.
+
+    ``unchanged`` maps paragraph hashes to how many paragraphs with that text are already
+    stored. That many occurrences of each are not analyzed again and come out as
+    ``(paragraph_text, None, None)``, still in document order.
+    """
+    timer = timer if timer is not None else StageTimer()
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    paragraphs = iter_paragraphs(timer.timed('extraction', pieces))
+    remaining = Counter(unchanged or {})
+    pending = deque()  # with ``unchanged``: (paragraph_text, is unchanged) read ahead by nlp.pipe, in order
+
+    def changed_paragraphs():
+        for paragraph in paragraphs:
+            digest = paragraph_hash(paragraph)
+            known = remaining[digest] > 0
+            if known:
+                remaining[digest] -= 1
+            pending.append((paragraph, known))
+            if not known:
+                yield paragraph
+
+    for paragraph_text, sentences in analyze_paragraphs(changed_paragraphs() if remaining else paragraphs, timer):
+        while pending:  # unchanged paragraphs come out just before the next analyzed one
+            text, known = pending.popleft()
+            if not known:
+                break
+            yield text, None, None
+        with timer.stage('sentiment'):
+            sentences = [(sentence_text, score_sentiment(sentence_text), keywords)
+                         for sentence_text, keywords in sentences]
+        paragraph_sentiment = aggregate_sentiment((sentiment, len(text)) for text, sentiment, _ in sentences)
+        yield paragraph_text, paragraph_sentiment, sentences
+    for text, _ in pending:
+        yield text, None, None
+
+
+def analyze_file(filepath, filename, unchanged=None):
+    """Everything CPU-bound about a file, with no database access, so it can run in a worker process.
+
+    Returns ``(analyzed_paragraphs, extraction_report_dict)``; ``unchanged`` is as for ``analyze_text``.
+    """
+    report = ExtractionReport()
+    paragraphs = list(analyze_text(iter_text(filepath, filename, report), report.stages, unchanged))
+    return paragraphs, report.to_dict()
+
+
+def paragraph_rows(sentences):
+    """Rows an analyzed paragraph with ``sentences`` becomes: itself, its sentences and their keywords."""
+    return 1 + sum(1 + len(keywords) for _, _, keywords in sentences or ())
+
+
+def spool_analysis(analyzed_paragraphs, chunk_rows):
+    """Run ``analyzed_paragraphs`` to the end now, keeping it in a temporary file; returns an iterator over it.
+
+    Extraction and NLP then finish before the caller opens its write transaction, which on
+    SQLite locks out every other writer until it commits. Paragraphs are pickled in chunks of
+    about ``chunk_rows`` rows, so memory stays bounded by one chunk; small documents never
+    leave memory.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    chunk, rows = [], 0
+    try:
+        for paragraph in analyzed_paragraphs:
+            chunk.append(paragraph)
+            rows += paragraph_rows(paragraph[2])
+            if rows >= chunk_rows:
+                pickle.dump(chunk, spool, pickle.HIGHEST_PROTOCOL)
+                chunk, rows = [], 0
+        pickle.dump(chunk, spool, pickle.HIGHEST_PROTOCOL)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return _read_spool(spool)
+
+
+def _read_spool(spool):
+    with spool:
+        while True:
+            try:
+                chunk = pickle.load(spool)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class ExtractionReport:
+    """Per-page timings and failures collected while a file is extracted, plus per-stage times."""
+
+    def __init__(self):
+        self.page_seconds = {}
+        self.failures = []
+        self.stages = StageTimer()
+
+    def add(self, page, seconds, error=None):
+        if page is not None:
+            self.page_seconds[page] = seconds
+        if error is not None:
+            self.failures.append({'page': page, 'error': str(error)})
+
+    def to_dict(self):
+        return {
+            'pages': len(self.page_seconds),
+            'seconds': round(sum(self.page_seconds.values()), 4),
+            'pageSeconds': [round(self.page_seconds[page], 4) for page in sorted(self.page_seconds)],
+            'failures': self.failures,
+            'stageSeconds': self.stages.to_dict(),
+        }
+
+
+def iter_text(filepath, filename, report=None):
+    """Yield the text of a file in consecutive pieces: pages for PDFs, blocks for plain text."""
+    report = report if report is not None else ExtractionReport()
+    if filename.lower().endswith('.pdf'):
+        yield from iter_pdf_pages(filepath, report)
+        return
+    started = time.perf_counter()
+    try:
+        if filename.lower().endswith('.txt'):
+            yield from iter_text_file(filepath)
+        else:
+            yield extract_text(filepath, filename)
+    finally:
+        report.add(0, time.perf_counter() - started)
+
+
+def extract_text(filepath, filename):
+    text = ""
+    if filename.lower().endswith('.pdf'):
+        text = extract_text_from_pdf(filepath)
+    elif filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
+        text = ocr_image(filepath)
+    elif filename.lower().endswith('.txt'):
+        text = extract_text_from_txt(filepath)
+    elif filename.lower().endswith('.docx'):
+        text = extract_text_from_docx(filepath)
+    return text
+
+
+def iter_pdf_pages(filepath, report):
+    """Yield PDF text page by page, recording each page's timing and any failure in ``report``.
+
+    Files with at least PDF_PARALLEL_MIN_PAGES pages are split into page ranges that are
+    extracted in a process pool; pages are still yielded in document order, with at most
+    two ranges per worker held in memory.
+    """
+    import fitz  # Make sure this import is at the function level if you are patching it in tests
+    try:
+        doc = fitz.open(filepath)
+    except Exception as e:
+        report.add(None, 0.0, e)
+        return
+    try:
+        if pdf_workers > 1 and len(doc) >= Config.PDF_PARALLEL_MIN_PAGES:
+            yield from _iter_pdf_pages_parallel(filepath, len(doc), report)
+            return
+        for number, page in enumerate(doc):
+            started = time.perf_counter()
+            try:
+                text = page.get_text()
+            except Exception as e:
+                report.add(number, time.perf_counter() - started, e)
+                continue
+            report.add(number, time.perf_counter() - started)
+            yield text
+    finally:
+        doc.close()
+
+
+def _iter_pdf_pages_parallel(filepath, page_count, report):
+    ranges = [(start, min(start + Config.PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, Config.PDF_PAGES_PER_TASK)]
+    pool = pdf_pool()
+    pending = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(extract_pdf_page_range, filepath, start, stop))
+            if len(pending) >= 2 * pdf_workers:
+                yield from _report_pages(pending.popleft().result(), report)
+        while pending:
+            yield from _report_pages(pending.popleft().result(), report)
+    except BrokenProcessPool:
+        discard_pdf_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def pdf_pool():
+    """The process's PDF extraction pool, started on first use."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            context = multiprocessing.get_context(Config.INGEST_MP_CONTEXT)
+            _pdf_pool = ProcessPoolExecutor(max_workers=pdf_workers, mp_context=context)
+        return _pdf_pool
+
+
+def discard_pdf_pool(pool):
+    """Drop a pool whose worker died, so the next job starts a fresh one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _report_pages(pages, report):
+    for number, text, seconds, error in pages:
+        report.add(number, seconds, error)
+        if error is None:
+            yield text
+
+
+def extract_pdf_page_range(filepath, start, stop):
+    """Worker task: ``(page_number, text, seconds, error)`` for pages ``start`` to ``stop - 1``."""
+    import fitz
+    pages = []
+    with fitz.open(filepath) as doc:
+        for number in range(start, stop):
+            started = time.perf_counter()
+            try:
+                pages.append((number, doc.load_page(number).get_text(), time.perf_counter() - started, None))
+            except Exception as e:
+                pages.append((number, '', time.perf_counter() - started, str(e)))
+    return pages
+
+
+def iter_text_file(filepath, block_size=1024 * 1024):
+    with open(filepath, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def extract_text_from_pdf(filepath):
+    report = ExtractionReport()
+    text = ''.join(iter_pdf_pages(filepath, report))
+    for failure in report.failures:
+        print(f"Failed to extract text (page {failure['page']}): {failure['error']}")
+    return text
+
+
+def ocr_image(filepath):
+    """``extract_text_from_image`` behind the content-hash OCR cache."""
+    if not Config.OCR_CACHE_DIR:
+        return extract_text_from_image(filepath)
+    key = ocr_cache.key(filepath)
+    text = ocr_cache.get(key)
+    if text is None:
+        text = extract_text_from_image(filepath)
+        ocr_cache.set(key, text)
+    return text
+
+
+def extract_text_from_image(filepath):
+    """OCR every frame of an image, tall scans tile by tile, on up to ``ocr_workers`` tesseract processes."""
+    image = Image.open(filepath)
+    try:
+        frames = [split_tiles(preprocess_image(frame, Config.OCR_TARGET_DPI), Config.OCR_TILE_HEIGHT)
+                  for frame in iter_frames(image)]
+        texts = iter(ocr_images([tile for tiles in frames for tile in tiles], ocr_workers))
+        return '\n\n'.join(''.join(next(texts) for _ in tiles) for tiles in frames)
+    finally:
+        image.close()
+
+
+def extract_text_from_txt(filepath):
+    with open(filepath, 'r', encoding='utf-8') as file:
+        text = file.read()
+    return text
+
+
+def extract_text_from_docx(filepath):
+    from docx import Document as DocxDocument
+    try:
+        doc = DocxDocument(filepath)
+        return '\n'.join(para.text for para in doc.paragraphs if para.text)
+    except Exception as e:
+        print(f"Error reading {filepath}: {str(e)}")
+        return ''
@@ -0,0 +1,212 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+
+from models import db, IngestionJob, utcnow
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_job(filepath, filename, user_id, content_hash=None, updates_document_id=None):
+    """Persist a new queued ingestion job. The caller commits."""
+    job = IngestionJob(filepath=filepath, filename=filename, user_id=user_id, content_hash=content_hash,
+                       status=JOB_QUEUED, updates_document_id=updates_document_id)
+    db.session.add(job)
+    return job
+
+
+def record_duplicate_job(filename, user_id, content_hash, document):
+    """Persist an already finished job for an upload whose content is ``document``. The caller commits."""
+    now = utcnow()
+    job = IngestionJob(filepath='', filename=filename, user_id=user_id, content_hash=content_hash,
+                       status=JOB_DONE, document_id=document.id, duplicate=True, started_at=now, finished_at=now)
+    db.session.add(job)
+    return job
+
+
+def pending_update(document_id):
+    """A queued or running job that updates ``document_id``, or None."""
+    return IngestionJob.query.filter(IngestionJob.updates_document_id == document_id,
+                                     IngestionJob.status.in_((JOB_QUEUED, JOB_RUNNING))).first()
+
+
+def _claimable(lease_seconds):
+    """Queued jobs, plus running jobs whose lease expired because their worker died.
+
+    A live worker renews its lease (``heartbeat_at``) while the job runs, see ``keep_lease``.
+    """
+    stale_before = utcnow() - timedelta(seconds=lease_seconds)
+    return or_(IngestionJob.status == JOB_QUEUED,
+               and_(IngestionJob.status == JOB_RUNNING, IngestionJob.heartbeat_at < stale_before))
+
+
+def _running(lease_seconds, user_id):
+    """Running jobs of ``user_id`` whose lease has not expired."""
+    stale_before = utcnow() - timedelta(seconds=lease_seconds)
+    return and_(IngestionJob.user_id == user_id, IngestionJob.status == JOB_RUNNING,
+                IngestionJob.heartbeat_at >= stale_before)
+
+
+def _claimed(job_id, attempt):
+    """The job while it still runs under the claim that started its ``attempt``, not a later re-claim."""
+    return and_(IngestionJob.id == job_id, IngestionJob.attempts == attempt, IngestionJob.status == JOB_RUNNING)
+
+
+def next_fair_job_id(lease_seconds, user_limit=None):
+    """The id of the oldest claimable job of the least served user, or None.
+
+    Users are served round robin: first the one with the fewest jobs running, then the one
+    whose last job was claimed longest ago. So a single upload waits behind at most one job of
+    each other user, not behind a whole bulk upload. Users already running ``user_limit`` jobs
+    are skipped, which keeps workers free for everyone else.
+    """
+    first_jobs = dict(db.session.execute(
+        select(IngestionJob.user_id, func.min(IngestionJob.id)).where(_claimable(lease_seconds))
+        .group_by(IngestionJob.user_id)).all())
+    if not first_jobs:
+        return None
+    stale_before = utcnow() - timedelta(seconds=lease_seconds)
+    running = dict(db.session.execute(
+        select(IngestionJob.user_id, func.count())
+        .where(IngestionJob.status == JOB_RUNNING, IngestionJob.heartbeat_at >= stale_before,
+               IngestionJob.user_id.in_(first_jobs))
+        .group_by(IngestionJob.user_id)).all())
+    last_claimed = dict(db.session.execute(
+        select(IngestionJob.user_id, func.max(IngestionJob.started_at))
+        .where(IngestionJob.user_id.in_(first_jobs)).group_by(IngestionJob.user_id)).all())
+    candidates = [user_id for user_id in first_jobs if user_limit is None or running.get(user_id, 0) < user_limit]
+    if not candidates:
+        return None
+    user_id = min(candidates, key=lambda user_id: (running.get(user_id, 0), last_claimed.get(user_id) or datetime.min,
+                                                   first_jobs[user_id]))
+    return first_jobs[user_id]
+
+
+def claim_next_job(lease_seconds, max_attempts, user_limit=None):
+    """Atomically move the next job in fair order (see ``next_fair_job_id``) to 'running' and return it, or None.
+
+    The conditional UPDATE only succeeds for one worker, so concurrent workers
+    (threads or processes sharing the database) never run the same job twice, and
+    it re-checks the owner's running count, so ``user_limit`` holds under races too.
+    Jobs that were already attempted ``max_attempts`` times are marked failed.
+
+    The returned job carries ``claimed_attempt``: ``finish_job`` and ``fail_job`` only settle
+    the job while that claim holds, so a worker whose lease expired cannot overwrite the result
+    of the worker that re-claimed it.
+    """
+    while True:
+        job_id = next_fair_job_id(lease_seconds, user_limit)
+        if job_id is None:
+            db.session.commit()
+            return None
+        conditions = [IngestionJob.id == job_id, _claimable(lease_seconds)]
+        if user_limit is not None:
+            owner = select(IngestionJob.user_id).where(IngestionJob.id == job_id).scalar_subquery()
+            running = select(func.count()).select_from(IngestionJob).where(_running(lease_seconds, owner))
+            conditions.append(running.scalar_subquery() < user_limit)
+        now = utcnow()
+        claimed = db.session.execute(
+            update(IngestionJob)
+            .where(*conditions)
+            .values(status=JOB_RUNNING, started_at=now, heartbeat_at=now, finished_at=None,
+                    attempts=IngestionJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            continue  # another worker won the race; try the next one
+        job = db.session.get(IngestionJob, job_id, populate_existing=True)
+        job.claimed_attempt = job.attempts
+        if job.attempts > max_attempts:
+            fail_job(job, f'Gave up after {max_attempts} interrupted attempts')
+            continue
+        return job
+
+
+def queued_job_counts(user_id):
+    """``(queued jobs of every user, queued jobs of user_id)``."""
+    queued = select(func.count()).select_from(IngestionJob).where(IngestionJob.status == JOB_QUEUED)
+    return db.session.scalar(queued), db.session.scalar(queued.where(IngestionJob.user_id == user_id))
+
+
+def mean_job_seconds(sample=20):
+    """Mean run time of the last ``sample`` analyzed jobs, or None before any finished."""
+    runs = db.session.execute(
+        select(IngestionJob.started_at, IngestionJob.finished_at)
+        .where(IngestionJob.status == JOB_DONE, IngestionJob.duplicate.is_(False),
+               IngestionJob.started_at.is_not(None))
+        .order_by(IngestionJob.id.desc()).limit(sample)).all()
+    if not runs:
+        return None
+    return sum((finished - started).total_seconds() for started, finished in runs) / len(runs)
+
+
+def claimed_job(job_id, attempt):
+    """The job ``job_id`` as claimed for ``attempt``, e.g. to settle it from another session than the claim's."""
+    job = db.session.get(IngestionJob, job_id)
+    job.claimed_attempt = attempt
+    return job
+
+
+def renew_lease(connection, job_id, attempt):
+    """Push back the lease of a claimed job; False if the claim was lost. The caller commits."""
+    return connection.execute(
+        update(IngestionJob).where(_claimed(job_id, attempt)).values(heartbeat_at=utcnow())
+        .execution_options(synchronize_session=False)).rowcount > 0
+
+
+@contextmanager
+def keep_lease(job, interval):
+    """Renew the lease of the claimed ``job`` every ``interval`` seconds while the block runs.
+
+    The heartbeat runs on its own thread and connection, so a job that takes longer than the
+    lease, like a large OCR scan, is not taken for orphaned and claimed by a second worker.
+    """
+    engine, claim = db.engine, (job.id, job.claimed_attempt)
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                with engine.begin() as connection:
+                    if not renew_lease(connection, *claim):
+                        logger.warning('Ingestion job %s lost its lease to another worker', claim[0])
+                        return
+            except Exception:
+                logger.exception('Failed to renew the lease of ingestion job %s', claim[0])
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def finish_job(job, document_id, extraction_report=None, duplicate=False):
+    """Mark the claimed ``job`` done; returns False, changing nothing, if its claim was lost."""
+    return _settle(job, status=JOB_DONE, document_id=document_id, duplicate=duplicate, error=None,
+                   extraction_report=json.dumps(extraction_report) if extraction_report is not None else None)
+
+
+def fail_job(job, error):
+    """Mark the claimed ``job`` failed; returns False, changing nothing, if its claim was lost."""
+    return _settle(job, status=JOB_FAILED, error=str(error))
+
+
+def _settle(job, **values):
+    settled = db.session.execute(
+        update(IngestionJob).where(_claimed(job.id, job.claimed_attempt))
+        .values(finished_at=utcnow(), **values).execution_options(synchronize_session=False)).rowcount
+    db.session.commit()  # also expires ``job``, which reloads with the values written
+    return settled > 0
@@ -0,0 +1,193 @@
+import base64
+import heapq
+import json
+import math
+from collections import Counter
+
+from sqlalchemy import DDL, delete, event, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, CorpusStats, Document, DocumentTerm, Keyword, KeywordPosting, Paragraph, Sentence, TermStats
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Every search needs the document count and mean length. Triggers keep them in CorpusStats as
+# documents are written, whichever code path writes them, so a search never reads every document.
+CORPUS_STATS_STATEMENTS = [
+    "INSERT OR IGNORE INTO corpus_stats (id, document_count, term_count) "
+    "SELECT 1, count(*), coalesce(sum(term_count), 0) FROM document",
+    "CREATE TRIGGER IF NOT EXISTS corpus_stats_ai AFTER INSERT ON document BEGIN "
+    "UPDATE corpus_stats SET document_count = document_count + 1, term_count = term_count + new.term_count; END",
+    "CREATE TRIGGER IF NOT EXISTS corpus_stats_ad AFTER DELETE ON document BEGIN "
+    "UPDATE corpus_stats SET document_count = document_count - 1, term_count = term_count - old.term_count; END",
+    "CREATE TRIGGER IF NOT EXISTS corpus_stats_au AFTER UPDATE OF term_count ON document BEGIN "
+    "UPDATE corpus_stats SET term_count = term_count - old.term_count + new.term_count; END",
+]
+
+# After every table exists, since the triggers on document write to corpus_stats
+for statement in CORPUS_STATS_STATEMENTS:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def normalize_term(word):
+    return word.strip().lower()
+
+
+def sentence_postings(document_id, paragraph_id, sentence_id, keywords):
+    """KeywordPosting rows for one sentence: one per distinct normalized term, with its frequency."""
+    counts = Counter(term for term in map(normalize_term, keywords) if term)
+    return [{'term': term, 'document_id': document_id, 'paragraph_id': paragraph_id,
+             'sentence_id': sentence_id, 'tf': tf} for term, tf in counts.items()]
+
+
+def index_document_terms(document, term_counts, chunk_size):
+    """Store the per-document term frequencies and bump each term's document frequency.
+
+    ``term_counts`` is a Counter of normalized terms over the whole document.
+    """
+    rows = [{'term': term, 'document_id': document.id, 'tf': tf} for term, tf in term_counts.items()]
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(DocumentTerm), rows[start:start + chunk_size])
+        terms = [{'term': row['term'], 'document_frequency': 1} for row in rows[start:start + chunk_size]]
+        upsert = sqlite_insert(TermStats)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=[TermStats.term],
+            set_={'document_frequency': TermStats.document_frequency + 1}), terms)
+    document.term_count = sum(term_counts.values())
+
+
+def update_document_terms(document, removed, added):
+    """Apply an in-place document update to its term frequencies and the document frequencies.
+
+    ``removed`` and ``added`` are Counters of normalized terms in the deleted and the new
+    sentences. Terms the document gains or loses entirely move their document frequency.
+    """
+    change = Counter(added)
+    change.subtract(removed)
+    terms = [term for term, delta in change.items() if delta]
+    if not terms:
+        return
+    current = dict(db.session.execute(
+        select(DocumentTerm.term, DocumentTerm.tf)
+        .where(DocumentTerm.document_id == document.id, DocumentTerm.term.in_(terms))).all())
+    gained, lost = [], []
+    for term in terms:
+        tf = current.get(term, 0) + change[term]
+        if term not in current:
+            db.session.execute(insert(DocumentTerm), {'term': term, 'document_id': document.id, 'tf': tf})
+            gained.append(term)
+        elif tf <= 0:
+            db.session.execute(delete(DocumentTerm).where(DocumentTerm.document_id == document.id,
+                                                          DocumentTerm.term == term))
+            lost.append(term)
+        else:
+            db.session.execute(update(DocumentTerm).where(DocumentTerm.document_id == document.id,
+                                                          DocumentTerm.term == term).values(tf=tf))
+    if gained:
+        upsert = sqlite_insert(TermStats)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=[TermStats.term],
+            set_={'document_frequency': TermStats.document_frequency + 1}),
+            [{'term': term, 'document_frequency': 1} for term in gained])
+    if lost:
+        db.session.execute(update(TermStats).where(TermStats.term.in_(lost))
+                           .values(document_frequency=TermStats.document_frequency - 1))
+    document.term_count = (document.term_count or 0) + sum(change[term] for term in terms)
+
+
+def rebuild_keyword_index(chunk_size):
+    """Recreate postings, per-document term frequencies and document frequencies from Keyword rows.
+
+    For databases populated before the index existed. The caller commits.
+    """
+    for model in (KeywordPosting, DocumentTerm, TermStats):
+        db.session.execute(delete(model))
+    for document in Document.query.all():
+        rows = db.session.execute(
+            select(Paragraph.id, Sentence.id, Keyword.word)
+            .join(Sentence, Sentence.paragraph_id == Paragraph.id)
+            .join(Keyword, Keyword.sentence_id == Sentence.id)
+            .where(Paragraph.document_id == document.id))
+        by_sentence = {}
+        for paragraph_id, sentence_id, word in rows:
+            by_sentence.setdefault((paragraph_id, sentence_id), []).append(word)
+        postings = [posting for (paragraph_id, sentence_id), words in by_sentence.items()
+                    for posting in sentence_postings(document.id, paragraph_id, sentence_id, words)]
+        for start in range(0, len(postings), chunk_size):
+            db.session.execute(insert(KeywordPosting), postings[start:start + chunk_size])
+        term_counts = Counter()
+        for posting in postings:
+            term_counts[posting['term']] += posting['tf']
+        index_document_terms(document, term_counts, chunk_size)
+
+
+def top_document_terms(document_id, limit, weighting='tf'):
+    """A document's ``limit`` highest-weighted terms as ``(term, tf, score)`` tuples, best first.
+
+    'tf' ranks by raw frequency, reading the first rows of the (document_id, tf) index.
+    'tfidf' multiplies each frequency by the term's smoothed inverse document frequency,
+    ``ln((1 + N) / (1 + df)) + 1``, so terms common to the whole corpus sink.
+    """
+    if weighting == 'tf':
+        rows = db.session.execute(
+            select(DocumentTerm.term, DocumentTerm.tf).where(DocumentTerm.document_id == document_id)
+            .order_by(DocumentTerm.tf.desc(), DocumentTerm.term).limit(limit))
+        return [(term, tf, float(tf)) for term, tf in rows]
+    total_documents = db.session.scalar(select(func.count(Document.id)))
+    rows = db.session.execute(
+        select(DocumentTerm.term, DocumentTerm.tf, TermStats.document_frequency)
+        .outerjoin(TermStats, TermStats.term == DocumentTerm.term)
+        .where(DocumentTerm.document_id == document_id))
+    scored = [(term, tf, tf * (math.log((1 + total_documents) / (1 + (df or 0))) + 1)) for term, tf, df in rows]
+    return heapq.nsmallest(limit, scored, key=lambda entry: (-entry[2], entry[0]))
+
+
+def encode_cursor(score, document_id):
+    return base64.urlsafe_b64encode(json.dumps([score, document_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        score, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(document_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def search_documents(terms, mode, limit, cursor=None):
+    """Rank documents for ``terms`` with BM25 using only the DocumentTerm/TermStats tables.
+
+    ``mode`` is 'and' (every term must occur) or 'or'. Results are ordered by score, then
+    document id, and paginated with an opaque cursor that encodes the last (score, id) seen.
+    Returns ``(results, next_cursor)`` where results are ``(document_id, score)`` pairs.
+    """
+    terms = sorted({normalize_term(term) for term in terms} - {''})
+    if not terms:
+        return [], None
+    total_documents, total_terms = db.session.execute(
+        select(CorpusStats.document_count, CorpusStats.term_count).where(CorpusStats.id == 1)).one()
+    average_length = (total_terms / total_documents if total_documents else 0) or 1.0
+    idf = {term: math.log(1 + (total_documents - df + 0.5) / (df + 0.5))
+           for term, df in db.session.execute(
+               select(TermStats.term, TermStats.document_frequency).where(TermStats.term.in_(terms)))}
+
+    scores, matched = Counter(), Counter()
+    postings = db.session.execute(
+        select(DocumentTerm.document_id, DocumentTerm.term, DocumentTerm.tf, Document.term_count)
+        .join(Document, Document.id == DocumentTerm.document_id)
+        .where(DocumentTerm.term.in_(terms)))
+    for document_id, term, tf, length in postings:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * (length or 0) / average_length)
+        scores[document_id] += idf.get(term, 0.0) * tf * (BM25_K1 + 1) / (tf + norm)
+        matched[document_id] += 1
+
+    ranked = sorted(((-score, document_id) for document_id, score in scores.items()
+                     if mode == 'or' or matched[document_id] == len(terms)))
+    if cursor:
+        last = decode_cursor(cursor)
+        ranked = [entry for entry in ranked if entry > (-last[0], last[1])]
+    page = [(document_id, -negative) for negative, document_id in ranked[:limit]]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(ranked) > limit else None
+    return page, next_cursor
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, LLMCacheEntry, LLMCacheGeneration, utcnow
+
+
+def cache_key(model, messages):
+    """Stable hash of everything that determines the completion: model, prompts and content."""
+    payload = json.dumps({'model': model, 'messages': messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache for chat completions.
+
+    An in-process LRU answers repeat requests without touching the database; the
+    ``LLMCacheEntry`` table behind it survives restarts and is shared by every worker.
+    Both tiers expire entries after ``ttl_seconds`` and are bounded in size, evicting
+    the least recently used (memory) or oldest (database) entries first.
+
+    Memory entries remember the ``LLMCacheGeneration`` they were cached under. ``invalidate``
+    bumps it in the database, so every worker drops its older entries on their next read.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, db_max_entries):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.db_max_entries = db_max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = {'memory': 0, 'db': 0}
+        self.misses = 0
+
+    def get(self, key):
+        now = utcnow()
+        generation = self._generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, entry_generation = entry
+                if expires_at > now and entry_generation == generation:
+                    self._entries.move_to_end(key)
+                    self.hits['memory'] += 1
+                    return value
+                del self._entries[key]
+
+        row = db.session.get(LLMCacheEntry, key)
+        if row is not None and row.expires_at > now:
+            self._remember(key, row.response, row.expires_at, generation)
+            with self._lock:
+                self.hits['db'] += 1
+            return row.response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, model, value):
+        now = utcnow()
+        expires_at = now + self.ttl
+        self._remember(key, value, expires_at, self._generation())
+        db.session.merge(LLMCacheEntry(key=key, model=model, response=value, created_at=now, expires_at=expires_at))
+        db.session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now))
+        overflow = db.session.scalar(select(func.count()).select_from(LLMCacheEntry)) - self.db_max_entries
+        if overflow > 0:
+            oldest = select(LLMCacheEntry.key).order_by(LLMCacheEntry.created_at).limit(overflow)
+            db.session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)))
+        db.session.commit()
+
+    def get_or_create(self, model, messages, create):
+        """Return the cached completion for ``(model, messages)``, calling ``create()`` on a miss."""
+        key = cache_key(model, messages)
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.set(key, model, value)
+        return value
+
+    def invalidate(self, model=None):
+        """Drop every entry, or only the ones produced by ``model``, in every worker.
+
+        Returns the number of database rows removed.
+        """
+        with self._lock:
+            self._entries.clear()  # memory entries don't record their model; refilling them from the db is cheap
+        bump = sqlite_insert(LLMCacheGeneration).values(id=1, generation=1)
+        db.session.execute(bump.on_conflict_do_update(
+            index_elements=[LLMCacheGeneration.id], set_={'generation': LLMCacheGeneration.generation + 1}))
+        statement = delete(LLMCacheEntry)
+        if model is not None:
+            statement = statement.where(LLMCacheEntry.model == model)
+        removed = db.session.execute(statement).rowcount
+        db.session.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {'memoryEntries': len(self._entries), 'memoryHits': self.hits['memory'],
+                    'dbHits': self.hits['db'], 'misses': self.misses}
+
+    def _generation(self):
+        return db.session.scalar(select(LLMCacheGeneration.generation).where(LLMCacheGeneration.id == 1)) or 0
+
+    def _remember(self, key, value, expires_at, generation):
+        with self._lock:
+            self._entries[key] = (value, expires_at, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
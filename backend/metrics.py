@@ -0,0 +1,244 @@
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; +Inf is implied
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+INGEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A metric family: one value per combination of label values."""
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f'{self.name} takes labels {self.label_names}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """``(suffix, label values, extra labels, value)`` for each line of the exposition."""
+        with self._lock:
+            return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        process = ('pid', os.getpid())
+        for suffix, key, extra, value in self.samples():
+            labels = _format_labels(self.label_names, key, (process, *extra))
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """A settable value, or one computed at scrape time by ``set_function``."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def set_function(self, function):
+        """Read the values from ``function()`` on every scrape: a number, or ``{label values: number}``."""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        values = self._function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [('', tuple(map(str, key)), (), value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), cumulative))
+        return samples
+
+
+class Registry:
+    """The metrics of this process.
+
+    Values live in process memory, so every server process exposes its own. Each sample carries
+    a ``pid`` label that keeps the series of different processes apart: aggregate counters and
+    histograms with ``sum without (pid)``, and the gauges read from the database with
+    ``max without (pid)``.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=REQUEST_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to handle a request, by endpoint, method and status.',
+    ('endpoint', 'method', 'status'))
+ingest_stage_seconds = registry.histogram(
+    'ingest_stage_duration_seconds', 'Time spent in each ingestion stage per job.', ('stage',), INGEST_BUCKETS)
+ingest_job_seconds = registry.histogram(
+    'ingest_job_duration_seconds', 'Time from claiming an ingestion job to finishing it.', ('outcome',),
+    INGEST_BUCKETS)
+ingest_queue_wait_seconds = registry.histogram(
+    'ingest_queue_wait_seconds', 'Time ingestion jobs waited in the queue before being claimed.', (),
+    INGEST_BUCKETS)
+ingest_jobs = registry.counter(
+    'ingest_jobs_total', 'Finished ingestion jobs by outcome (done, duplicate, failed).', ('outcome',))
+ingest_queue_depth = registry.gauge('ingest_queue_depth', 'Ingestion jobs by status.', ('status',))
+ingest_queue_oldest_age = registry.gauge(
+    'ingest_queue_oldest_age_seconds', 'Age of the oldest queued ingestion job, 0 when the queue is empty.')
+ingest_workers = registry.gauge('ingest_workers', 'Ingestion workers (threads or pool processes).')
+ingest_workers_busy = registry.gauge('ingest_workers_busy', 'Ingestion workers currently running a job.')
+ingest_worker_busy_seconds = registry.counter(
+    'ingest_worker_busy_seconds_total', 'Worker time spent running jobs; divide its rate by ingest_workers.')
+external_request_seconds = registry.histogram(
+    'external_request_duration_seconds', 'Latency of OpenAI and Google calls.', ('service', 'outcome'))
+external_request_errors = registry.counter(
+    'external_request_errors_total', 'OpenAI and Google calls that raised or returned an error status.',
+    ('service',))
+errors = registry.counter('app_errors_total', 'Errors passed to log_error, by exception type.', ('type',))
+
+
+@contextmanager
+def track_external(service):
+    """Time a call to an outside service.
+
+    Yields a dict whose ``'ok'`` the caller sets to False for an error response; an exception
+    also counts as an error and is re-raised.
+    """
+    started = time.perf_counter()
+    call = {'ok': False}
+    try:
+        call['ok'] = True
+        yield call
+    except Exception:
+        call['ok'] = False
+        raise
+    finally:
+        if not call['ok']:
+            external_request_errors.inc(service=service)
+        external_request_seconds.observe(time.perf_counter() - started, service=service,
+                                         outcome='ok' if call['ok'] else 'error')
+
+
+@contextmanager
+def track_worker():
+    """Mark one ingestion worker busy for the duration of the block."""
+    ingest_workers_busy.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ingest_workers_busy.dec()
+        ingest_worker_busy_seconds.inc(time.perf_counter() - started)
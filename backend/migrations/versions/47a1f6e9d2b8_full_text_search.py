@@ -0,0 +1,40 @@
+"""full-text search
+
+Revision ID: 47a1f6e9d2b8
+Revises: 9b7e3d5a0c14
+Create Date: 2026-10-18 19:40:53.829615
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '47a1f6e9d2b8'
+down_revision = '9b7e3d5a0c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Full-text search (fulltext.py): external-content FTS5 tables kept in sync by triggers
+    for source in ('sentence', 'paragraph'):
+        fts = f'{source}_fts'
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                   f"content, content='{source}', content_rowid='id', tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+                   f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END")
+        op.execute(f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END")
+        op.execute(f"CREATE TRIGGER {fts}_au AFTER UPDATE OF content ON {source} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); "
+                   f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END")
+        # Index the rows already there
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    for source in ('sentence', 'paragraph'):
+        fts = f'{source}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
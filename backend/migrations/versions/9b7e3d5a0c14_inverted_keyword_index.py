@@ -0,0 +1,115 @@
+"""inverted keyword index
+
+Revision ID: 9b7e3d5a0c14
+Revises: d4c8f1a2b6e7
+Create Date: 2026-10-18 19:40:51.367042
+
+"""
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b7e3d5a0c14'
+down_revision = 'd4c8f1a2b6e7'
+branch_labels = None
+depends_on = None
+
+CHUNK_ROWS = 500
+
+
+def index_keywords(connection):
+    """Build postings, per-document term frequencies and document frequencies from the Keyword rows.
+
+    The same index keyword_index.rebuild_keyword_index builds, written against this revision's tables.
+    """
+    term_stats = Counter()
+    documents = connection.execute(sa.text('SELECT id FROM document')).scalars().all()
+    for document_id in documents:
+        rows = connection.execute(sa.text(
+            'SELECT p.id, s.id, k.word FROM paragraph p JOIN sentence s ON s.paragraph_id = p.id '
+            'JOIN keyword k ON k.sentence_id = s.id WHERE p.document_id = :id'), {'id': document_id})
+        by_sentence = {}
+        for paragraph_id, sentence_id, word in rows:
+            term = word.strip().lower()  # keyword_index.normalize_term
+            if term:
+                by_sentence.setdefault((paragraph_id, sentence_id), Counter())[term] += 1
+        postings = [{'term': term, 'document_id': document_id, 'paragraph_id': paragraph_id,
+                     'sentence_id': sentence_id, 'tf': tf}
+                    for (paragraph_id, sentence_id), counts in by_sentence.items() for term, tf in counts.items()]
+        term_counts = Counter()
+        for posting in postings:
+            term_counts[posting['term']] += posting['tf']
+        term_stats.update(term_counts.keys())
+        for table, rows in (('keyword_posting', postings),
+                            ('document_term', [{'term': term, 'document_id': document_id, 'tf': tf}
+                                               for term, tf in term_counts.items()])):
+            columns = list(rows[0]) if rows else []
+            for start in range(0, len(rows), CHUNK_ROWS):
+                connection.execute(sa.text(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                           f"VALUES ({', '.join(':' + column for column in columns)})"),
+                                   rows[start:start + CHUNK_ROWS])
+        connection.execute(sa.text('UPDATE document SET term_count = :count WHERE id = :id'),
+                           {'count': sum(term_counts.values()), 'id': document_id})
+    rows = [{'term': term, 'document_frequency': count} for term, count in term_stats.items()]
+    for start in range(0, len(rows), CHUNK_ROWS):
+        connection.execute(sa.text('INSERT INTO term_stats (term, document_frequency) '
+                                   'VALUES (:term, :document_frequency)'), rows[start:start + CHUNK_ROWS])
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('term_stats',
+    sa.Column('term', sa.String(length=255), nullable=False),
+    sa.Column('document_frequency', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('term')
+    )
+    op.create_table('document_term',
+    sa.Column('term', sa.String(length=255), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('tf', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['document.id'], ),
+    sa.PrimaryKeyConstraint('term', 'document_id')
+    )
+    with op.batch_alter_table('document_term', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_document_term_document_id'), ['document_id'], unique=False)
+
+    op.create_table('keyword_posting',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=255), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('paragraph_id', sa.Integer(), nullable=False),
+    sa.Column('sentence_id', sa.Integer(), nullable=False),
+    sa.Column('tf', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['document.id'], ),
+    sa.ForeignKeyConstraint(['paragraph_id'], ['paragraph.id'], ),
+    sa.ForeignKeyConstraint(['sentence_id'], ['sentence.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.create_index('ix_keyword_posting_term_document', ['term', 'document_id'], unique=False)
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('term_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # ### end Alembic commands ###
+    index_keywords(op.get_bind())
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('term_count')
+
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.drop_index('ix_keyword_posting_term_document')
+
+    op.drop_table('keyword_posting')
+    with op.batch_alter_table('document_term', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_term_document_id'))
+
+    op.drop_table('document_term')
+    op.drop_table('term_stats')
+    # ### end Alembic commands ###
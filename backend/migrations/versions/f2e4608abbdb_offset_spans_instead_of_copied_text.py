@@ -0,0 +1,135 @@
+"""offset spans instead of copied text
+
+Revision ID: f2e4608abbdb
+Revises: eb665e70b5d0
+Create Date: 2026-10-18 20:04:23.772765
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2e4608abbdb'
+down_revision = 'eb665e70b5d0'
+branch_labels = None
+depends_on = None
+
+SEPARATOR = '\n\n'
+SPAN_TEXT = ("CASE WHEN typeof(d.content) = 'blob' THEN span_text(d.content, {0}.start_offset, {0}.end_offset) "
+             "ELSE substr(d.content, {0}.start_offset + 1, {0}.end_offset - {0}.start_offset) END")
+VIEWS = {
+    'sentence': f"SELECT s.id AS id, p.document_id AS document_id, {SPAN_TEXT.format('s')} AS content "
+                "FROM sentence s JOIN paragraph p ON p.id = s.paragraph_id JOIN document d ON d.id = p.document_id",
+    'paragraph': f"SELECT p.id AS id, p.document_id AS document_id, {SPAN_TEXT.format('p')} AS content "
+                 "FROM paragraph p JOIN document d ON d.id = p.document_id",
+}
+
+
+def locate(content, text, cursor):
+    """Offset of ``text`` in ``content`` at or after ``cursor``, appending it to the content if missing."""
+    start = content.find(text, cursor)
+    if start < 0:
+        content += SEPARATOR + text
+        start = len(content) - len(text)
+    return content, start
+
+
+def compute_offsets(connection):
+    """Find each stored paragraph in its document's content, in order, and each sentence in its paragraph.
+
+    Text that is not found (rows written before the content was the joined paragraphs) is
+    appended to the document content, so every span still reads back exactly.
+    """
+    documents = connection.execute(sa.text('SELECT id, content FROM document')).all()
+    for document_id, content in documents:
+        original, paragraph_rows, sentence_rows, cursor = content, [], [], 0
+        paragraphs = connection.execute(sa.text(
+            'SELECT id, content FROM paragraph WHERE document_id = :id ORDER BY id'), {'id': document_id}).all()
+        for paragraph_id, paragraph_text in paragraphs:
+            content, start = locate(content, paragraph_text, cursor)
+            end = cursor = start + len(paragraph_text)
+            paragraph_rows.append({'id': paragraph_id, 'start': start, 'end': end})
+            sentence_cursor = start
+            for sentence_id, sentence_text in connection.execute(sa.text(
+                    'SELECT id, content FROM sentence WHERE paragraph_id = :id ORDER BY id'), {'id': paragraph_id}):
+                sentence_start = content.find(sentence_text, sentence_cursor, end)
+                if sentence_start < 0:
+                    content, sentence_start = locate(content, sentence_text, len(content))
+                else:
+                    sentence_cursor = sentence_start + len(sentence_text)
+                sentence_rows.append({'id': sentence_id, 'start': sentence_start,
+                                      'end': sentence_start + len(sentence_text)})
+        if content != original:
+            connection.execute(sa.text('UPDATE document SET content = :content WHERE id = :id'),
+                               {'content': content, 'id': document_id})
+        for table, rows in (('paragraph', paragraph_rows), ('sentence', sentence_rows)):
+            if rows:
+                connection.execute(sa.text(
+                    f'UPDATE {table} SET start_offset = :start, end_offset = :end WHERE id = :id'), rows)
+
+
+def upgrade():
+    # Full-text search (fulltext.py) now reads span text through views; the old tables and triggers
+    # read the content columns dropped below
+    for source in ('sentence', 'paragraph'):
+        fts = f'{source}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
+
+    for table in ('paragraph', 'sentence'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('start_offset', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('end_offset', sa.Integer(), nullable=True))
+
+    compute_offsets(op.get_bind())
+
+    for table in ('paragraph', 'sentence'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('start_offset', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column('end_offset', existing_type=sa.Integer(), nullable=False)
+            batch_op.drop_column('content')
+
+    for source, query in VIEWS.items():
+        fts, view = f'{source}_fts', f'{source}_text'
+        op.execute(f"CREATE VIEW {view} AS {query}")
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                   f"content, content='{view}', content_rowid='id', tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {fts}_bd BEFORE DELETE ON {source} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, content) "
+                   f"SELECT 'delete', old.id, content FROM {view} WHERE id = old.id; END")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    for source in ('sentence', 'paragraph'):
+        fts = f'{source}_fts'
+        op.execute(f"DROP TRIGGER IF EXISTS {fts}_bd")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
+
+    for table in ('sentence', 'paragraph'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content', sa.TEXT(), nullable=True))
+        op.execute(f"UPDATE {table} SET content = (SELECT content FROM {table}_text v WHERE v.id = {table}.id)")
+    for source in ('sentence', 'paragraph'):
+        op.execute(f"DROP VIEW IF EXISTS {source}_text")
+
+    for table in ('sentence', 'paragraph'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('content', existing_type=sa.TEXT(), nullable=False)
+            batch_op.drop_column('end_offset')
+            batch_op.drop_column('start_offset')
+
+    for source in ('sentence', 'paragraph'):
+        fts = f'{source}_fts'
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                   f"content, content='{source}', content_rowid='id', tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+                   f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END")
+        op.execute(f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END")
+        op.execute(f"CREATE TRIGGER {fts}_au AFTER UPDATE OF content ON {source} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); "
+                   f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
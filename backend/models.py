@@ -1,43 +1,246 @@
+import json
+import sqlite3
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import column_property
+from sqlalchemy.types import TypeDecorator
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
+from config import Config
+
 db = SQLAlchemy()
 
+# Paragraphs are stored back to back in Document.content with this between them
+PARAGRAPH_SEPARATOR = '\n\n'
+# Shorter documents are stored as plain text even with COMPRESS_DOCUMENTS on
+COMPRESS_MIN_CHARS = 1024
+
+def utcnow():
+    """Naive UTC timestamp, which is what SQLite DateTime columns round-trip."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+@lru_cache(maxsize=4)
+def _decompress(blob):
+    return zlib.decompress(blob).decode('utf-8')
+
+
+class DocumentText(TypeDecorator):
+    """Text stored zlib-compressed, as a BLOB, when COMPRESS_DOCUMENTS is on.
+
+    Values read back are always ``str``, and either form is accepted, so switching compression
+    on or off needs no rewrite of existing rows.
+    """
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and Config.COMPRESS_DOCUMENTS and len(value) >= COMPRESS_MIN_CHARS:
+            return zlib.compress(value.encode('utf-8'), Config.COMPRESSION_LEVEL)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return _decompress(value) if isinstance(value, bytes) else value
+
+
+def _span_text(blob, start, end):
+    return _decompress(blob)[start:end]
+
+
+@event.listens_for(Engine, 'connect')
+def _register_span_text(dbapi_connection, connection_record):
+    """Let SQLite slice compressed document content (see ``span_text``)."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('span_text', 3, _span_text, deterministic=True)
+
+
+def span_text(content, start, end):
+    """SQL for ``content[start:end]`` of a Document.content column, plain or compressed."""
+    return case((func.typeof(content) == 'blob', func.span_text(content, start, end)),
+                else_=func.substr(content, start + 1, end - start))
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
 
 class Document(db.Model):
+    __table_args__ = (db.Index('ix_document_user_id_sentiment', 'user_id', 'sentiment'),)
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(255), db.ForeignKey('user.id'))  # Assuming your user table is named 'user'
+    user_id = db.Column(db.String(255), db.ForeignKey('user.id'), index=True)  # Assuming your user table is named 'user'
     user = db.relationship('User', backref='documents')
     filename = db.Column(db.String(256), unique=True, nullable=False)  # Added filename attribute
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(DocumentText, nullable=False)  # paragraphs joined by PARAGRAPH_SEPARATOR
     sentiment = db.Column(db.String(50), nullable=False)  # Assuming you've a way to calculate this
+    polarity = db.Column(db.Float)  # length-weighted mean of the sentence scores
+    subjectivity = db.Column(db.Float)
+    term_count = db.Column(db.Integer, nullable=False, default=0)  # document length for BM25
+    content_hash = db.Column(db.String(64), index=True)  # sha256 of the uploaded file
+    trace = db.Column(db.Text)  # JSON ingestion trace, written when INGEST_TRACE is on
     paragraphs = db.relationship('Paragraph', backref='document', lazy=True)
 
 class Paragraph(db.Model):
+    __table_args__ = (db.Index('ix_paragraph_document_id_sentiment', 'document_id', 'sentiment'),
+                      db.Index('ix_paragraph_document_id_start_offset', 'document_id', 'start_offset'))
     id = db.Column(db.Integer, primary_key=True)
-    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    # The text is document.content[start_offset:end_offset]; see the ``content`` property below
+    start_offset = db.Column(db.Integer, nullable=False)
+    end_offset = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(64))  # sha256 of the text, matched when the document is updated
     sentiment = db.Column(db.String(50), nullable=False)
+    polarity = db.Column(db.Float)
+    subjectivity = db.Column(db.Float)
     sentences = db.relationship('Sentence', backref='paragraph', lazy=True)
 
 class Sentence(db.Model):
+    __table_args__ = (db.Index('ix_sentence_paragraph_id_sentiment', 'paragraph_id', 'sentiment'),)
     id = db.Column(db.Integer, primary_key=True)
-    paragraph_id = db.Column(db.Integer, db.ForeignKey('paragraph.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    paragraph_id = db.Column(db.Integer, db.ForeignKey('paragraph.id'), nullable=False, index=True)
+    # Offsets into the document content, like Paragraph's
+    start_offset = db.Column(db.Integer, nullable=False)
+    end_offset = db.Column(db.Integer, nullable=False)
     sentiment = db.Column(db.String(50), nullable=False)
+    polarity = db.Column(db.Float)
+    subjectivity = db.Column(db.Float)
     keywords = db.relationship('Keyword', backref='sentence', lazy=True)
 
 class Keyword(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sentence_id = db.Column(db.Integer, db.ForeignKey('sentence.id'), nullable=False)
-    word = db.Column(db.String(255), nullable=False)
+    sentence_id = db.Column(db.Integer, db.ForeignKey('sentence.id'), nullable=False, index=True)
+    word = db.Column(db.String(255), nullable=False, index=True)
 
 
 
 
     def __repr__(self):
         return f"<Document {self.filename}>"
+
+class IngestionJob(db.Model):
+    # Per-user queued/running counts and last claim time for the fair scheduler
+    __table_args__ = (db.Index('ix_ingestion_job_status_user_id', 'status', 'user_id'),
+                      db.Index('ix_ingestion_job_user_id_started_at', 'user_id', 'started_at'))
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(256), nullable=False, index=True)
+    filepath = db.Column(db.String(1024), nullable=False)
+    content_hash = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+    extraction_report = db.Column(db.Text)  # JSON: per-page timings and failures
+    duplicate = db.Column(db.Boolean, nullable=False, default=False)  # reused the analysis of identical content
+    # A new version of this document: it is updated in place, re-analyzing only changed paragraphs
+    updates_document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    # Renewed while a worker runs the job; a running job whose heartbeat is older than the lease is orphaned
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        duration = None
+        if self.started_at and self.finished_at:
+            duration = (self.finished_at - self.started_at).total_seconds()
+        return {
+            'jobId': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'documentId': self.document_id,
+            'duplicate': self.duplicate,
+            'updatesDocumentId': self.updates_document_id,
+            'extraction': json.loads(self.extraction_report) if self.extraction_report else None,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'heartbeatAt': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+            'durationSeconds': duration,
+        }
+
+class UploadSession(db.Model):
+    """A chunked upload in progress; the bytes so far are in ``<UPLOAD_FOLDER>/<id>.part``."""
+    id = db.Column(db.String(64), primary_key=True)  # random token handed to the client
+    user_id = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(256), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # declared total size in bytes
+    received = db.Column(db.BigInteger, nullable=False, default=0)  # contiguous bytes written from offset 0
+    update_existing = db.Column(db.Boolean, nullable=False, default=False)  # replace the user's file of that name
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'uploadId': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'complete': self.received == self.size,
+        }
+
+class LLMCacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of model + messages
+    model = db.Column(db.String(100), nullable=False, index=True)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class LLMCacheGeneration(db.Model):
+    # A single row (id 1), bumped by every invalidation; memory entries of an older generation are stale
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+class ChunkSummary(db.Model):
+    __table_args__ = (db.UniqueConstraint('document_id', 'content_hash'),)
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # sha256 of the chunk text
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+class KeywordPosting(db.Model):
+    # Inverted index: normalized term -> sentence, with the term frequency in that sentence
+    __table_args__ = (db.Index('ix_keyword_posting_term_document', 'term', 'document_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(255), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
+    paragraph_id = db.Column(db.Integer, db.ForeignKey('paragraph.id'), nullable=False)
+    sentence_id = db.Column(db.Integer, db.ForeignKey('sentence.id'), nullable=False)
+    tf = db.Column(db.Integer, nullable=False)
+
+class DocumentTerm(db.Model):
+    # Term frequencies summed per document; what BM25 ranking and /document/keywords read
+    term = db.Column(db.String(255), primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    tf = db.Column(db.Integer, nullable=False)
+    # A document's most frequent terms come straight off this index, already in order
+    __table_args__ = (db.Index('ix_document_term_document_id_tf', document_id, tf.desc(), term),)
+
+class TermStats(db.Model):
+    term = db.Column(db.String(255), primary_key=True)
+    document_frequency = db.Column(db.Integer, nullable=False, default=0)
+
+class CorpusStats(db.Model):
+    # A single row (id 1) of corpus totals for BM25, kept current by triggers on document (keyword_index.py)
+    id = db.Column(db.Integer, primary_key=True)
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    term_count = db.Column(db.Integer, nullable=False, default=0)  # sum of Document.term_count
+
+
+# Span text, sliced out of the document in SQL. Deferred, so it is only read when accessed;
+# bulk read paths slice in Python instead (spans.DocumentTexts) to read each document once.
+Paragraph.content = column_property(
+    select(span_text(Document.content, Paragraph.start_offset, Paragraph.end_offset))
+    .where(Document.id == Paragraph.document_id).correlate_except(Document).scalar_subquery(), deferred=True)
+_paragraph = Paragraph.__table__.alias()
+Sentence.content = column_property(
+    select(span_text(Document.content, Sentence.start_offset, Sentence.end_offset))
+    .where(_paragraph.c.id == Sentence.paragraph_id, Document.id == _paragraph.c.document_id)
+    .correlate_except(Document, _paragraph).scalar_subquery(), deferred=True)
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageSequence
+
+from config import Config
+
+TESSERACT_CMD = Config.TESSERACT_CMD
+
+
+def tesseract():
+    """pytesseract, imported and configured on the first OCR call rather than at startup."""
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+
+def iter_frames(image):
+    """Every frame of a multi-frame image (GIF, TIFF), or just the image itself."""
+    if getattr(image, 'n_frames', 1) <= 1:
+        yield image
+        return
+    for frame in ImageSequence.Iterator(image):
+        yield frame.copy()  # the iterator seeks the same object, so keep a snapshot
+
+
+def preprocess_image(image, target_dpi):
+    """Grayscale the image and downscale scans stored above ``target_dpi``.
+
+    Tesseract gains nothing from resolution past ~300 DPI but its run time grows with the
+    pixel count, so a 600 DPI scan is OCR'd at a quarter of the cost. Images without DPI
+    information, or already at or below the target, keep their size.
+    """
+    if image.mode != 'L':
+        image = image.convert('L')
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > target_dpi:
+        scale = target_dpi / float(dpi[0])
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return image
+
+
+def split_tiles(image, tile_height):
+    """Cut a tall scan into horizontal bands of at most ``tile_height`` pixels.
+
+    Each cut is moved up to the brightest row in the last tenth of the band, which on a
+    text page is the gap between two lines, so lines are not sliced in half.
+    """
+    if image.height <= tile_height:
+        return [image]
+    tiles, top = [], 0
+    while image.height - top > tile_height:
+        cut = _blank_row(image, top + tile_height - max(1, tile_height // 10), top + tile_height)
+        tiles.append(image.crop((0, top, image.width, cut)))
+        top = cut
+    tiles.append(image.crop((0, top, image.width, image.height)))
+    return tiles
+
+
+def _blank_row(image, start, stop):
+    # Box-resizing the band to one pixel wide leaves each row's mean brightness
+    means = list(image.crop((0, start, image.width, stop)).resize((1, stop - start), Image.Resampling.BOX).getdata())
+    # the last of the brightest rows, so tiles stay close to tile_height
+    return stop - means[::-1].index(max(means))
+
+
+def ocr_images(images, workers):
+    """OCR each image, up to ``workers`` at a time, and return the texts in order.
+
+    pytesseract runs every call in its own tesseract process, so threads are enough to keep
+    ``workers`` processes busy without pickling the images to a process pool.
+    """
+    pytesseract = tesseract()
+    if workers <= 1 or len(images) <= 1:
+        return [pytesseract.image_to_string(image) for image in images]
+    return list(ocr_pool(workers).map(pytesseract.image_to_string, images))
+
+
+_ocr_pools = {}
+_ocr_pools_lock = threading.Lock()
+
+
+def ocr_pool(workers):
+    """A thread pool of ``workers`` threads shared by every OCR call in the process.
+
+    Concurrent ingestion jobs queue their images on the same pool, so together they never run
+    more than ``workers`` tesseract processes.
+    """
+    with _ocr_pools_lock:
+        if workers not in _ocr_pools:
+            _ocr_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr')
+        return _ocr_pools[workers]
+
+
+class OCRCache:
+    """OCR results stored as text files named by the hash of the image bytes and OCR settings.
+
+    Files on disk are shared by worker threads and processes alike and survive restarts,
+    so a scan that is uploaded again skips tesseract entirely. A hit refreshes the file's
+    modification time, and once the files add up to more than ``max_bytes`` the least
+    recently used ones are deleted.
+    """
+
+    def __init__(self, directory, settings, max_bytes=None):
+        self.directory = directory
+        self.settings = repr(settings).encode('utf-8')
+        self.max_bytes = max_bytes
+
+    def key(self, filepath):
+        digest = hashlib.sha256(self.settings)
+        with open(filepath, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as file:
+                text = file.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:  # never cached, or evicted by another process
+            return None
+        return text
+
+    def set(self, key, text):
+        os.makedirs(self.directory, exist_ok=True)
+        # write then rename, so a concurrent reader never sees a partial file
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(temporary, self._path(key))
+        if self.max_bytes:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes):
+        """Delete the least recently used results until the rest fit in ``max_bytes``."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.txt'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.txt')
@@ -0,0 +1,64 @@
+import base64
+import json
+
+from models import db
+
+
+def iter_keyset(statement, key, after=None, limit=None, batch_size=500):
+    """Yield the rows of ``statement`` in ``key`` order, starting after the key value ``after``.
+
+    Rows are fetched ``batch_size`` at a time, each batch bounded by ``key > last key seen``
+    rather than an OFFSET, so memory stays at one batch and deep pages cost the same as the
+    first. ``statement`` must select ``key``; at most ``limit`` rows are yielded.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        batch = statement.order_by(key).limit(size)
+        if after is not None:
+            batch = batch.where(key > after)
+        rows = db.session.execute(batch).all()
+        yield from rows
+        if len(rows) < size:
+            return
+        after = getattr(rows[-1], key.key)
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+class KeysetPage:
+    """One page of up to ``limit`` rows (all rows when ``limit`` is None), streamed as a JSON array.
+
+    ``next_after`` is the key to pass as ``after`` for the following page, or None on the last
+    page; it is known once the array has been fully generated.
+    """
+
+    def __init__(self, statement, key, after, limit, batch_size):
+        self.rows = iter_keyset(statement, key, after, None if limit is None else limit + 1, batch_size)
+        self.key = key
+        self.limit = limit
+        self.next_after = None
+
+    def iter_json(self, serialize):
+        yield '['
+        last = None
+        for count, row in enumerate(self.rows):
+            if count == self.limit:  # the extra row only tells us there is another page
+                self.next_after = last
+                break
+            yield (',' if count else '') + json.dumps(serialize(row))
+            last = getattr(row, self.key.key)
+        yield ']'
+
+
+def encode_keyset_cursor(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_keyset_cursor(cursor):
+    """``{name: last id}`` from a cursor made by ``encode_keyset_cursor``; raises ValueError."""
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {str(name): int(after) for name, after in positions.items()}
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError('Invalid cursor')
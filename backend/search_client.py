@@ -0,0 +1,149 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import track_external
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class SearchError(Exception):
+    """The upstream search failed; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+class SearchClient:
+    """Client for the Google Custom Search API, safe to share between request threads.
+
+    One ``requests.Session`` with a connection pool keeps connections to the upstream alive.
+    Every attempt has connect and read timeouts, and all attempts together stay within
+    ``deadline``. Connection errors, timeouts, 429 and 5xx responses are retried with
+    full-jitter exponential backoff; any other request error or a body that is not JSON
+    fails the search with a 502. Results are cached for ``cache_ttl`` seconds by normalized
+    query, and concurrent callers asking the same query share the one upstream call in flight.
+    """
+
+    def __init__(self, url, params, connect_timeout, read_timeout, deadline, max_retries, backoff, cache_ttl,
+                 cache_max_entries, pool_size, clock=time.monotonic, sleep=time.sleep):
+        self.url = url
+        self.params = params
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        self.pool_size = pool_size
+        self.clock = clock
+        self.sleep = sleep
+        self._session = None
+        self._session_pid = None
+        self._cache = OrderedDict()  # normalized query -> (result, expires_at)
+        self._in_flight = {}  # normalized query -> Future of the upstream call
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+
+    def search(self, query):
+        """The upstream JSON for ``query``, from the cache, a call in flight, or a new call.
+
+        Raises SearchError when the upstream fails or does not answer within the deadline.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[1] > self.clock():
+                    self._cache.move_to_end(key)
+                    return cached[0]
+                del self._cache[key]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            try:
+                return future.result(timeout=self.deadline)
+            except FutureTimeout:
+                raise SearchError('Search deadline exceeded', 504) from None
+
+        try:
+            result = self._fetch(key)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            self._remember(key, result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def session(self):
+        """The pooled session, created on first use and again in a forked child."""
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session, self._session_pid = session, os.getpid()
+            return self._session
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _fetch(self, query):
+        give_up_at = self.clock() + self.deadline
+        error = SearchError('Search deadline exceeded', 504)
+        for attempt in range(self.max_retries + 1):
+            remaining = give_up_at - self.clock()
+            if remaining <= 0:
+                break
+            with self._lock:
+                self.upstream_calls += 1
+            try:
+                with track_external('google') as call:
+                    response = self.session().get(
+                        self.url, params={**self.params, 'q': query},
+                        timeout=(min(self.connect_timeout, remaining), min(self.read_timeout, remaining)))
+                    call['ok'] = response.status_code == 200
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = SearchError(f'Search upstream unreachable: {e}', 504)
+            except requests.RequestException as e:
+                raise SearchError(f'Search request failed: {e}', 502) from e
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise SearchError(f'Search upstream sent an invalid response: {e}', 502) from e
+                error = SearchError('Failed to fetch search results', response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+            if attempt < self.max_retries:
+                # Full jitter: anywhere up to the exponential step, so retrying callers spread out
+                self.sleep(min(random.uniform(0, self.backoff * 2 ** attempt), max(0.0, give_up_at - self.clock())))
+        raise error
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._cache[key] = (result, self.clock() + self.cache_ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
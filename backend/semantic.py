@@ -0,0 +1,284 @@
+"""Local semantic search: sentence and document embeddings in memory-mapped NumPy matrices.
+
+A sentence embedding is its hashed, sublinear term frequencies pushed through a fixed sparse
+random projection (random indexing), scaled to unit length. The projection never changes, so
+an embedding is computed once, at ingestion, and the index only gains or drops rows; nothing
+has to be refit over the corpus the way LSA would. A document's embedding is the normalized
+sum of its sentences'.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are serialized within one process only
+    fcntl = None
+
+_WORD = re.compile(r"[a-z][a-z'-]+")
+# Positions each term adds its weight to; more spreads terms out, fewer keeps rows sparse to build
+NONZEROS_PER_TERM = 4
+_PENDING = 'semantic_index_changes'
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _stop_words():
+    # Imported on first use: spaCy's package import is what the cold start avoids
+    from spacy.lang.en.stop_words import STOP_WORDS
+    return STOP_WORDS
+
+
+def terms(text):
+    """Lowercased words of ``text`` without stop words, with a plain plural ``s`` stripped."""
+    stop_words = _stop_words()
+    result = []
+    for word in _WORD.findall(text.lower()):
+        word = word.strip("'-")
+        if word.endswith("'s"):
+            word = word[:-2]
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        if len(word) > 1 and word not in stop_words:
+            result.append(word)
+    return result
+
+
+@lru_cache(maxsize=100000)
+def _term_projection(term, dimensions):
+    """The fixed columns and signs ``term`` contributes to, derived from a hash of the term."""
+    digest = hashlib.blake2b(term.encode('utf-8'), digest_size=4 * NONZEROS_PER_TERM).digest()
+    words = np.frombuffer(digest, dtype='<u4')
+    return words % dimensions, np.where(words & 0x80000000, -1.0, 1.0).astype(np.float32)
+
+
+def embed(texts, dimensions):
+    """Unit-length float32 embeddings of ``texts``, one row each; a text without terms gets a zero row."""
+    rows, columns, values = [], [], []
+    for row, text in enumerate(texts):
+        for term, tf in Counter(terms(text)).items():
+            term_columns, signs = _term_projection(term, dimensions)
+            rows.append(np.full(len(term_columns), row))
+            columns.append(term_columns)
+            values.append(signs * (1.0 + math.log(tf)))
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    if rows:
+        np.add.at(matrix, (np.concatenate(rows), np.concatenate(columns)), np.concatenate(values))
+    return normalized(matrix)
+
+
+def normalized(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class VectorStore:
+    """Fixed-width float32 rows in one flat file, with each row's id and group in two int64 files.
+
+    Rows are only appended, vectors first, under a lock shared by threads and processes.
+    Readers memory-map the files and use as many rows as all three hold, so they never see a
+    half-written row. Removing a row sets its id to -1 in place; a rebuild compacts the files.
+    """
+
+    def __init__(self, directory, name, dimensions):
+        self.directory = directory
+        self.dimensions = dimensions
+        # The width is part of the name: changing EMBEDDING_DIMENSIONS starts a new index
+        self.prefix = os.path.join(directory, f'{name}-{dimensions}')
+        self._row_bytes = {'vec': 4 * dimensions, 'groups': 8, 'ids': 8}
+        self._lock = threading.Lock()
+        self._mapped = (0, None)
+
+    def _path(self, kind):
+        return f'{self.prefix}.{kind}'
+
+    def _row_count(self):
+        try:
+            return min(os.path.getsize(self._path(kind)) // size for kind, size in self._row_bytes.items())
+        except FileNotFoundError:
+            return 0
+
+    def arrays(self):
+        """``(vectors, ids, groups)`` mapped read-only; remapped when rows were appended since the last call."""
+        rows, arrays = self._mapped
+        current = self._row_count()
+        if arrays is None or current != rows:
+            if current == 0:
+                arrays = (np.zeros((0, self.dimensions), np.float32), np.zeros(0, np.int64), np.zeros(0, np.int64))
+            else:
+                arrays = (np.memmap(self._path('vec'), np.float32, 'r', shape=(current, self.dimensions)),
+                          np.memmap(self._path('ids'), np.int64, 'r', shape=(current,)),
+                          np.memmap(self._path('groups'), np.int64, 'r', shape=(current,)))
+            self._mapped = (current, arrays)
+        return arrays
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f'{self.prefix}.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def append(self, ids, groups, vectors):
+        with self._locked():
+            rows = self._row_count()
+            columns = {'vec': np.ascontiguousarray(vectors, dtype=np.float32),
+                       'groups': np.asarray(groups, dtype=np.int64), 'ids': np.asarray(ids, dtype=np.int64)}
+            for kind, array in columns.items():
+                with open(self._path(kind), 'ab') as file:
+                    file.truncate(rows * self._row_bytes[kind])  # a row half written by a crashed writer
+                    file.write(array.tobytes())
+
+    def remove(self, ids):
+        """Drop the rows with any of ``ids``."""
+        with self._locked():
+            rows = self._row_count()
+            if rows == 0:
+                return
+            row_ids = np.memmap(self._path('ids'), np.int64, 'r+', shape=(rows,))
+            mask = np.isin(row_ids, np.asarray(ids, dtype=np.int64))
+            if mask.any():
+                row_ids[mask] = -1
+                row_ids.flush()
+
+    def clear(self):
+        with self._locked():
+            for kind in self._row_bytes:
+                if os.path.exists(self._path(kind)):
+                    os.remove(self._path(kind))
+            self._mapped = (0, None)
+
+    def vectors(self, group=None, row_id=None):
+        """Live vectors of one group, or of the row with ``row_id``."""
+        vectors, ids, groups = self.arrays()
+        mask = (groups == group) if group is not None else (ids == row_id)
+        return vectors[mask & (ids >= 0)]
+
+    def search(self, query, k, groups=None, exclude_id=None):
+        """The ``k`` live rows most similar to the unit vector ``query``, as ``(id, group, score)``, best first.
+
+        ``groups`` restricts the search to rows of those groups. Rows are unit length, so one
+        matrix-vector product gives every cosine.
+        """
+        vectors, ids, row_groups = self.arrays()
+        if not len(ids):
+            return []
+        live = ids >= 0
+        if groups is not None:
+            live &= np.isin(row_groups, np.asarray(groups, dtype=np.int64))
+        if exclude_id is not None:
+            live &= ids != exclude_id
+        rows = np.flatnonzero(live)
+        k = min(k, len(rows))
+        if k <= 0:
+            return []
+        # The scan is bound by memory bandwidth: read only the candidate rows when they are few
+        query = query.astype(np.float32)
+        scores = vectors[rows] @ query if len(rows) < len(ids) // 4 else (vectors @ query)[rows]
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[rows[i]]), int(row_groups[rows[i]]), float(scores[i])) for i in top]
+
+
+class SemanticIndex:
+    """Sentence embeddings grouped by document, and one embedding per document.
+
+    Changes are staged on the database session and applied once it commits, so the index never
+    holds sentences the database rolled back. An empty ``directory`` disables the index.
+    """
+
+    def __init__(self, directory, dimensions):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.sentences = VectorStore(directory, 'sentences', dimensions)
+        self.documents = VectorStore(directory, 'documents', dimensions)
+
+    def stage(self, session, document_id, added=(), removed_ids=()):
+        """Queue sentence changes of a document until ``session`` commits; ``added`` are ``(id, text)`` pairs."""
+        if not self.directory:
+            return
+        changes = session.info.setdefault(_PENDING, {}).setdefault(self, {})
+        document_added, document_removed = changes.setdefault(document_id, ([], []))
+        document_added.extend(added)
+        document_removed.extend(removed_ids)
+
+    def apply(self, changes):
+        """Write staged ``{document_id: (added, removed_ids)}`` changes and refresh those documents."""
+        for document_id, (added, removed_ids) in changes.items():
+            if removed_ids:
+                self.sentences.remove(removed_ids)
+            if added:
+                sentence_ids, texts = zip(*added)
+                self.sentences.append(sentence_ids, [document_id] * len(sentence_ids), embed(texts, self.dimensions))
+            self.refresh_document(document_id)
+
+    def refresh_document(self, document_id):
+        self.documents.remove([document_id])
+        vector = normalized(self.sentences.vectors(group=document_id).sum(axis=0))
+        if vector.any():
+            self.documents.append([document_id], [document_id], vector[np.newaxis])
+
+    def search_sentences(self, query, k, document_ids=None):
+        """``(sentence_id, document_id, score)`` of the ``k`` sentences closest to the text ``query``."""
+        vector = embed([query], self.dimensions)[0]
+        if not self.directory or not vector.any():
+            return []
+        return self.sentences.search(vector, k, document_ids)
+
+    def related_documents(self, document_id, k, document_ids=None):
+        """``(document_id, score)`` of the ``k`` documents closest to ``document_id``, itself excluded."""
+        vectors = self.documents.vectors(row_id=document_id) if self.directory else ()
+        if not len(vectors):
+            return []
+        return [(related_id, score) for related_id, _, score in
+                self.documents.search(vectors[0], k, document_ids, exclude_id=document_id)]
+
+    def rebuild(self, sentences, batch_size):
+        """Recreate the index from ``(sentence_id, document_id, text)`` rows ordered by document."""
+        self.sentences.clear()
+        self.documents.clear()
+        batch = []
+        for row in sentences:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._append_rows(batch)
+                batch = []
+        self._append_rows(batch)
+        vectors, _, groups = self.sentences.arrays()
+        if len(groups):
+            # One summed row per run of a document's sentences
+            starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+            self.documents.append(groups[starts], groups[starts], normalized(np.add.reduceat(vectors, starts)))
+
+    def _append_rows(self, rows):
+        if rows:
+            sentence_ids, document_ids, texts = zip(*rows)
+            self.sentences.append(sentence_ids, document_ids, embed(texts, self.dimensions))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_staged_changes(session):
+    for index, changes in session.info.pop(_PENDING, {}).items():
+        try:
+            index.apply(changes)
+        except Exception:
+            # The rows are committed either way; ``flask rebuild-semantic-index`` catches the index up
+            logger.exception('Failed to update the semantic index, run `flask rebuild-semantic-index`')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_staged_changes(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from models import db, Document
+
+
+def sentence_spans(paragraph_text, paragraph_start, sentence_texts):
+    """Absolute ``(start, end)`` offsets of each sentence, found in order within its paragraph.
+
+    Raises ValueError if a sentence is not a substring of the paragraph after the previous one.
+    """
+    spans, cursor = [], 0
+    for sentence_text in sentence_texts:
+        start = paragraph_text.find(sentence_text, cursor)
+        if start < 0:
+            raise ValueError(f'Sentence not found in its paragraph: {sentence_text[:40]!r}')
+        cursor = start + len(sentence_text)
+        spans.append((paragraph_start + start, paragraph_start + cursor))
+    return spans
+
+
+class DocumentTexts:
+    """Slices span text out of document contents, keeping the last few documents in memory.
+
+    Rows of a listing usually come from a handful of documents, so each content is read (and
+    decompressed) once per request instead of once per row.
+    """
+
+    def __init__(self, max_documents=8):
+        self.max_documents = max_documents
+        self._texts = OrderedDict()
+
+    def text(self, document_id):
+        if document_id in self._texts:
+            self._texts.move_to_end(document_id)
+        else:
+            self._texts[document_id] = db.session.scalar(
+                select(Document.content).where(Document.id == document_id))
+            if len(self._texts) > self.max_documents:
+                self._texts.popitem(last=False)
+        return self._texts[document_id]
+
+    def slice(self, document_id, start, end):
+        return self.text(document_id)[start:end]
@@ -0,0 +1,84 @@
+import threading
+
+
+class TokenStream:
+    """Text produced once, in pieces, and read by any number of subscribers.
+
+    Every subscriber starts from the first piece, so one that attaches late still receives
+    the whole text, then follows the producer live.
+    """
+
+    def __init__(self):
+        self._pieces = []
+        self._done = False
+        self._error = None
+        self._condition = threading.Condition()
+
+    def append(self, piece):
+        with self._condition:
+            self._pieces.append(piece)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self._done = True
+            self._error = error
+            self._condition.notify_all()
+
+    def follow(self, heartbeat_seconds):
+        """Yield the pieces as they arrive, and None whenever ``heartbeat_seconds`` pass without one.
+
+        Re-raises the producer's exception once the pieces before it are delivered.
+        """
+        position = 0
+        while True:
+            with self._condition:
+                if position == len(self._pieces) and not self._done:
+                    self._condition.wait(heartbeat_seconds)
+                pieces = self._pieces[position:]
+                done, error = self._done, self._error
+            position += len(pieces)
+            yield from pieces
+            if done and position == len(self._pieces):
+                if error is not None:
+                    raise error
+                return
+            if not pieces:
+                yield None
+
+
+class StreamRegistry:
+    """At most one producer per key; callers asking for a key in flight attach to its stream."""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def attach(self, key, produce):
+        """The stream for ``key`` and whether it was already running.
+
+        A new stream runs ``produce(append)`` on a background thread, so it keeps going when
+        the caller that started it goes away and later callers can still attach.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None:
+                return stream, True
+            stream = self._streams[key] = TokenStream()
+        threading.Thread(target=self._run, args=(key, stream, produce), daemon=True).start()
+        return stream, False
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._streams
+
+    def _run(self, key, stream, produce):
+        try:
+            produce(stream.append)
+        except Exception as e:
+            stream.finish(e)
+        else:
+            stream.finish()
+        finally:
+            with self._lock:
+                del self._streams[key]
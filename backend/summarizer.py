@@ -0,0 +1,103 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+MAP_PROMPT = "Summarize the following part of a longer document:\n\n{text}"
+REDUCE_PROMPT = "Combine these partial summaries of one document into a single summary:\n\n{text}"
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English) used for budgeting chunks."""
+    return len(text) // 4 + 1
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_paragraphs(paragraphs, token_budget):
+    """Greedily pack paragraphs into chunks of at most ``token_budget`` tokens.
+
+    Chunks break on paragraph boundaries; a paragraph that is too large on its own is
+    split on whitespace.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in paragraphs:
+        for piece in _split_oversized(paragraph, token_budget):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > token_budget:
+                chunks.append('\n\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _split_oversized(paragraph, token_budget):
+    if estimate_tokens(paragraph) <= token_budget:
+        return [paragraph]
+    pieces, words, size = [], [], 0
+    max_chars = token_budget * 4
+    for word in paragraph.split():
+        if words and size + len(word) + 1 > max_chars:
+            pieces.append(' '.join(words))
+            words, size = [], 0
+        words.append(word)
+        size += len(word) + 1
+    if words:
+        pieces.append(' '.join(words))
+    return pieces
+
+
+def user_message(prompt, text):
+    return [
+        {"role": "system", "content": "You are an intelligent assistant."},
+        {"role": "user", "content": prompt.format(text=text)},
+    ]
+
+
+class MapReduceSummarizer:
+    """Summarize long text by summarizing token-budgeted chunks concurrently, then combining them.
+
+    ``complete`` takes a chat message list and returns the completion text. It is the only
+    thing that talks to the model, so tests can pass a local stub instead of the OpenAI client.
+    """
+
+    def __init__(self, complete, token_budget, max_concurrency):
+        self.complete = complete
+        self.token_budget = token_budget
+        self.max_concurrency = max_concurrency
+
+    def map(self, chunks, known=None):
+        """Summarize every chunk, reusing ``known`` summaries keyed by ``chunk_hash``.
+
+        Returns the summaries in chunk order and a dict of the newly computed ones.
+        """
+        known = known or {}
+        missing = [chunk for chunk in dict.fromkeys(chunks) if chunk_hash(chunk) not in known]
+        created = dict(zip((chunk_hash(chunk) for chunk in missing), self._complete_all(MAP_PROMPT, missing)))
+        summaries = {**known, **created}
+        return [summaries[chunk_hash(chunk)] for chunk in chunks], created
+
+    def reduce(self, summaries):
+        """Combine partial summaries, in several rounds if they do not fit into one prompt."""
+        return self.complete(self.reduce_messages(summaries))
+
+    def reduce_messages(self, summaries):
+        """Run the intermediate reduce rounds and return the messages of the final one.
+
+        The final completion is left to the caller, which may stream it.
+        """
+        while len(summaries) > 1:
+            groups = chunk_paragraphs(summaries, self.token_budget)
+            if len(groups) in (1, len(summaries)):
+                break  # fits in one prompt, or another round would not shrink it
+            summaries = self._complete_all(REDUCE_PROMPT, groups)
+        return user_message(REDUCE_PROMPT, '\n\n'.join(summaries))
+
+    def _complete_all(self, prompt, texts):
+        if not texts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts))) as pool:
+            return list(pool.map(lambda text: self.complete(user_message(prompt, text)), texts))
@@ -0,0 +1,71 @@
+import pytest
+from spacy.tokens import Doc
+from spacy.vocab import Vocab
+
+import ingestion
+from app import analyze_paragraphs
+from config import Config
+
+
+def make_doc(words, pos, lemmas, sent_starts):
+    return Doc(Vocab(), words=words, pos=pos, lemmas=lemmas, sent_starts=sent_starts)
+
+
+class TestAnalyzeParagraphs:
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, mocker, monkeypatch):
+        monkeypatch.setenv('OPENAI_API_KEY', 'fake-api-key')
+        self.docs = [
+            make_doc(['Cats', 'chase', 'mice', '.', 'Paris', 'sleeps', '.'],
+                     ['NOUN', 'VERB', 'NOUN', 'PUNCT', 'PROPN', 'VERB', 'PUNCT'],
+                     ['cat', 'chase', 'mouse', '.', 'Paris', 'sleep', '.'],
+                     [True, False, False, False, True, False, False]),
+            make_doc(['It', 'rains', '.'],
+                     ['PRON', 'VERB', 'PUNCT'],
+                     ['it', 'rain', '.'],
+                     [True, False, False]),
+        ]
+        self.mock_pipe = mocker.patch('ingestion.get_nlp').return_value.pipe
+        self.piped = []
+
+        def pipe(pairs, **kwargs):
+            for doc, (text, context) in zip(self.docs, pairs):
+                self.piped.append((text, context))
+                yield doc, context
+        self.mock_pipe.side_effect = pipe
+
+    def test_single_batched_parse(self):
+        paragraphs = ['Cats chase mice. Paris sleeps.', 'It rains.']
+        list(analyze_paragraphs(iter(paragraphs)))
+
+        self.mock_pipe.assert_called_once()
+        assert self.piped == [(p, p) for p in paragraphs]
+        assert self.mock_pipe.call_args.kwargs == {'as_tuples': True, 'batch_size': Config.NLP_BATCH_SIZE,
+                                                   'n_process': ingestion.nlp_n_process}
+
+    def test_sentences_and_keywords_from_same_parse(self):
+        result = list(analyze_paragraphs(['Cats chase mice. Paris sleeps.', 'It rains.']))
+
+        assert result == [
+            ('Cats chase mice. Paris sleeps.', [('Cats chase mice .', ['cat', 'mouse']), ('Paris sleeps .', ['Paris'])]),
+            ('It rains.', [('It rains .', [])]),
+        ]
+
+
+def test_spooled_analysis_reads_back_in_order(monkeypatch):
+    monkeypatch.setattr(ingestion, 'SPOOL_MEMORY_BYTES', 64)  # spill to disk
+    neutral = ingestion.Sentiment('neutral', 0.0, 0.0)
+    paragraphs = [(f'Paragraph {number}.', neutral, [(f'Paragraph {number}.', neutral, ['paragraph'])])
+                  for number in range(5)] + [('Unchanged.', None, None)]
+    produced = []
+
+    def analysis():
+        for paragraph in paragraphs:
+            produced.append(paragraph)
+            yield paragraph
+
+    spooled = ingestion.spool_analysis(analysis(), chunk_rows=4)
+
+    assert produced == paragraphs  # analyzed to the end before anything is read back
+    assert list(spooled) == paragraphs
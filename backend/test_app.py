@@ -1,18 +1,11 @@
 import io
 import pytest
-from app import app, db, process_file, upload_file
+from app import process_file, upload_file
 from models import Document  # Ensure this is correctly imported
 import tempfile
 import os
 
 
-@pytest.fixture
-def client():
-    with app.app_context():
-        db.create_all()
-        yield app.test_client()  # This will automatically use the app context
-        db.session.remove()
-        db.drop_all()
 @pytest.fixture(autouse=True)
 def set_env_vars(monkeypatch):
     monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.compare import compare
+from benchmarks.corpus import CorpusGenerator, write_docx, write_pdf
+from ingestion import extract_text
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def test_corpus_is_deterministic():
+    assert CorpusGenerator(seed=3).text(50) == CorpusGenerator(seed=3).text(50)
+    assert CorpusGenerator(seed=3).text(50) != CorpusGenerator(seed=4).text(50)
+
+
+def test_analyzed_paragraphs_have_the_requested_sentences():
+    rows = list(CorpusGenerator().analyzed_paragraphs(12))
+
+    assert sum(len(sentences) for _, _, sentences in rows) == 12
+    text, sentiment, sentences = rows[0]
+    assert text == ' '.join(sentence for sentence, _, _ in sentences)
+    assert sentiment.label in ('positive', 'negative', 'neutral')
+
+
+@pytest.mark.parametrize('write, extension', [(write_docx, 'docx'), (write_pdf, 'pdf')])
+def test_generated_files_extract_to_the_generated_words(tmp_path, write, extension):
+    text = CorpusGenerator().text(200)
+    path = str(tmp_path / f'corpus.{extension}')
+
+    write(path, text)
+
+    assert extract_text(path, f'corpus.{extension}').split() == text.split()
+
+
+def test_small_run_writes_comparable_results(tmp_path):
+    output = tmp_path / 'results.json'
+    env = {**os.environ, 'OPENAI_API_KEY': 'test-api-key'}
+    subprocess.run([sys.executable, '-m', 'benchmarks.run', '--sizes', '30', '60', '--formats', '--repeat', '2',
+                    '--workdir', str(tmp_path), '--output', str(output)], cwd=BACKEND, env=env, check=True)
+
+    results = json.loads(output.read_text())
+    assert set(results['queries']) == {'30', '60'}
+    assert results['queries']['60']['search.keyword.common']['runs'] == 2
+    assert set(results['meta']) >= {'timestamp', 'commit', 'sqlite'}
+    assert all(ratio == 1.0 for *_, ratio in compare(results, results))
@@ -0,0 +1,199 @@
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import insert
+
+import app as app_module
+import uploads
+from app import app, db
+from jobs import enqueue_job, JOB_QUEUED
+from models import IngestionJob, UploadSession
+
+CONTENT = b'Chunked uploads stream straight to disk. ' * 100
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def wake_up(mocker):
+    return mocker.patch('app.file_processing_queue.put')
+
+
+def start(client, size=len(CONTENT), filename='scan.pdf'):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': size, 'userId': '1'})
+    assert response.status_code == 201
+    return response.json['uploadId']
+
+
+def put(client, upload_id, offset, data):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', data=data,
+                      content_type='application/octet-stream')
+
+
+def test_chunks_are_assembled_hashed_and_queued(client, wake_up, tmp_path):
+    upload_id = start(client)
+    for offset in range(0, len(CONTENT), 1000):
+        assert put(client, upload_id, offset, CONTENT[offset:offset + 1000]).status_code == 200
+
+    response = client.post(f'/api/uploads/{upload_id}/complete',
+                           json={'sha256': hashlib.sha256(CONTENT).hexdigest()})
+
+    assert response.status_code == 202
+    job = db.session.get(IngestionJob, response.json['jobs'][0]['jobId'])
+    assert job.filename == 'scan.pdf'
+    assert job.content_hash == hashlib.sha256(CONTENT).hexdigest()
+    with open(job.filepath, 'rb') as stored:
+        assert stored.read() == CONTENT
+    assert db.session.get(UploadSession, upload_id) is None
+    assert not os.path.exists(uploads.partial_path(str(tmp_path), upload_id))
+    wake_up.assert_called_once()
+
+
+def test_interrupted_upload_resumes_from_the_stored_offset(client, wake_up):
+    upload_id = start(client)
+    assert put(client, upload_id, 0, CONTENT[:1500]).status_code == 200
+    uploads._hashers.clear()  # as after a restart: the running hash is rebuilt from disk
+
+    stale = put(client, upload_id, 0, CONTENT[:1500])
+    assert stale.status_code == 409
+    offset = client.get(f'/api/uploads/{upload_id}').json['offset']
+    assert offset == stale.json['offset'] == 1500
+    assert put(client, upload_id, offset, CONTENT[offset:]).json['complete'] is True
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    job = db.session.get(IngestionJob, response.json['jobs'][0]['jobId'])
+    assert job.content_hash == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_complete_rejects_missing_bytes_and_bad_checksums(client, wake_up):
+    upload_id = start(client)
+    put(client, upload_id, 0, CONTENT[:10])
+    assert client.post(f'/api/uploads/{upload_id}/complete').json == {'error': 'Upload is incomplete', 'offset': 10}
+
+    put(client, upload_id, 10, CONTENT[10:])
+    response = client.post(f'/api/uploads/{upload_id}/complete', json={'sha256': '0' * 64})
+    assert response.status_code == 400
+    assert db.session.get(UploadSession, upload_id) is None
+    wake_up.assert_not_called()
+
+
+def test_complete_waits_for_room_in_the_queue(client, wake_up, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 1)
+    upload_id = start(client)
+    put(client, upload_id, 0, CONTENT)
+    queued = enqueue_job('/tmp/a.txt', 'a.txt', '1')  # filled up while the chunks were arriving
+    db.session.commit()
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers={'Origin': 'http://localhost:3000'})
+
+    assert response.status_code == 429
+    assert response.json['retryAfter'] == int(response.headers['Retry-After']) >= 1
+    assert 'Retry-After' in response.headers['Access-Control-Expose-Headers']
+    assert client.get(f'/api/uploads/{upload_id}').json['complete'] is True  # kept for the retry
+    db.session.delete(queued)
+    db.session.commit()
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 202
+
+
+def test_complete_rechecks_the_queue_after_adding_its_job(client, wake_up, monkeypatch, mocker, tmp_path):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 1)
+    upload_id = start(client)
+    put(client, upload_id, 0, CONTENT)
+    queue_upload = app_module.queue_upload
+
+    def racing_queue_upload(*args):
+        # Another upload takes the last place after this completion's capacity check
+        with db.engine.begin() as connection:
+            connection.execute(insert(IngestionJob).values(filepath='/tmp/a.txt', filename='a.txt', user_id='1',
+                                                           status=JOB_QUEUED))
+        return queue_upload(*args)
+
+    mocker.patch.object(app_module, 'queue_upload', side_effect=racing_queue_upload)
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+
+    assert response.status_code == 429
+    assert [job.filename for job in IngestionJob.query.all()] == ['a.txt']
+    assert os.listdir(tmp_path) == [f'{upload_id}.part']
+    assert client.get(f'/api/uploads/{upload_id}').json['complete'] is True
+    wake_up.assert_not_called()
+
+
+def test_chunk_past_declared_size_is_refused(client):
+    upload_id = start(client, size=10)
+
+    response = put(client, upload_id, 0, b'x' * 11)
+
+    assert response.status_code == 400
+    assert response.json['offset'] == 10  # the bytes that fit are kept
+
+
+def test_chunks_over_the_request_limit_are_refused(client, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'UPLOAD_CHUNK_BYTES', 100)
+    upload_id = start(client)
+
+    response = put(client, upload_id, 0, CONTENT[:101])
+    assert response.status_code == 413
+    assert response.json['offset'] == 0
+
+    # A body without Content-Length is cut off at the limit as it streams in
+    upload = db.session.get(UploadSession, upload_id)
+    with pytest.raises(uploads.ChunkTooLarge):
+        uploads.write_chunk(upload, str(tmp_path), 0, io.BytesIO(CONTENT[:150]), 64, 100)
+    assert upload.received == 100
+
+
+def test_upload_is_held_across_processes(client, tmp_path):
+    if uploads.fcntl is None:
+        pytest.skip('no flock on this platform')
+    upload = db.session.get(UploadSession, start(client))
+
+    with uploads.hold_upload(upload, str(tmp_path)):
+        with open(uploads.partial_path(str(tmp_path), upload.id), 'rb') as other_process:
+            with pytest.raises(BlockingIOError):
+                uploads.fcntl.flock(other_process, uploads.fcntl.LOCK_EX | uploads.fcntl.LOCK_NB)
+
+
+def test_complete_validates_the_checksum_type(client, wake_up):
+    upload_id = start(client)
+    put(client, upload_id, 0, CONTENT)
+
+    assert client.post(f'/api/uploads/{upload_id}/complete', json={'sha256': 123}).status_code == 400
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 202
+
+
+def test_complete_of_an_upload_completed_meanwhile_is_409(client, wake_up, tmp_path):
+    upload_id = start(client)
+    put(client, upload_id, 0, CONTENT)
+    # Another process's completion has moved the file and not yet committed
+    os.replace(uploads.partial_path(str(tmp_path), upload_id), str(tmp_path / 'scan.pdf'))
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+
+    assert response.status_code == 409
+    assert put(client, upload_id, len(CONTENT), b'').status_code == 409
+    wake_up.assert_not_called()
+
+
+def test_start_validates_the_request(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_MAX_BYTES', 100)
+    body = {'filename': 'scan.pdf', 'size': 10, 'userId': '1'}
+
+    assert client.post('/api/uploads', json={**body, 'filename': 'run.exe'}).status_code == 400
+    assert client.post('/api/uploads', json={**body, 'size': 'big'}).status_code == 400
+    assert client.post('/api/uploads', json={**body, 'size': 101}).status_code == 413
+    assert client.put('/api/uploads/missing?offset=0', data=b'x').status_code == 404
+
+
+def test_abandoned_uploads_expire(client, monkeypatch, tmp_path):
+    upload_id = start(client)
+    monkeypatch.setitem(app.config, 'UPLOAD_SESSION_TTL_SECONDS', -1)
+
+    start(client, filename='other.pdf')
+
+    assert db.session.get(UploadSession, upload_id) is None
+    assert not os.path.exists(uploads.partial_path(str(tmp_path), upload_id))
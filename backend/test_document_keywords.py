@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import select
+
+from app import db, store_document
+from ingestion import Sentiment
+from models import DocumentTerm
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def add_document(filename, sentence_keywords):
+    sentences = [(f'{filename} sentence {i}.', NEUTRAL, keywords) for i, keywords in enumerate(sentence_keywords)]
+    return store_document(filename, '1', [(' '.join(text for text, _, _ in sentences), NEUTRAL, sentences)])
+
+
+@pytest.fixture
+def corpus(client):
+    add_document('report.txt', [['Invoice', 'invoice', 'company'], ['invoice', 'company', 'Berlin'],
+                                ['company', 'audit']])
+    add_document('memo.txt', [['company', 'meeting']])
+    add_document('note.txt', [['company', 'lunch']])
+
+
+def keywords(client, **body):
+    response = client.post('/document/keywords', json={'filename': 'report.txt', **body})
+    assert response.status_code == 200
+    return response.json
+
+
+def test_returns_distinct_keywords_by_count(client, corpus):
+    result = keywords(client)
+
+    assert result['keywords'] == ['company', 'invoice', 'audit', 'berlin']
+    assert result['counts'][0] == {'keyword': 'company', 'count': 3, 'score': 3.0}
+
+
+def test_limit_returns_top_n(client, corpus):
+    assert keywords(client, limit=2)['keywords'] == ['company', 'invoice']
+
+
+def test_tfidf_pushes_corpus_wide_terms_down(client, corpus):
+    result = keywords(client, weighting='tfidf')
+
+    # 'company' is in every document, so three occurrences score below three of 'invoice'
+    assert result['keywords'] == ['invoice', 'company', 'audit', 'berlin']
+    scores = {entry['keyword']: entry['score'] for entry in result['counts']}
+    assert scores['company'] == pytest.approx(3.0)
+    assert scores['invoice'] > scores['company'] > scores['audit']
+
+
+def test_unknown_document_and_bad_weighting(client, corpus):
+    assert client.post('/document/keywords', json={'filename': 'missing.txt'}).status_code == 404
+    assert client.post('/document/keywords', json={'filename': 'report.txt', 'weighting': 'bm25'}).status_code == 400
+
+
+def test_top_terms_are_read_in_index_order(client):
+    statement = (select(DocumentTerm.term, DocumentTerm.tf).where(DocumentTerm.document_id == 1)
+                 .order_by(DocumentTerm.tf.desc(), DocumentTerm.term).limit(10))
+    compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+
+    plan = [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+    assert any('ix_document_term_document_id_tf' in step for step in plan)
+    assert not any('TEMP B-TREE' in step for step in plan)  # no sort step
@@ -0,0 +1,126 @@
+import io
+
+import pytest
+
+import ingestion
+from app import db, run_pending_jobs, store_document, stored_paragraphs, update_document
+from ingestion import Sentiment, analyze_text, paragraph_hash
+from jobs import JOB_DONE
+from models import Document, DocumentTerm, IngestionJob, Paragraph, Sentence, TermStats
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+POSITIVE = Sentiment('positive', 0.5, 0.5)
+
+
+def paragraph(text, keywords, sentiment=NEUTRAL):
+    return text, sentiment, [(text, sentiment, keywords)]
+
+
+INTRO = paragraph('The lease starts in May.', ['lease'])
+RENT = paragraph('Rent is due monthly.', ['rent'])
+NOTICE = paragraph('Termination requires notice.', ['notice'])
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def upload(client, mocker):
+    mocker.patch('app.file_processing_queue.put')
+
+    def post(content, filename, update=True, status=202):
+        data = {'file': (io.BytesIO(content), filename), 'userId': '1', 'update': 'true' if update else ''}
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
+        assert response.status_code == status
+        return response.json
+
+    return post
+
+
+def unchanged(text):
+    return text, None, None
+
+
+def paragraph_ids(document_id):
+    return {p.content: p.id for p in Paragraph.query.filter_by(document_id=document_id)}
+
+
+def test_unchanged_paragraphs_are_not_analyzed_and_keep_their_place(mocker):
+    score = mocker.spy(ingestion, 'score_sentiment')
+    text = 'Alpha stays.\n\nBeta is new.\n\nGamma stays.\n\nAlpha stays.'
+
+    result = list(analyze_text(text, unchanged={paragraph_hash('Alpha stays.'): 1, paragraph_hash('Gamma stays.'): 1}))
+
+    assert [(text, sentiment is None) for text, sentiment, _ in result] == [
+        ('Alpha stays.', True), ('Beta is new.', False), ('Gamma stays.', True), ('Alpha stays.', False)]
+    assert [call.args[0] for call in score.call_args_list] == ['Beta is new.', 'Alpha stays.']
+
+
+def test_update_keeps_unchanged_rows_and_moves_their_offsets(client):
+    document = store_document('lease.txt', '1', [INTRO, RENT, NOTICE])
+    before = paragraph_ids(document.id)
+    deposit = paragraph('A deposit of two months is required.', ['deposit'], POSITIVE)
+
+    update_document(document, [deposit, unchanged(INTRO[0]), unchanged(NOTICE[0])], 'new-hash')
+
+    after = paragraph_ids(document.id)
+    assert after[INTRO[0]] == before[INTRO[0]] and after[NOTICE[0]] == before[NOTICE[0]]
+    assert RENT[0] not in after
+    assert [text for text, _, _ in stored_paragraphs(document.id)] == [deposit[0], INTRO[0], NOTICE[0]]
+    assert [s.content for s in Sentence.query.join(Paragraph).order_by(Sentence.start_offset)] == \
+        [deposit[0], INTRO[0], NOTICE[0]]
+    assert document.content == '\n\n'.join([deposit[0], INTRO[0], NOTICE[0]])
+    assert document.content_hash == 'new-hash'
+    assert document.sentiment == 'positive'
+
+
+def test_update_adjusts_term_counts_and_fulltext(client):
+    document = store_document('lease.txt', '1', [INTRO, RENT])
+    store_document('other.txt', '1', [RENT])
+
+    update_document(document, [unchanged(INTRO[0]), NOTICE])
+
+    assert {t.term: t.tf for t in DocumentTerm.query.filter_by(document_id=document.id)} == {'lease': 1, 'notice': 1}
+    assert {t.term: t.document_frequency for t in TermStats.query} == {'lease': 1, 'rent': 1, 'notice': 1}
+    assert document.term_count == 2
+    search = lambda q: client.get('/api/search/fulltext', query_string={'q': q, 'userId': '1'}).json['results']
+    assert [r['filename'] for r in search('rent')] == ['other.txt']
+    assert [r['filename'] for r in search('termination')] == ['lease.txt']
+
+
+def test_update_rejects_a_paragraph_it_does_not_know(client):
+    document = store_document('lease.txt', '1', [INTRO])
+
+    with pytest.raises(ValueError):
+        update_document(document, [unchanged(RENT[0])])
+
+
+def test_upload_with_update_replaces_the_document(client, upload):
+    upload(b'First clause.\n\nSecond clause.', 'contract.txt', update=False)
+    run_pending_jobs()
+    document = Document.query.one()
+    first_id = paragraph_ids(document.id)['First clause.']
+
+    job = upload(b'First clause.\n\nAmended clause.', 'contract.txt')['jobs'][0]
+    busy = upload(b'Another version.', 'contract.txt', status=409)
+    run_pending_jobs()
+
+    assert job['updatesDocumentId'] == document.id and busy['documentId'] == document.id
+    assert client.get(f"/api/jobs/{job['jobId']}").json['documentId'] == document.id
+    assert Document.query.count() == 1
+    assert db.session.get(Document, document.id).content == 'First clause.\n\nAmended clause.'
+    assert paragraph_ids(document.id)['First clause.'] == first_id
+
+
+def test_update_with_identical_content_is_a_duplicate(client, upload, mocker):
+    upload(b'Only clause.', 'contract.txt', update=False)
+    run_pending_jobs()
+    ingest = mocker.patch('app.ingest_file')
+
+    job = upload(b'Only clause.', 'contract.txt')['jobs'][0]
+
+    assert job['duplicate'] is True and job['documentId'] == Document.query.one().id
+    assert db.session.get(IngestionJob, job['jobId']).status == JOB_DONE
+    ingest.assert_not_called()
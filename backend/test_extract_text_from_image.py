@@ -1,20 +1,25 @@
 from tkinter import Image
 
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 from PIL import Image
 import pytesseract  # Ensure pytesseract is imported
 
 from app import extract_text_from_image  # Make sure your function is correctly imported
 
 
+def blank_page():
+    # A real grayscale image: the OCR stage reads its mode, size and frames before calling tesseract
+    return Image.new('L', (200, 100), 255)
+
+
 class TestExtractTextFromImage:
 
     @pytest.fixture(autouse=True)
     def setup_mocks(self, mocker, monkeypatch):
         monkeypatch.setenv('OPENAI_API_KEY', 'fake-api-key')
         # Patch Image.open globally for all methods
-        self.mock_open = mocker.patch('PIL.Image.open', return_value=MagicMock(spec=Image))
+        self.mock_open = mocker.patch('PIL.Image.open', return_value=blank_page())
         # Patch pytesseract.image_to_string globally for all methods
         self.mock_ocr = mocker.patch('pytesseract.image_to_string', return_value='Text from image')
 
@@ -46,7 +51,7 @@ class TestExtractTextFromImage:
     #  Uses pytesseract library to perform OCR on the image
     def test_uses_pytesseract_library(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
 
@@ -59,7 +64,7 @@ class TestExtractTextFromImage:
     #  Handles images with clear and readable text
     def test_handles_clear_and_readable_text(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -72,7 +77,7 @@ class TestExtractTextFromImage:
     #  Handles images with multiple lines of text
     def test_handles_multiple_lines_of_text(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Line 1\nLine 2\nLine 3')
     
@@ -85,7 +90,7 @@ class TestExtractTextFromImage:
     #  Handles images with low resolution or poor image quality
     def test_handles_low_resolution_or_poor_quality(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -98,7 +103,7 @@ class TestExtractTextFromImage:
     #  Handles images with distorted or skewed text
     def test_handles_distorted_or_skewed_text(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -111,7 +116,7 @@ class TestExtractTextFromImage:
     #  Handles images with non-English text
     def test_handles_non_english_text(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -124,7 +129,7 @@ class TestExtractTextFromImage:
     #  Handles images with handwritten text
     def test_handles_handwritten_text(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -137,7 +142,7 @@ class TestExtractTextFromImage:
     #  Handles images with text overlaying graphics or other elements
     def test_handles_text_overlaying_graphics(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function
         mocker.patch('pytesseract.image_to_string', return_value='Text from image')
     
@@ -150,7 +155,7 @@ class TestExtractTextFromImage:
     #  Raises appropriate exceptions if pytesseract library is not installed or image file is not supported
     def test_raises_exceptions_if_dependencies_not_installed_or_file_not_supported(self, mocker):
         # Mock the Image.open() function
-        mocker.patch('PIL.Image.open')
+        mocker.patch('PIL.Image.open', return_value=blank_page())
         # Mock the pytesseract.image_to_string() function to raise an exception
         mocker.patch('pytesseract.image_to_string', side_effect=Exception)
     
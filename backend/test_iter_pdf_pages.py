@@ -0,0 +1,90 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytest
+
+import ingestion
+from config import Config
+from ingestion import ExtractionReport, iter_paragraphs, iter_pdf_pages
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'report.pdf'
+    doc = fitz.open()
+    for number in range(7):
+        doc.new_page().insert_text((72, 72), f'Page {number} text')
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def test_pages_stream_in_order_with_timings(pdf_path):
+    report = ExtractionReport()
+    pages = list(iter_pdf_pages(pdf_path, report))
+
+    assert [page.strip() for page in pages] == [f'Page {number} text' for number in range(7)]
+    summary = report.to_dict()
+    assert summary['pages'] == 7 and len(summary['pageSeconds']) == 7
+    assert summary['failures'] == []
+
+
+def test_parallel_ranges_match_sequential(pdf_path, monkeypatch):
+    sequential = list(iter_pdf_pages(pdf_path, ExtractionReport()))
+    monkeypatch.setattr(ingestion, 'pdf_workers', 2)
+    monkeypatch.setattr(Config, 'PDF_PARALLEL_MIN_PAGES', 2)
+    monkeypatch.setattr(Config, 'PDF_PAGES_PER_TASK', 2)
+    report = ExtractionReport()
+
+    assert list(iter_pdf_pages(pdf_path, report)) == sequential
+    assert report.to_dict()['pages'] == 7
+
+
+def test_jobs_share_one_pdf_pool(pdf_path, monkeypatch):
+    monkeypatch.setattr(ingestion, 'pdf_workers', 2)
+    monkeypatch.setattr(ingestion, '_pdf_pool', None)
+    monkeypatch.setattr(Config, 'PDF_PARALLEL_MIN_PAGES', 2)
+    list(iter_pdf_pages(pdf_path, ExtractionReport()))
+    pool = ingestion._pdf_pool
+
+    list(iter_pdf_pages(pdf_path, ExtractionReport()))
+
+    assert pool is not None and ingestion._pdf_pool is pool
+    pool.shutdown()
+
+
+def test_a_broken_pdf_pool_is_replaced(pdf_path, monkeypatch, mocker):
+    monkeypatch.setattr(ingestion, 'pdf_workers', 2)
+    monkeypatch.setattr(Config, 'PDF_PARALLEL_MIN_PAGES', 2)
+    broken = mocker.MagicMock()
+    broken.submit.side_effect = BrokenProcessPool('worker died')
+    monkeypatch.setattr(ingestion, '_pdf_pool', broken)
+
+    with pytest.raises(BrokenProcessPool):
+        list(iter_pdf_pages(pdf_path, ExtractionReport()))
+
+    assert ingestion._pdf_pool is None
+    broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+
+
+def test_failed_pages_are_reported_not_hidden(mocker):
+    good, bad = mocker.MagicMock(), mocker.MagicMock()
+    good.get_text.return_value = 'fine'
+    bad.get_text.side_effect = RuntimeError('broken xref')
+    doc = mocker.MagicMock()
+    doc.__iter__.return_value = [good, bad, good]
+    mocker.patch('fitz.open', return_value=doc)
+    report = ExtractionReport()
+
+    assert list(iter_pdf_pages('scan.pdf', report)) == ['fine', 'fine']
+    assert report.failures == [{'page': 1, 'error': 'broken xref'}]
+
+
+@pytest.mark.parametrize('pieces', [
+    ['one\n\ntwo', '\n\nthree'],
+    ['one\n', '\ntwo\n\n', ''],
+    ['', ''],
+    ['no breaks at all'],
+])
+def test_iter_paragraphs_matches_split(pieces):
+    assert list(iter_paragraphs(pieces)) == ''.join(pieces).split('\n\n')
@@ -0,0 +1,274 @@
+import io
+import os
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+import app as app_module
+from app import app, db, ingest_file, run_pending_jobs, store_document
+from config import Config
+from ingestion import Sentiment
+from flask import Request
+from sqlalchemy import insert, update
+
+from jobs import (enqueue_job, claim_next_job, claimed_job, fail_job, finish_job, keep_lease, JOB_DONE, JOB_FAILED,
+                  JOB_QUEUED, JOB_RUNNING)
+from models import Document, IngestionJob, utcnow
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def test_upload_returns_job_ids(client, mocker):
+    mocker.patch('app.file_processing_queue.put')
+    data = {'file': (io.BytesIO(b'Some text'), 'jobs.txt'), 'userId': '1'}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    job_id = response.json['jobs'][0]['jobId']
+    status = client.get(f'/api/jobs/{job_id}')
+    assert status.status_code == 200
+    assert status.json['status'] == JOB_QUEUED
+    assert status.json['filename'] == 'jobs.txt'
+
+
+def test_unknown_job_returns_404(client):
+    assert client.get('/api/jobs/999').status_code == 404
+
+
+def test_claim_is_oldest_first_and_exclusive(client):
+    first = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    second = enqueue_job('/tmp/b.txt', 'b.txt', '1')
+    db.session.commit()
+
+    assert claim_next_job(60, 3).id == first.id
+    assert claim_next_job(60, 3).id == second.id
+    assert claim_next_job(60, 3) is None
+    assert db.session.get(IngestionJob, first.id).status == JOB_RUNNING
+
+
+def outrun_leases():
+    """Age every lease past the one the tests claim with, as if the jobs' workers had died."""
+    db.session.execute(update(IngestionJob).values(heartbeat_at=utcnow() - timedelta(hours=2)))
+    db.session.commit()
+
+
+def test_orphaned_running_job_is_reclaimed(client):
+    job = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    job.status = JOB_RUNNING
+    job.attempts = 1
+    job.started_at = job.heartbeat_at = utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    reclaimed = claim_next_job(60, 3)
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+def test_job_gives_up_after_max_attempts(client):
+    job = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    job.status = JOB_RUNNING
+    job.attempts = 3
+    job.started_at = job.heartbeat_at = utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    assert claim_next_job(60, 3) is None
+    assert db.session.get(IngestionJob, job.id).status == JOB_FAILED
+
+
+def test_heartbeat_keeps_a_long_job_claimed(client):
+    enqueue_job('/tmp/scan.pdf', 'scan.pdf', '1')
+    db.session.commit()
+    job = claim_next_job(60, 3)
+
+    with keep_lease(job, 0.01):
+        outrun_leases()  # the job has been running longer than the lease
+        time.sleep(0.2)
+        assert claim_next_job(60, 3) is None
+
+    assert db.session.get(IngestionJob, job.id, populate_existing=True).heartbeat_at > utcnow() - timedelta(seconds=5)
+
+
+def test_worker_whose_claim_expired_cannot_settle_the_job(client):
+    enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    db.session.commit()
+    job_id = claim_next_job(60, 3).id
+    outrun_leases()
+    assert claim_next_job(60, 3).attempts == 2  # another worker took the job over
+
+    assert not fail_job(claimed_job(job_id, 1), 'stale worker')
+    assert finish_job(claimed_job(job_id, 2), 42)
+    assert not finish_job(claimed_job(job_id, 1), 7)
+    job = db.session.get(IngestionJob, job_id)
+    assert (job.status, job.document_id, job.error) == (JOB_DONE, 42, None)
+
+
+def test_run_pending_jobs_records_outcome(client, mocker):
+    mocker.patch('app.ingest_file', side_effect=[Document(id=42), ValueError('bad file')])
+    ok = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    broken = enqueue_job('/tmp/b.txt', 'b.txt', '1')
+    db.session.commit()
+
+    run_pending_jobs()
+
+    ok = db.session.get(IngestionJob, ok.id)
+    broken = db.session.get(IngestionJob, broken.id)
+    assert (ok.status, ok.document_id) == (JOB_DONE, 42)
+    assert ok.to_dict()['durationSeconds'] is not None
+    assert (broken.status, broken.error) == (JOB_FAILED, 'bad file')
+
+
+def test_claims_are_round_robin_across_users(client):
+    bulk = [enqueue_job(f'/tmp/bulk{number}.txt', f'bulk{number}.txt', 'bulk') for number in range(3)]
+    single = enqueue_job('/tmp/single.txt', 'single.txt', 'interactive')
+    db.session.commit()
+
+    claimed = [claim_next_job(60, 3).id for _ in range(4)]
+
+    assert claimed == [bulk[0].id, single.id, bulk[1].id, bulk[2].id]
+
+
+def test_per_user_running_cap(client):
+    first = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    enqueue_job('/tmp/b.txt', 'b.txt', '1')
+    other = enqueue_job('/tmp/c.txt', 'c.txt', '2')
+    db.session.commit()
+
+    assert claim_next_job(60, 3, user_limit=1).id == first.id
+    assert claim_next_job(60, 3, user_limit=1).id == other.id
+    assert claim_next_job(60, 3, user_limit=1) is None
+
+
+def test_upload_over_capacity_returns_429(client, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 2)
+    wake_up = mocker.patch('app.file_processing_queue.put')
+    save_upload = mocker.spy(app_module, 'save_upload')
+    enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    enqueue_job('/tmp/b.txt', 'b.txt', '1')
+    db.session.commit()
+
+    data = {'file': (io.BytesIO(b'Some text'), 'full.txt'), 'userId': '1'}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json['queued'] == 2
+    save_upload.assert_not_called()
+    wake_up.assert_not_called()
+    other_user = {'file': (io.BytesIO(b'Other text'), 'other.txt'), 'userId': '2'}
+    assert client.post('/upload', data=other_user, content_type='multipart/form-data').status_code == 202
+
+
+def test_upload_announcing_a_full_queue_is_refused_unread(client, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 1)
+    parse = mocker.spy(Request, '_load_form_data')
+    enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    db.session.commit()
+
+    data = {'file': (io.BytesIO(b'Some text'), 'full.txt'), 'userId': '1'}
+    response = client.post('/upload?userId=1&files=1', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 429
+    parse.assert_not_called()
+
+
+def test_upload_larger_than_the_queue_returns_413(client, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 2)
+    save_upload = mocker.spy(app_module, 'save_upload')
+
+    data = {'file': [(io.BytesIO(b'Some text'), f'{name}.txt') for name in 'abc'], 'userId': '1'}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 413
+    assert response.json['maxFiles'] == 2
+    assert 'Retry-After' not in response.headers
+    save_upload.assert_not_called()
+
+
+def test_concurrent_uploads_cannot_overfill_the_queue(client, mocker, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'INGEST_USER_MAX_QUEUED', 1)
+    wake_up = mocker.patch('app.file_processing_queue.put')
+    save_upload = app_module.save_upload
+
+    def racing_save_upload(file, folder):
+        # Another upload of the user commits its job after this one's capacity check passed
+        with db.engine.begin() as connection:
+            connection.execute(insert(IngestionJob).values(filepath='/tmp/a.txt', filename='a.txt', user_id='1',
+                                                           status=JOB_QUEUED))
+        return save_upload(file, folder)
+
+    mocker.patch.object(app_module, 'save_upload', side_effect=racing_save_upload)
+    data = {'file': (io.BytesIO(b'Some text'), 'late.txt'), 'userId': '1'}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 429
+    assert [job.filename for job in IngestionJob.query.all()] == ['a.txt']
+    assert os.listdir(tmp_path) == []
+    wake_up.assert_not_called()
+
+
+def upload_during(client, ingest, busy, release):
+    """POST an upload once ``ingest``, run on another thread, signals ``busy``; returns the response."""
+    worker = threading.Thread(target=ingest)
+    worker.start()
+    try:
+        assert busy.wait(5)
+        data = {'file': (io.BytesIO(b'Some text'), 'meanwhile.txt'), 'userId': '2'}
+        return client.post('/upload', data=data, content_type='multipart/form-data')
+    finally:
+        release.set()
+        worker.join()
+
+
+def test_uploads_are_not_blocked_by_a_slow_ingest(client, mocker):
+    mocker.patch('app.file_processing_queue.put')
+    neutral = Sentiment('neutral', 0.0, 0.0)
+    analyzing, release, stored = threading.Event(), threading.Event(), []
+
+    def slow_analysis():
+        yield 'First paragraph.', neutral, [('First paragraph.', neutral, ['paragraph'])]
+        analyzing.set()
+        release.wait(10)  # spaCy still busy with the rest of the file
+        yield 'Second paragraph.', neutral, [('Second paragraph.', neutral, ['paragraph'])]
+
+    def ingest():
+        with app.app_context():
+            stored.append(store_document('slow.txt', '1', slow_analysis()).content)
+
+    response = upload_during(client, ingest, analyzing, release)
+
+    assert response.status_code == 202
+    assert stored == ['First paragraph.\n\nSecond paragraph.']
+
+
+@pytest.mark.parametrize('update', [False, True])
+def test_uploads_are_not_blocked_by_slow_extraction(client, mocker, monkeypatch, update):
+    mocker.patch('app.file_processing_queue.put')
+    # Every paragraph is parsed and due for writing as soon as it is extracted, as in a long file
+    monkeypatch.setattr(Config, 'NLP_BATCH_SIZE', 1)
+    monkeypatch.setitem(app.config, 'INGEST_CHUNK_ROWS', 1)
+    neutral = Sentiment('neutral', 0.0, 0.0)
+    extracting, release, stored = threading.Event(), threading.Event(), []
+
+    def slow_pages(filepath, filename, report=None):
+        yield 'First page.\n\n'
+        extracting.set()
+        release.wait(10)  # OCR of the next page
+        yield 'Second page.'
+
+    mocker.patch('app.iter_text', side_effect=slow_pages)
+    updates = store_document('scan.pdf', '1', [('Old page.', neutral, [('Old page.', neutral, [])])]).id \
+        if update else None
+
+    def ingest():
+        with app.app_context():
+            stored.append(ingest_file('scan.pdf', 'scan.pdf', '1', updates_document_id=updates).content)
+
+    response = upload_during(client, ingest, extracting, release)
+
+    assert response.status_code == 202
+    assert stored == ['First page.\n\nSecond page.']
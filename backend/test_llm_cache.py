@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+import pytest
+
+from app import db
+from llm_cache import LLMCache, cache_key
+from models import LLMCacheEntry
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def mock_openai(mocker):
+    create = mocker.patch('app.get_openai_client').return_value.chat.completions.create
+    create.return_value.choices = [mocker.MagicMock()]
+    create.return_value.choices[0].message.content = 'Money coming in.'
+    return create
+
+
+def test_repeat_definition_hits_cache(client, mock_openai):
+    for _ in range(3):
+        response = client.post('/keyword/definition', json={'keyword': 'revenue'})
+        assert response.json['definition'] == 'Money coming in.'
+
+    mock_openai.assert_called_once()
+    stats = client.get('/api/cache/llm').json
+    assert stats['memoryHits'] >= 2
+
+
+def test_database_tier_survives_memory_loss(client):
+    key = cache_key('m', [{'role': 'user', 'content': 'hi'}])
+    cache = LLMCache(max_entries=4, ttl_seconds=60, db_max_entries=10)
+    cache.set(key, 'm', 'hello')
+
+    fresh = LLMCache(max_entries=4, ttl_seconds=60, db_max_entries=10)  # e.g. after a restart
+    assert fresh.get(key) == 'hello'
+    assert fresh.stats()['dbHits'] == 1
+
+
+def test_expired_entries_are_misses(client):
+    cache = LLMCache(max_entries=4, ttl_seconds=60, db_max_entries=10)
+    cache.set('k', 'm', 'stale')
+    db.session.get(LLMCacheEntry, 'k').expires_at -= timedelta(seconds=120)
+    db.session.commit()
+    cache._entries.clear()
+
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_size_bounds_evict_oldest(client):
+    cache = LLMCache(max_entries=2, ttl_seconds=60, db_max_entries=3)
+    for i in range(5):
+        cache.set(f'k{i}', 'm', str(i))
+
+    assert list(cache._entries) == ['k3', 'k4']
+    assert sorted(row.key for row in LLMCacheEntry.query.all()) == ['k2', 'k3', 'k4']
+
+
+def test_invalidate_clears_both_tiers(client, mock_openai):
+    client.post('/keyword/definition', json={'keyword': 'revenue'})
+    response = client.delete('/api/cache/llm')
+
+    assert response.json['removed'] == 1
+    client.post('/keyword/definition', json={'keyword': 'revenue'})
+    assert mock_openai.call_count == 2
+
+
+def test_invalidate_reaches_other_workers(client):
+    key = cache_key('m', [{'role': 'user', 'content': 'hi'}])
+    worker, other_worker = (LLMCache(max_entries=4, ttl_seconds=60, db_max_entries=10) for _ in range(2))
+    worker.set(key, 'm', 'hello')
+    assert other_worker.get(key) == 'hello'  # now in its memory tier too
+
+    worker.invalidate()
+
+    assert other_worker.get(key) is None
+    worker.set(key, 'm', 'hello again')
+    assert other_worker.get(key) == 'hello again'
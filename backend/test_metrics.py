@@ -0,0 +1,104 @@
+import json
+import os
+import re
+
+import pytest
+
+from app import app, chat_completion, db, run_pending_jobs, store_document
+from ingestion import Sentiment
+from jobs import enqueue_job
+from metrics import Registry, external_request_errors, ingest_jobs, ingest_stage_seconds
+from models import Document, IngestionJob
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def sample(text, name, **labels):
+    """The value of the first ``name`` sample line with ``labels`` in a Prometheus exposition, or None."""
+    for match in re.finditer(rf'^{re.escape(name)}(?:{{(.*)}})? (\S+)$', text, re.MULTILINE):
+        if labels.items() <= dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1) or '')).items():
+            return float(match.group(2))
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency.', ('path',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, path='/a"b')
+
+    text = registry.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'latency_seconds_bucket', path='/a\\"b', le='0.1') == 2
+    assert sample(text, 'latency_seconds_bucket', path='/a\\"b', le='1') == 3
+    assert sample(text, 'latency_seconds_bucket', path='/a\\"b', le='+Inf') == 4
+    assert sample(text, 'latency_seconds_count', path='/a\\"b') == 4
+    assert sample(text, 'latency_seconds_sum', path='/a\\"b') == pytest.approx(3.65)
+
+
+def test_samples_are_labelled_with_the_process():
+    registry = Registry()
+    registry.counter('uploads_total', 'Uploads.').inc()
+    registry.gauge('queue_depth', 'Depth.', ('status',)).set_function(lambda: {('queued',): 2})
+
+    text = registry.render()
+
+    assert f'uploads_total{{pid="{os.getpid()}"}} 1' in text
+    assert f'queue_depth{{status="queued",pid="{os.getpid()}"}} 2' in text
+
+
+def test_metrics_endpoint_reports_requests_and_queue(client):
+    enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    db.session.commit()
+    client.get('/api/jobs/999')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert sample(text, 'http_request_duration_seconds_count', endpoint='get_job', method='GET', status='404') >= 1
+    assert sample(text, 'ingest_queue_depth', status='queued') == 1
+    assert sample(text, 'ingest_queue_oldest_age_seconds') >= 0
+
+
+def test_jobs_record_stage_times_and_trace(client, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_TRACE', True)
+
+    def ingest(filepath, filename, user_id, report, content_hash, updates_document_id):
+        report.stages.seconds['sentiment'] = 0.25
+        return store_document(filename, user_id, [('Text.', NEUTRAL, [('Text.', NEUTRAL, [])])], content_hash,
+                              report.stages)
+
+    mocker.patch('app.ingest_file', side_effect=ingest)
+    done, sentiment_observations = ingest_jobs.value(outcome='done'), ingest_stage_seconds.count(stage='sentiment')
+    job = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    db.session.commit()
+
+    run_pending_jobs()
+
+    assert ingest_jobs.value(outcome='done') == done + 1
+    assert ingest_stage_seconds.count(stage='sentiment') == sentiment_observations + 1
+    trace = json.loads(db.session.get(Document, db.session.get(IngestionJob, job.id).document_id).trace)
+    assert trace['jobId'] == job.id
+    assert trace['stageSeconds']['sentiment'] == 0.25
+    assert trace['queuedSeconds'] >= 0
+
+
+def test_external_calls_count_errors(client, mocker):
+    mocker.patch('requests.Session.get').return_value.status_code = 404
+    mocker.patch('app.get_openai_client').return_value.chat.completions.create.side_effect = RuntimeError('down')
+    google, openai = external_request_errors.value(service='google'), external_request_errors.value(service='openai')
+
+    assert client.post('/search', json={'keyword': 'metrics'}).status_code == 404
+    with pytest.raises(RuntimeError):
+        chat_completion([{'role': 'user', 'content': 'Define metrics.'}])
+
+    assert external_request_errors.value(service='google') == google + 1
+    assert external_request_errors.value(service='openai') == openai + 1
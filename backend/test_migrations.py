@@ -0,0 +1,99 @@
+import os
+import sqlite3
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask import Flask
+from flask_migrate import Migrate, downgrade, stamp, upgrade
+from sqlalchemy import text
+
+from app import db
+from fulltext import include_in_migrations
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# What db.create_all() built before migrations existed
+ORIGINAL_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, email VARCHAR(100) NOT NULL, PRIMARY KEY (id), UNIQUE (email));
+CREATE TABLE document (
+    id INTEGER NOT NULL, user_id VARCHAR(255), filename VARCHAR(256) NOT NULL, content TEXT NOT NULL,
+    sentiment VARCHAR(50) NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id), UNIQUE (filename));
+CREATE TABLE paragraph (
+    id INTEGER NOT NULL, document_id INTEGER NOT NULL, content TEXT NOT NULL, sentiment VARCHAR(50) NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(document_id) REFERENCES document (id));
+CREATE TABLE sentence (
+    id INTEGER NOT NULL, paragraph_id INTEGER NOT NULL, content TEXT NOT NULL, sentiment VARCHAR(50) NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(paragraph_id) REFERENCES paragraph (id));
+CREATE TABLE keyword (
+    id INTEGER NOT NULL, sentence_id INTEGER NOT NULL, word VARCHAR(255) NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(sentence_id) REFERENCES sentence (id));
+"""
+
+# The original ingestion stored the whole text as the document content, with paragraph and
+# sentence text copied into their own rows
+ORIGINAL_ROWS = """
+INSERT INTO user (id, email) VALUES (1, 'tenant@example.com');
+INSERT INTO document (id, user_id, filename, content, sentiment)
+    VALUES (1, '1', 'lease.txt', 'The tenant pays rent. The lease ends in May.
+
+Pets are not allowed.', 'neutral');
+INSERT INTO paragraph (id, document_id, content, sentiment)
+    VALUES (1, 1, 'The tenant pays rent. The lease ends in May.', 'neutral'),
+           (2, 1, 'Pets are not allowed.', 'negative');
+INSERT INTO sentence (id, paragraph_id, content, sentiment)
+    VALUES (1, 1, 'The tenant pays rent.', 'neutral'), (2, 1, 'The lease ends in May.', 'neutral'),
+           (3, 2, 'Pets are not allowed.', 'negative');
+INSERT INTO keyword (id, sentence_id, word)
+    VALUES (1, 1, 'tenant'), (2, 1, 'rent'), (3, 2, 'lease'), (4, 3, 'Pets'), (5, 3, 'rent');
+"""
+
+
+@pytest.fixture
+def original_database(tmp_path):
+    """An app on a database with the schema and rows of the original, pre-migration code."""
+    path = tmp_path / 'original.db'
+    with sqlite3.connect(path) as connection:
+        connection.executescript(ORIGINAL_SCHEMA + ORIGINAL_ROWS)
+    connection.close()
+    original = Flask(__name__)
+    original.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(original)
+    Migrate(original, db, directory=MIGRATIONS, render_as_batch=True, include_object=include_in_migrations)
+    with original.app_context():
+        yield original
+        db.session.remove()
+        db.engine.dispose()
+
+
+def schema_differences():
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'include_object': include_in_migrations})
+        return compare_metadata(context, db.metadata)
+
+
+def test_original_database_upgrades_to_the_current_schema(original_database):
+    stamp(directory=MIGRATIONS, revision='c7e1b7797d66')
+    upgrade(directory=MIGRATIONS)
+
+    assert schema_differences() == []
+    spans = db.session.execute(text('SELECT id, content FROM sentence_text ORDER BY id')).all()
+    assert spans == [(1, 'The tenant pays rent.'), (2, 'The lease ends in May.'), (3, 'Pets are not allowed.')]
+    assert db.session.execute(text("SELECT rowid FROM paragraph_fts WHERE paragraph_fts MATCH 'pets'")).all() == [(2,)]
+    assert db.session.execute(text('SELECT term, document_frequency FROM term_stats ORDER BY term')).all() == \
+        [('lease', 1), ('pets', 1), ('rent', 1), ('tenant', 1)]
+    assert db.session.execute(text("SELECT tf FROM document_term WHERE term = 'rent'")).scalar() == 2
+    assert db.session.execute(text('SELECT term_count FROM document')).scalar() == 5
+    assert db.session.execute(text('SELECT document_count, term_count FROM corpus_stats')).one() == (1, 5)
+
+
+def test_upgraded_database_downgrades_to_the_original_schema(original_database):
+    stamp(directory=MIGRATIONS, revision='c7e1b7797d66')
+    upgrade(directory=MIGRATIONS)
+    downgrade(directory=MIGRATIONS, revision='c7e1b7797d66')
+
+    tables = set(db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'alembic_version'")).scalars())
+    assert tables == {'user', 'document', 'paragraph', 'sentence', 'keyword'}
+    assert db.session.execute(text('SELECT content FROM sentence WHERE id = 3')).scalar() == 'Pets are not allowed.'
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+import ingestion
+from ocr import OCRCache, ocr_images, preprocess_image, split_tiles
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'fake-api-key')
+
+
+def striped_page(width, height, line_height=20, gap=10):
+    """White page with black 'text lines' separated by white gaps."""
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for top in range(0, height, line_height + gap):
+        draw.rectangle((0, top, width, top + line_height - 1), fill=0)
+    return image
+
+
+def test_preprocess_converts_to_grayscale_and_downscales_by_dpi():
+    image = Image.new('RGB', (1200, 600), 'white')
+    image.info['dpi'] = (600, 600)
+
+    processed = preprocess_image(image, 300)
+
+    assert processed.mode == 'L'
+    assert processed.size == (600, 300)
+
+
+def test_preprocess_never_upscales_low_dpi_or_unknown_dpi_images():
+    low = Image.new('L', (100, 50), 255)
+    low.info['dpi'] = (150, 150)
+
+    assert preprocess_image(low, 300).size == (100, 50)
+    assert preprocess_image(Image.new('L', (100, 50), 255), 300).size == (100, 50)
+
+
+def test_split_tiles_cuts_in_the_gaps_between_lines():
+    page = striped_page(50, 1000)
+
+    tiles = split_tiles(page, 300)
+
+    assert len(tiles) > 1
+    assert sum(tile.height for tile in tiles) == 1000
+    assert all(tile.height <= 300 for tile in tiles)
+    for tile in tiles[:-1]:
+        assert tile.getpixel((0, tile.height - 1)) == 255  # the cut fell on a blank row
+
+
+def test_split_tiles_leaves_small_images_whole():
+    page = Image.new('L', (50, 100), 255)
+
+    assert split_tiles(page, 300) == [page]
+
+
+def test_ocr_images_runs_in_parallel_and_keeps_order(mocker):
+    images = [Image.new('L', (10, 10), shade) for shade in range(5)]
+    mocker.patch('pytesseract.image_to_string', side_effect=lambda image: f"text {image.getpixel((0, 0))}")
+
+    assert ocr_images(images, 3) == [f"text {shade}" for shade in range(5)]
+
+
+def test_concurrent_ocr_calls_share_the_worker_limit(mocker):
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def image_to_string(image):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return 'text'
+
+    mocker.patch('pytesseract.image_to_string', side_effect=image_to_string)
+    images = [Image.new('L', (10, 10)) for _ in range(4)]
+    jobs = [threading.Thread(target=ocr_images, args=(images, 2)) for _ in range(3)]
+    for job in jobs:
+        job.start()
+    for job in jobs:
+        job.join()
+
+    assert peak == 2
+
+
+def test_extract_text_from_image_ocrs_every_frame_and_tile(tmp_path, mocker, monkeypatch):
+    path = tmp_path / 'scan.gif'
+    first, second = striped_page(40, 100), striped_page(40, 100, line_height=5)
+    first.save(path, save_all=True, append_images=[second])
+    monkeypatch.setattr(ingestion.Config, 'OCR_TILE_HEIGHT', 60)
+    monkeypatch.setattr(ingestion, 'ocr_workers', 2)
+    ocr = mocker.patch('pytesseract.image_to_string', side_effect=lambda image: f"[{image.height}]")
+
+    text = ingestion.extract_text_from_image(str(path))
+
+    # two frames of two tiles each, frames separated like paragraphs
+    assert ocr.call_count == 4
+    frames = text.split('\n\n')
+    assert len(frames) == 2
+    assert all(frame.count('[') == 2 for frame in frames)
+
+
+def test_ocr_image_reuses_cached_text_for_identical_content(tmp_path, mocker, monkeypatch):
+    first, copy, other = tmp_path / 'a.png', tmp_path / 'b.png', tmp_path / 'c.png'
+    Image.new('L', (20, 20), 255).save(first)
+    Image.new('L', (20, 20), 255).save(copy)
+    Image.new('L', (20, 20), 0).save(other)
+    monkeypatch.setattr(ingestion.Config, 'OCR_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ingestion, 'ocr_cache', OCRCache(str(tmp_path / 'cache'), (300, 2000)))
+    ocr = mocker.patch('pytesseract.image_to_string', return_value='Invoice 42')
+
+    assert ingestion.ocr_image(str(first)) == 'Invoice 42'
+    assert ingestion.ocr_image(str(copy)) == 'Invoice 42'
+    assert ocr.call_count == 1
+    ingestion.ocr_image(str(other))
+    assert ocr.call_count == 2
+
+
+def test_ocr_cache_key_depends_on_settings(tmp_path):
+    path = tmp_path / 'a.png'
+    Image.new('L', (20, 20), 255).save(path)
+
+    assert OCRCache(str(tmp_path), (300, 2000)).key(str(path)) != OCRCache(str(tmp_path), (200, 2000)).key(str(path))
+
+
+def test_ocr_cache_evicts_the_least_recently_used_results(tmp_path):
+    cache = OCRCache(str(tmp_path), (300, 2000), max_bytes=25)
+    cache.set('old', 'x' * 10)
+    cache.set('read', 'x' * 10)
+    os.utime(cache._path('read'), (1, 1))
+    os.utime(cache._path('old'), (2, 2))
+    assert cache.get('read') is not None  # a hit makes it the most recently used
+
+    cache.set('new', 'x' * 10)
+
+    assert cache.get('old') is None
+    assert cache.get('read') is not None and cache.get('new') is not None
@@ -0,0 +1,100 @@
+import pytest
+
+from app import app, db
+from models import Document, Paragraph, Sentence
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setitem(app.config, 'LIST_BATCH_ROWS', 2)  # several keyset batches per response
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def paragraph_text(filename, number):
+    return f'{filename} paragraph {number}: {filename} sentence {number}'
+
+
+def add_document(user_id, filename, sentiments):
+    """Each paragraph's only sentence is the part after the colon."""
+    texts = [paragraph_text(filename, number) for number in range(len(sentiments))]
+    document = Document(filename=filename, content='\n\n'.join(texts) or 'x' * 1000, sentiment='negative',
+                        polarity=-0.5, user_id=user_id)
+    db.session.add(document)
+    start = 0
+    for text, sentiment in zip(texts, sentiments):
+        colon = start + text.index(':')
+        paragraph = Paragraph(document=document, start_offset=start, end_offset=start + len(text), sentiment=sentiment,
+                              polarity=0.0, subjectivity=0.0)
+        db.session.add_all([paragraph, Sentence(paragraph=paragraph, start_offset=colon + 2,
+                                                end_offset=start + len(text), sentiment=sentiment, polarity=0.0,
+                                                subjectivity=0.0)])
+        start += len(text) + 2
+    db.session.commit()
+    return document
+
+
+def test_user_documents_are_scoped_projected_and_streamed(client):
+    for number in range(5):
+        add_document('1', f'doc{number}.txt', [])
+    add_document('2', 'other.txt', [])
+
+    response = client.get('/api/documents/user/1')
+
+    assert response.is_streamed
+    assert [doc['filename'] for doc in response.json] == [f'doc{number}.txt' for number in range(5)]
+    assert set(response.json[0]) == {'filename', 'documentId', 'sentiment', 'polarity'}
+
+
+def test_user_documents_keyset_pages(client):
+    for number in range(5):
+        add_document('1', f'doc{number}.txt', [])
+
+    filenames, after = [], None
+    while True:
+        response = client.get('/api/documents/user/1', query_string={'limit': 2, **({'after': after} if after else {})})
+        filenames += [doc['filename'] for doc in response.json]
+        after = response.headers.get('X-Next-Cursor')
+        if after is None:
+            break
+
+    assert filenames == [f'doc{number}.txt' for number in range(5)]
+
+
+def test_filter_only_returns_the_users_rows(client):
+    add_document('1', 'mine.txt', ['negative', 'positive', 'negative'])
+    add_document('2', 'theirs.txt', ['negative'])
+
+    response = client.get('/api/filter/sentiment/negative?userId=1')
+
+    assert response.status_code == 200
+    assert [p['content'] for p in response.json['paragraphs']] == [paragraph_text('mine.txt', 0),
+                                                                   paragraph_text('mine.txt', 2)]
+    assert [s['content'] for s in response.json['sentences']] == ['mine.txt sentence 0', 'mine.txt sentence 2']
+    assert response.json['nextCursor'] is None
+
+
+def test_filter_pages_follow_the_cursor(client):
+    add_document('1', 'mine.txt', ['negative'] * 5)
+
+    paragraphs, sentences, cursor = [], [], None
+    while True:
+        response = client.get('/api/filter/sentiment/negative',
+                              query_string={'userId': '1', 'limit': 2, **({'cursor': cursor} if cursor else {})})
+        assert len(response.json['paragraphs']) <= 2
+        paragraphs += response.json['paragraphs']
+        sentences += response.json['sentences']
+        cursor = response.json['nextCursor']
+        if cursor is None:
+            break
+
+    assert [p['content'] for p in paragraphs] == [paragraph_text('mine.txt', number) for number in range(5)]
+    assert len(sentences) == 5
+
+
+def test_filter_requires_user_and_valid_cursor(client):
+    assert client.get('/api/filter/sentiment/negative').status_code == 400
+    assert client.get('/api/filter/sentiment/negative?userId=1&cursor=nope').status_code == 400
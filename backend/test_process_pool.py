@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pytest
+
+from app import app, db, store_job_result
+from ingestion import Sentiment, analyze_file, init_worker
+from jobs import enqueue_job, claim_next_job, JOB_DONE, JOB_FAILED
+from models import Document, IngestionJob
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def completed(result=None, error=None):
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_analyze_file_runs_in_worker_process():
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as tmp:
+        tmp.write('Good news.\n\nBad news.')
+    context = multiprocessing.get_context(app.config['INGEST_MP_CONTEXT'])
+    with ProcessPoolExecutor(max_workers=2, mp_context=context, initializer=init_worker) as pool:
+        paragraphs, report = pool.submit(analyze_file, tmp.name, 'news.txt').result()
+    os.remove(tmp.name)
+
+    assert report['failures'] == []
+    assert [p[0] for p in paragraphs] == ['Good news.', 'Bad news.']
+    assert paragraphs[0][1].label == 'positive'
+    assert paragraphs[1][1].label == 'negative'
+
+
+def test_store_job_result_writes_in_parent(client):
+    enqueue_job('/tmp/a.txt', 'pooled.txt', '1')
+    db.session.commit()
+    job = claim_next_job(60, 3)
+    positive = Sentiment('positive', 0.4, 0.5)
+    analysis = ([('Fine text.', positive, [('Fine text.', positive, ['text'])])], {'pages': 1})
+
+    store_job_result(job, completed(analysis))
+
+    job = db.session.get(IngestionJob, job.id)
+    assert job.status == JOB_DONE
+    extraction = job.to_dict()['extraction']
+    assert extraction['pages'] == 1
+    assert extraction['stageSeconds']['db'] >= 0  # database time is added in the parent
+    document = db.session.get(Document, job.document_id)
+    assert (document.filename, document.sentiment, document.polarity) == ('pooled.txt', 'positive', 0.4)
+
+
+def test_store_job_result_marks_worker_errors(client):
+    enqueue_job('/tmp/a.txt', 'broken.txt', '1')
+    db.session.commit()
+    job = claim_next_job(60, 3)
+
+    store_job_result(job, completed(error=RuntimeError('worker died')))
+
+    job = db.session.get(IngestionJob, job.id)
+    assert (job.status, job.error) == (JOB_FAILED, 'worker died')
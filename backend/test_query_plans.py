@@ -0,0 +1,144 @@
+import io
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db, store_document, stored_paragraphs
+from ingestion import Sentiment
+from jobs import claim_next_job, enqueue_job, finish_job, mean_job_seconds, queued_job_counts
+from models import Document, Paragraph, Sentence
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+# A table read front to back. Scans of subquery results are fine, and so are FTS5 MATCH lookups
+# ("SCAN sentence_fts VIRTUAL TABLE INDEX 0:M1"); aliased tables (fulltext.py) show up by alias.
+FULL_SCAN = re.compile(r'^SCAN (?!anon_\d|\(subquery-\d+\)|\w+_fts VIRTUAL TABLE INDEX \d+:M)')
+
+
+def paragraph(text, keywords):
+    return text, NEUTRAL, [(text, NEUTRAL, keywords)]
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def selects(client):
+    """Every SELECT the test runs, with its parameters, and the UPDATEs, whose WHERE also needs an index."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE')) and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def full_scans(statements):
+    scans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+                if FULL_SCAN.match(row[-1]):
+                    scans.append((row[-1], statement))
+    return scans
+
+
+@pytest.fixture
+def document(client):
+    document = Document(filename='plan.txt', content='Plan text.', sentiment='negative', user_id='1')
+    paragraph = Paragraph(document=document, start_offset=0, end_offset=10, sentiment='negative', polarity=-0.1,
+                          subjectivity=0.0)
+    db.session.add_all([document, paragraph, Sentence(paragraph=paragraph, start_offset=0, end_offset=10,
+                                                      sentiment='negative', polarity=-0.1, subjectivity=0.0)])
+    db.session.commit()
+    return document
+
+
+@pytest.fixture
+def indexed_document(client):
+    """A document stored the way ingestion stores it, so it is in every search index."""
+    return store_document('lease.txt', '1', [paragraph('The tenant pays the rent.', ['tenant', 'rent'])])
+
+
+@pytest.mark.parametrize('method, url, payload', [
+    ('get', '/api/documents/user/1', None),
+    ('get', '/api/documents/user/1?limit=10&after=1', None),
+    ('get', '/api/filter/sentiment/negative?userId=1', None),
+    ('get', '/api/filter/sentiment/any?userId=1&limit=5&min_polarity=-0.5', None),
+    ('post', '/document/keywords', {'filename': 'plan.txt'}),
+])
+def test_endpoint_queries_use_indexes(client, document, selects, method, url, payload):
+    response = getattr(client, method)(url, json=payload)
+    assert response.status_code == 200
+    response.get_data()  # run streamed responses to the end
+
+    assert selects
+    assert full_scans(selects) == []
+
+
+@pytest.mark.parametrize('method, url, payload', [
+    ('post', '/api/search/keyword', {'terms': ['rent', 'tenant']}),
+    ('post', '/api/search/keyword', {'terms': ['rent', 'tenant'], 'mode': 'and', 'hitsPerDocument': 1}),
+    ('get', '/api/search/fulltext?q=rent&userId=1', None),
+    ('get', '/api/search/fulltext?q=rent&userId=1&scope=paragraph', None),
+    ('get', '/api/search/semantic?q=who+pays+rent&userId=1', None),
+])
+def test_search_queries_use_indexes(client, indexed_document, selects, method, url, payload):
+    response = getattr(client, method)(url, json=payload)
+    assert response.status_code == 200
+    assert response.json['results']
+
+    assert full_scans(selects) == []
+
+
+def test_related_documents_use_indexes(client, indexed_document, selects):
+    store_document('sublease.txt', '1', [paragraph('A subtenant pays the rent.', ['subtenant', 'rent'])])
+    selects.clear()
+
+    response = client.get(f'/api/documents/{indexed_document.id}/related', query_string={'userId': '1'})
+
+    assert response.status_code == 200
+    assert response.json['related']
+    assert full_scans(selects) == []
+
+
+def test_job_status_and_claims_use_indexes(client, selects):
+    first = enqueue_job('/tmp/a.txt', 'a.txt', '1')
+    enqueue_job('/tmp/b.txt', 'b.txt', '2')
+    db.session.commit()
+    selects.clear()
+
+    assert client.get(f'/api/jobs/{first.id}').status_code == 200
+    claimed = claim_next_job(60, 3, user_limit=1)
+    finish_job(claimed, None)
+    queued_job_counts('1')
+    mean_job_seconds()
+
+    assert full_scans(selects) == []
+
+
+def test_summary_reads_paragraphs_by_index(client, document, selects, mocker):
+    mocker.patch('app.get_document_summary', return_value='Summary')
+
+    assert client.post('/document/summary', json={'filename': 'plan.txt'}).status_code == 200
+    assert full_scans(selects) == []
+
+
+def test_upload_duplicate_lookup_uses_indexes(client, selects, mocker):
+    mocker.patch('app.file_processing_queue.put')
+    data = {'file': (io.BytesIO(b'Plan text.'), 'plan.txt'), 'userId': '1'}
+
+    assert client.post('/upload', data=data, content_type='multipart/form-data').status_code == 202
+    assert full_scans(selects) == []
+
+
+def test_copying_an_analysis_uses_indexes(client, document, selects):
+    stored_paragraphs(document.id)
+
+    assert full_scans(selects) == []
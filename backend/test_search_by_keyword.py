@@ -0,0 +1,114 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import delete
+
+from app import db, store_document
+from ingestion import Sentiment
+from keyword_index import rebuild_keyword_index
+from models import CorpusStats, Document, DocumentTerm, KeywordPosting, TermStats
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def add_document(filename, sentence_keywords):
+    sentences = [(f'{filename} sentence {i}.', NEUTRAL, keywords) for i, keywords in enumerate(sentence_keywords)]
+    return store_document(filename, '1', [(' '.join(text for text, _, _ in sentences), NEUTRAL, sentences)])
+
+
+@pytest.fixture
+def corpus(client):
+    return {
+        'heavy': add_document('heavy.txt', [['Revenue', 'revenue'], ['revenue', 'cost']]).id,
+        'light': add_document('light.txt', [['revenue', 'profit', 'margin', 'growth']]).id,
+        'other': add_document('other.txt', [['cost'], ['profit']]).id,
+    }
+
+
+def search(client, **body):
+    response = client.post('/api/search/keyword', json=body)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_index_is_built_at_ingestion(corpus):
+    assert db.session.get(TermStats, 'revenue').document_frequency == 2
+    assert db.session.get(DocumentTerm, ('revenue', corpus['heavy'])).tf == 3
+    assert KeywordPosting.query.filter_by(term='revenue', document_id=corpus['heavy']).count() == 2
+
+
+def test_corpus_stats_follow_document_writes(corpus):
+    def totals():
+        stats = db.session.get(CorpusStats, 1, populate_existing=True)
+        return stats.document_count, stats.term_count
+
+    assert totals() == (3, 10)
+    db.session.get(Document, corpus['light']).term_count = 2
+    db.session.commit()
+    assert totals() == (3, 8)
+    db.session.execute(delete(Document).where(Document.id == corpus['other']))
+    db.session.commit()
+    assert totals() == (2, 6)
+
+
+def test_results_are_bm25_ranked(client, corpus):
+    result = search(client, keyword='Revenue')
+
+    assert [r['documentId'] for r in result['results']] == [corpus['heavy'], corpus['light']]
+    assert result['results'][0]['score'] > result['results'][1]['score'] > 0
+    assert {s['content'] for s in result['sentences']} == {'heavy.txt sentence 0.', 'heavy.txt sentence 1.',
+                                                           'light.txt sentence 0.'}
+    assert result['nextCursor'] is None
+
+
+def test_and_or_modes(client, corpus):
+    either = search(client, terms=['cost', 'profit'], mode='or')
+    both = search(client, terms=['cost', 'profit'], mode='and')
+
+    assert {r['documentId'] for r in either['results']} == set(corpus.values())
+    assert [r['documentId'] for r in both['results']] == [corpus['other']]
+
+
+def test_cursor_pagination_walks_all_results(client, corpus):
+    first = search(client, terms=['revenue', 'cost', 'profit'], limit=2)
+    second = search(client, terms=['revenue', 'cost', 'profit'], limit=2, cursor=first['nextCursor'])
+
+    ids = [r['documentId'] for r in first['results'] + second['results']]
+    assert sorted(ids) == sorted(corpus.values())
+    assert second['nextCursor'] is None
+
+
+def test_bad_requests(client, corpus):
+    assert client.post('/api/search/keyword', json={}).status_code == 400
+    assert client.post('/api/search/keyword', json={'keyword': 'cost', 'mode': 'xor'}).status_code == 400
+    assert client.post('/api/search/keyword', json={'keyword': 'cost', 'cursor': '!!'}).status_code == 400
+    assert client.post('/api/search/keyword', json={'terms': 'cost'}).status_code == 400  # not letter by letter
+    assert client.post('/api/search/keyword', json={'terms': ['cost', 7]}).status_code == 400
+    assert client.post('/api/search/keyword', json={'keyword': 'cost', 'hitsPerDocument': 'all'}).status_code == 400
+
+
+def test_hits_are_capped_per_document(client, corpus):
+    many = add_document('many.txt', [['revenue']] * 5).id
+
+    result = search(client, keyword='revenue', hitsPerDocument=2)
+
+    assert {r['documentId']: r['hits'] for r in result['results']} == {many: 5, corpus['heavy']: 2, corpus['light']: 1}
+    per_document = Counter(sentence['documentId'] for sentence in result['sentences'])
+    assert per_document == {many: 2, corpus['heavy']: 2, corpus['light']: 1}
+    assert [s['content'] for s in result['sentences'] if s['documentId'] == many] == ['many.txt sentence 0.',
+                                                                                      'many.txt sentence 1.']
+    assert {paragraph['documentId'] for paragraph in result['paragraphs']} == {many, corpus['heavy'], corpus['light']}
+
+
+def test_rebuild_matches_incremental_index(client, corpus):
+    before = sorted((t.term, t.document_frequency) for t in TermStats.query)
+    rebuild_keyword_index(chunk_size=2)
+    db.session.commit()
+
+    assert sorted((t.term, t.document_frequency) for t in TermStats.query) == before
+    assert db.session.get(DocumentTerm, ('revenue', corpus['heavy'])).tf == 3
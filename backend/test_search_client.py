@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import app as app_module
+from app import app
+from search_client import SearchClient, SearchError
+
+
+class StubSearch(BaseHTTPRequestHandler):
+    """Answers like the Custom Search API after ``delay``, failing with the next queued status first."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.queries.append(parse_qs(urlparse(self.path).query)['q'][0])
+            server.connections.add(self.client_address)
+            status = server.failures.pop(0) if server.failures else 200
+        time.sleep(server.delay)
+        body = server.body or json.dumps({'items': [{'link': f'https://example.com/{len(server.queries)}'}]}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSearch)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.queries, server.connections, server.failures, server.delay = [], set(), [], 0
+    server.body = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(upstream):
+    def make(**options):
+        settings = dict(connect_timeout=1, read_timeout=1, deadline=5, max_retries=2, backoff=0.01, cache_ttl=60,
+                        cache_max_entries=10, pool_size=4)
+        settings.update(options)
+        return SearchClient(f'http://127.0.0.1:{upstream.server_port}/customsearch/v1', {'key': 'k', 'cx': 'c'},
+                            **settings)
+    return make
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def test_calls_reuse_one_connection(upstream, make_client):
+    client = make_client(cache_ttl=0)
+
+    for query in ('flask', 'sqlite', 'spacy'):
+        client.search(query)
+
+    assert upstream.queries == ['flask', 'sqlite', 'spacy']
+    assert len(upstream.connections) == 1
+
+
+def test_results_are_cached_by_normalized_query(upstream, make_client):
+    now = [0.0]
+    client = make_client(cache_ttl=30, clock=lambda: now[0])
+
+    first = client.search('Python  Flask')
+    assert client.search(' python flask') == first
+    now[0] = 31
+    client.search('python flask')
+
+    assert upstream.queries == ['python flask', 'python flask']
+
+
+def test_concurrent_identical_queries_share_one_call(upstream, make_client):
+    upstream.delay = 0.2
+    client = make_client()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.search('coalesce me'))) for _ in range(5)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.queries == ['coalesce me']
+    assert len(results) == 5 and all(result == results[0] for result in results)
+
+
+def test_server_errors_are_retried_with_jittered_backoff(upstream, make_client):
+    upstream.failures = [503, 500]
+    pauses = []
+    client = make_client(backoff=0.5, sleep=pauses.append)
+
+    assert client.search('retry')['items']
+    assert len(upstream.queries) == 3
+    assert 0 <= pauses[0] <= 0.5 and 0 <= pauses[1] <= 1.0
+
+
+def test_client_errors_are_not_retried_or_cached(upstream, make_client):
+    upstream.failures = [403]
+    client = make_client()
+
+    with pytest.raises(SearchError) as error:
+        client.search('forbidden')
+    client.search('forbidden')
+
+    assert error.value.status == 403
+    assert len(upstream.queries) == 2
+
+
+def test_slow_upstream_times_out_within_the_deadline(upstream, make_client):
+    upstream.delay = 1
+    client = make_client(read_timeout=0.2, deadline=0.5, max_retries=5, backoff=0.05)
+
+    started = time.monotonic()
+    with pytest.raises(SearchError) as error:
+        client.search('slow')
+
+    assert error.value.status == 504
+    assert time.monotonic() - started < 1
+
+
+def test_search_endpoint_uses_the_client(upstream, make_client, monkeypatch):
+    monkeypatch.setattr(app_module, 'search_client', make_client())
+    upstream.failures = [404]
+
+    with app.test_client() as client:
+        assert client.post('/search', json={'keyword': 'missing'}).status_code == 404
+        response = client.post('/search', json={'keyword': 'Flask docs'})
+
+    assert response.status_code == 200
+    assert response.json == {'keyword': 'Flask docs', 'links': ['https://example.com/2']}
+
+
+def test_a_body_that_is_not_json_is_a_bad_gateway(upstream, make_client, monkeypatch):
+    monkeypatch.setattr(app_module, 'search_client', make_client())
+    upstream.body = b'<html>Service Unavailable</html>'
+
+    with app.test_client() as client:
+        response = client.post('/search', json={'keyword': 'captive portal'})
+
+    assert response.status_code == 502
+    assert response.json == {'error': 'Failed to fetch search results'}
+    assert len(upstream.queries) == 1
+
+
+def test_other_request_errors_are_a_bad_gateway():
+    client = SearchClient('ftp://127.0.0.1/customsearch/v1', {}, connect_timeout=1, read_timeout=1, deadline=5,
+                          max_retries=2, backoff=0.01, cache_ttl=60, cache_max_entries=10, pool_size=4)
+
+    with pytest.raises(SearchError) as error:
+        client.search('no adapter')
+
+    assert error.value.status == 502
+    assert client.upstream_calls == 1
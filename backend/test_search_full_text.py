@@ -0,0 +1,75 @@
+import pytest
+
+from app import db, store_document
+from fulltext import rebuild_fulltext_index
+from ingestion import Sentiment
+from models import Paragraph, Sentence
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def documents(client):
+    contract = store_document('contract.txt', 'alice', [
+        ('The tenant shall pay rent monthly. Late fees apply.', NEUTRAL, [
+            ('The tenant shall pay rent monthly.', NEUTRAL, []),
+            ('Late fees apply.', NEUTRAL, []),
+        ]),
+        ('Termination requires notice.', NEUTRAL, [('Termination requires notice.', NEUTRAL, [])]),
+    ])
+    store_document('other.txt', 'bob', [
+        ('Bob will pay rent monthly too.', NEUTRAL, [('Bob will pay rent monthly too.', NEUTRAL, [])]),
+    ])
+    return contract
+
+
+def search(client, **params):
+    return client.get('/api/search/fulltext', query_string=params)
+
+
+def test_phrase_query_is_scoped_to_user(client, documents):
+    response = search(client, q='"pay rent monthly"', userId='alice')
+
+    assert response.status_code == 200
+    [match] = response.json['results']
+    assert match['documentId'] == documents.id
+    assert match['highlight'] == 'The tenant shall <mark>pay rent monthly</mark>.'
+
+
+def test_prefix_query_and_paragraph_scope(client, documents):
+    response = search(client, q='termin*', userId='alice', scope='paragraph')
+
+    assert [r['snippet'] for r in response.json['results']] == ['<mark>Termination</mark> requires notice.']
+
+
+def test_non_noun_words_are_searchable(client, documents):
+    assert len(search(client, q='shall', userId='alice').json['results']) == 1
+
+
+def test_index_follows_deletes(client, documents):
+    paragraph = Paragraph.query.filter_by(document_id=documents.id, content='Termination requires notice.').one()
+    Sentence.query.filter_by(paragraph_id=paragraph.id).delete()
+    db.session.delete(paragraph)
+    db.session.commit()
+
+    assert search(client, q='termination', userId='alice', scope='paragraph').json['results'] == []
+    assert search(client, q='termination', userId='alice').json['results'] == []
+
+
+def test_rebuild_keeps_results(client, documents):
+    rebuild_fulltext_index()
+    db.session.commit()
+
+    assert len(search(client, q='rent', userId='alice').json['results']) == 1
+
+
+def test_bad_requests(client, documents):
+    assert search(client, q='rent').status_code == 400
+    assert search(client, userId='alice').status_code == 400
+    assert search(client, q='"unterminated', userId='alice').status_code == 400
+    assert search(client, q='rent', userId='alice', scope='document').status_code == 400
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pytest
+
+import app as app_module
+from app import app, db, store_document, update_document
+from ingestion import Sentiment
+from semantic import SemanticIndex, VectorStore, embed
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+
+
+def paragraph(*sentences):
+    return ' '.join(sentences), NEUTRAL, [(sentence, NEUTRAL, []) for sentence in sentences]
+
+
+LEASE = [paragraph('The tenant pays the monthly rent to the landlord.', 'The lease ends after twelve months.')]
+SUBLEASE = [paragraph('A subtenant pays rent to the tenant.', 'The landlord must approve the lease transfer.')]
+RECIPE = [paragraph('Whisk the eggs with sugar and butter.', 'Bake the cake for forty minutes.')]
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    index = SemanticIndex(str(tmp_path / 'semantic'), 64)
+    monkeypatch.setattr(app_module, 'semantic_index', index)
+    return index
+
+
+def test_embeddings_are_unit_length_and_closer_for_shared_terms():
+    vectors = embed(['The tenants pay rent.', 'A tenant paid the rent.', 'Bake the cake.', 'the and of'], 64)
+
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > 0.5 > vectors[0] @ vectors[2]
+    assert np.array_equal(vectors, embed(['The tenants pay rent.', 'A tenant paid the rent.', 'Bake the cake.',
+                                          'the and of'], 64))
+
+
+def test_vector_store_searches_appends_and_removals(tmp_path):
+    store = VectorStore(str(tmp_path), 'rows', 4)
+    store.append([1, 2, 3], [10, 10, 20], np.eye(4, dtype=np.float32)[:3])
+    query = np.array([0.6, 0.8, 0, 0], dtype=np.float32)
+
+    assert [row_id for row_id, _, _ in store.search(query, 2)] == [2, 1]
+    assert [row_id for row_id, _, _ in store.search(query, 5, groups=[20])] == [3]
+
+    store.remove([2])
+    store.append([4], [20], np.array([[0, 1, 0, 0]], dtype=np.float32))
+
+    assert [(row_id, group) for row_id, group, _ in store.search(query, 2)] == [(4, 20), (1, 10)]
+    assert len(store.vectors(group=10)) == 1
+
+
+def test_vector_store_drops_a_half_written_row(tmp_path):
+    store = VectorStore(str(tmp_path), 'rows', 4)
+    store.append([1], [10], np.ones((1, 4), dtype=np.float32))
+    with open(store.prefix + '.vec', 'ab') as file:
+        file.write(b'\0' * 6)  # a writer died mid-row
+
+    assert len(store.arrays()[1]) == 1
+    store.append([2], [10], np.ones((1, 4), dtype=np.float32))
+    assert os.path.getsize(store.prefix + '.vec') == 2 * 16
+    assert list(store.arrays()[1]) == [1, 2]
+
+
+def test_sentences_are_indexed_when_the_document_commits(client, index):
+    document = store_document('lease.txt', '1', LEASE)
+
+    assert sorted(index.sentences.arrays()[2]) == [document.id, document.id]
+    assert len(index.documents.vectors(row_id=document.id)) == 1
+
+
+def test_rolled_back_sentences_are_not_indexed(client, index):
+    app_module.write_paragraph_chunk(1, LEASE)
+    db.session.rollback()
+
+    assert len(index.sentences.arrays()[1]) == 0
+
+
+def test_index_failures_are_logged_and_the_document_kept(client, index, mocker, caplog):
+    mocker.patch.object(index, 'apply', side_effect=OSError('No space left on device'))
+
+    document = store_document('lease.txt', '1', LEASE)
+
+    assert db.session.get(app_module.Document, document.id) is not None
+    assert 'Failed to update the semantic index' in caplog.text
+    assert 'No space left on device' in caplog.text
+
+
+def test_semantic_search_finds_the_users_sentences(client):
+    store_document('lease.txt', '1', LEASE)
+    store_document('recipe.txt', '1', RECIPE)
+    store_document('other.txt', '2', SUBLEASE)
+
+    response = client.get('/api/search/semantic', query_string={'q': 'who pays the rent', 'userId': '1'})
+
+    assert response.status_code == 200
+    top = response.json['results'][0]
+    assert (top['filename'], top['content']) == ('lease.txt', 'The tenant pays the monthly rent to the landlord.')
+    assert {result['filename'] for result in response.json['results']} <= {'lease.txt', 'recipe.txt'}
+    assert client.get('/api/search/semantic', query_string={'q': 'rent'}).status_code == 400
+
+
+def test_related_documents_rank_by_similarity(client):
+    lease = store_document('lease.txt', '1', LEASE)
+    store_document('recipe.txt', '1', RECIPE)
+    store_document('sublease.txt', '1', SUBLEASE)
+    store_document('other.txt', '2', SUBLEASE)
+
+    response = client.get(f'/api/documents/{lease.id}/related', query_string={'userId': '1'})
+
+    assert response.status_code == 200
+    assert [related['filename'] for related in response.json['related']] == ['sublease.txt', 'recipe.txt']
+    assert client.get(f'/api/documents/{lease.id}/related', query_string={'userId': '2'}).status_code == 404
+
+
+def test_updates_replace_the_changed_sentences(client, index):
+    document = store_document('lease.txt', '1', LEASE)
+
+    update_document(document, [RECIPE[0]])
+
+    results = client.get('/api/search/semantic', query_string={'q': 'monthly rent', 'userId': '1'}).json['results']
+    assert all('rent' not in result['content'] for result in results)
+    assert len(index.sentences.search(embed(['eggs'], 64)[0], 10)) == 2
+
+
+def test_rebuild_recreates_the_index(client, index):
+    lease = store_document('lease.txt', '1', LEASE)
+    recipe = store_document('recipe.txt', '1', RECIPE)
+    before = index.sentences.arrays()[0].copy()
+
+    app.test_cli_runner().invoke(args=['rebuild-semantic-index'])
+
+    assert np.array_equal(index.sentences.arrays()[0], before)
+    assert sorted(index.documents.arrays()[1]) == [lease.id, recipe.id]
@@ -0,0 +1,60 @@
+import pytest
+import textblob
+
+from app import db
+from ingestion import Sentiment, aggregate_sentiment, analyze_text
+from models import Document, Paragraph, Sentence
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def test_aggregate_is_length_weighted():
+    result = aggregate_sentiment([(Sentiment('positive', 0.8, 1.0), 30), (Sentiment('negative', -0.4, 0.0), 10)])
+
+    assert result.label == 'positive'
+    assert result.polarity == pytest.approx(0.5)
+    assert result.subjectivity == pytest.approx(0.75)
+
+
+def test_aggregate_of_nothing_is_neutral():
+    assert aggregate_sentiment([]) == Sentiment('neutral', 0.0, 0.0)
+
+
+def test_textblob_runs_once_per_sentence(mocker):
+    sentences = [('Great work.', []), ('Terrible food.', [])]
+    mocker.patch('ingestion.analyze_paragraphs', return_value=iter([('Great work. Terrible food.', sentences)]))
+    spy = mocker.spy(textblob, 'TextBlob')
+
+    [(_, paragraph_sentiment, scored)] = list(analyze_text('Great work. Terrible food.'))
+
+    assert [call.args[0] for call in spy.call_args_list] == ['Great work.', 'Terrible food.']
+    assert [sentiment.label for _, sentiment, _ in scored] == ['positive', 'negative']
+    assert paragraph_sentiment.polarity == pytest.approx(aggregate_sentiment(
+        [(scored[0][1], len('Great work.')), (scored[1][1], len('Terrible food.'))]).polarity)
+
+
+def test_filter_by_polarity_threshold(client):
+    document = Document(filename='scores.txt', content='strong mild', sentiment='positive', user_id='1')
+    paragraph = Paragraph(document=document, start_offset=0, end_offset=11, sentiment='positive', polarity=0.6,
+                          subjectivity=0.5)
+    db.session.add_all([
+        document, paragraph,
+        Sentence(paragraph=paragraph, start_offset=0, end_offset=6, sentiment='positive', polarity=0.9,
+                 subjectivity=0.5),
+        Sentence(paragraph=paragraph, start_offset=7, end_offset=11, sentiment='positive', polarity=0.2,
+                 subjectivity=0.5),
+    ])
+    db.session.commit()
+
+    response = client.get('/api/filter/sentiment/positive?userId=1&min_polarity=0.5')
+
+    assert response.status_code == 200
+    assert [s['content'] for s in response.json['sentences']] == ['strong']
+    assert [p['polarity'] for p in response.json['paragraphs']] == [0.6]
+
+
+def test_filter_rejects_non_numeric_threshold(client):
+    assert client.get('/api/filter/sentiment/positive?userId=1&min_polarity=high').status_code == 400
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import text
+
+from app import db, store_document, stored_paragraphs
+from config import Config
+from ingestion import Sentiment
+from models import Document, Paragraph, Sentence
+from spans import DocumentTexts, sentence_spans
+
+NEUTRAL = Sentiment('neutral', 0.0, 0.0)
+PARAGRAPHS = [
+    ('The tenant shall pay rent monthly. Late fees apply.', NEUTRAL, [
+        ('The tenant shall pay rent monthly.', NEUTRAL, ['tenant', 'rent']),
+        ('Late fees apply.', NEUTRAL, ['fee']),
+    ]),
+    ('Termination requires notice. ' * 60, NEUTRAL, [('Termination requires notice.', NEUTRAL, ['notice'])]),
+]
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'compressed'])
+def compress(request, monkeypatch):
+    monkeypatch.setattr(Config, 'COMPRESS_DOCUMENTS', request.param)
+    return request.param
+
+
+def test_sentence_spans_are_found_in_order():
+    paragraph = 'Yes. No. Yes.'
+
+    assert sentence_spans(paragraph, 100, ['Yes.', 'No.', 'Yes.']) == [(100, 104), (105, 108), (109, 113)]
+    with pytest.raises(ValueError):
+        sentence_spans(paragraph, 0, ['No.', 'No.'])
+
+
+def test_spans_read_back_the_stored_text(client, compress):
+    document = store_document('lease.txt', '1', PARAGRAPHS)
+    stored_type = db.session.execute(text('SELECT typeof(content) FROM document WHERE id = :id'),
+                                     {'id': document.id}).scalar()
+
+    assert stored_type == ('blob' if compress else 'text')
+    assert [p.content for p in Paragraph.query.order_by(Paragraph.id)] == \
+        [paragraph for paragraph, _, _ in PARAGRAPHS]
+    assert Sentence.query.order_by(Sentence.id).first().content == 'The tenant shall pay rent monthly.'
+    assert [(paragraph, sentences) for paragraph, _, sentences in stored_paragraphs(document.id)] == \
+        [(paragraph, sentences) for paragraph, _, sentences in PARAGRAPHS]
+    assert DocumentTexts().slice(document.id, 0, 10) == 'The tenant'
+
+
+def test_read_paths_slice_compressed_content(client, compress):
+    store_document('lease.txt', '1', PARAGRAPHS)
+
+    fulltext = client.get('/api/search/fulltext', query_string={'q': 'rent', 'userId': '1'}).json['results']
+    keyword = client.post('/api/search/keyword', json={'keyword': 'notice'}).json
+    filtered = client.get('/api/filter/sentiment/neutral?userId=1').json
+
+    assert [r['highlight'] for r in fulltext] == ['The tenant shall pay <mark>rent</mark> monthly.']
+    assert [s['content'] for s in keyword['sentences']] == ['Termination requires notice.']
+    assert [s['content'] for s in filtered['sentences']] == [sentence for _, _, sentences in PARAGRAPHS
+                                                              for sentence, _, _ in sentences]
+
+
+def test_compression_shrinks_stored_text(client, monkeypatch):
+    monkeypatch.setattr(Config, 'COMPRESS_DOCUMENTS', True)
+    document = store_document('lease.txt', '1', PARAGRAPHS)
+
+    stored = db.session.execute(text('SELECT length(content) FROM document WHERE id = :id'),
+                                {'id': document.id}).scalar()
+
+    assert stored < len(db.session.get(Document, document.id).content) / 4
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Generous enough for a slow CI machine, far below what loading spaCy or openai at import costs
+IMPORT_BUDGET_SECONDS = 2.5
+
+PROBE = """
+import json, sys, threading, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'threads': threading.active_count(),
+                  'loaded': sorted(m for m in ('spacy', 'openai', 'textblob', 'pytesseract', 'docx')
+                                   if m in sys.modules)}))
+"""
+
+
+@pytest.fixture(scope='module')
+def cold_import():
+    """Import app in a fresh interpreter, as a server or test process would."""
+    env = {key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'}
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_loads_no_heavy_dependencies(cold_import):
+    assert cold_import['loaded'] == []
+
+
+def test_import_starts_no_threads(cold_import):
+    assert cold_import['threads'] == 1
+
+
+def test_cold_import_is_fast(cold_import):
+    assert cold_import['seconds'] < IMPORT_BUDGET_SECONDS, f"import app took {cold_import['seconds']:.2f}s"
+
+
+def test_create_app_starts_workers_once(mocker):
+    import app as app_module
+    mocker.patch.object(app_module, '_workers_started', False)
+    thread = mocker.patch('app.threading.Thread')
+
+    assert app_module.create_app() is app_module.app
+    app_module.create_app()
+
+    expected = 1 if app_module.app.config['INGEST_WORKER_MODE'] == 'process' else app_module.num_workers
+    assert thread.call_count == expected
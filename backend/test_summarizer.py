@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from app import app, db
+from models import ChunkSummary, Document, Paragraph
+from summarizer import MapReduceSummarizer, chunk_hash, chunk_paragraphs, estimate_tokens
+
+
+class StubModel:
+    """Local stand-in for the OpenAI client that records prompts and peak concurrency."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, messages):
+        prompt = messages[-1]['content']
+        with self.lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return f'summary#{len(prompt)}'
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def test_chunks_follow_paragraph_boundaries():
+    paragraphs = ['a' * 40, 'b' * 40, 'c' * 40]
+    chunks = chunk_paragraphs(paragraphs, token_budget=25)
+
+    assert chunks == ['a' * 40 + '\n\n' + 'b' * 40, 'c' * 40]
+    assert all(estimate_tokens(chunk) <= 25 for chunk in chunks)
+
+
+def test_oversized_paragraph_is_split_on_words():
+    chunks = chunk_paragraphs([' '.join(['word'] * 100)], token_budget=20)
+
+    assert len(chunks) > 1
+    assert ' '.join(chunks).split() == ['word'] * 100
+
+
+def test_map_runs_concurrently_with_a_bound():
+    stub = StubModel(delay=0.05)
+    summarizer = MapReduceSummarizer(stub, token_budget=100, max_concurrency=3)
+
+    summaries, created = summarizer.map([f'chunk {i}' for i in range(8)])
+
+    assert len(summaries) == len(created) == 8
+    assert 1 < stub.peak <= 3
+
+
+def test_map_reuses_known_summaries():
+    stub = StubModel()
+    summarizer = MapReduceSummarizer(stub, token_budget=100, max_concurrency=2)
+
+    summaries, created = summarizer.map(['old', 'new'], known={chunk_hash('old'): 'cached'})
+
+    assert summaries[0] == 'cached'
+    assert list(created) == [chunk_hash('new')]
+    assert len(stub.prompts) == 1
+
+
+def test_reduce_takes_several_rounds_when_needed():
+    stub = StubModel()
+    summarizer = MapReduceSummarizer(stub, token_budget=30, max_concurrency=2)
+
+    summarizer.reduce(['x' * 50] * 6)
+
+    assert len(stub.prompts) > 1
+    assert stub.prompts[-1].startswith('Combine these partial summaries')
+
+
+def test_reduce_messages_leave_the_final_call_to_the_caller():
+    stub = StubModel()
+    summarizer = MapReduceSummarizer(stub, token_budget=30, max_concurrency=2)
+
+    messages = summarizer.reduce_messages(['x' * 50] * 6)
+
+    assert messages[-1]['content'].startswith('Combine these partial summaries')
+    assert messages[-1]['content'] not in stub.prompts  # only the intermediate rounds ran
+
+
+def long_document():
+    """A document of four paragraphs that summarize as four chunks with SUMMARY_CHUNK_TOKENS at 30."""
+    document = Document(filename='long.txt', content='\n\n'.join(f'{i}' * 80 for i in range(4)),
+                        sentiment='neutral', user_id='1')
+    db.session.add_all([document] + [Paragraph(document=document, start_offset=i * 82, end_offset=i * 82 + 80,
+                                               sentiment='neutral') for i in range(4)])
+    db.session.commit()
+    return document
+
+
+def test_document_summary_reuses_stored_chunks(client, mocker):
+    stub = StubModel()
+    mocker.patch('app.chat_completion', side_effect=stub)
+    mocker.patch.dict(app.config, {'SUMMARY_CHUNK_TOKENS': 30})
+    document = long_document()
+
+    first = client.post('/document/summary', json={'filename': 'long.txt'})
+    map_calls = len(stub.prompts) - 1
+    second = client.post('/document/summary', json={'filename': 'long.txt'})
+
+    assert first.json['summary'] == second.json['summary']
+    assert map_calls == ChunkSummary.query.filter_by(document_id=document.id).count() == 4
+    assert len(stub.prompts) == map_calls + 2  # second request only re-ran the reduce step
+
+
+def test_concurrent_summaries_of_a_document_store_each_chunk_once(client, mocker):
+    stub = StubModel()
+    rival_started = threading.Lock()
+    rival = []
+
+    def complete(messages):
+        if rival_started.acquire(blocking=False):  # another request summarizes the document meanwhile
+            rival.append(client.post('/document/summary', json={'filename': 'long.txt'}))
+        return stub(messages)
+
+    mocker.patch('app.chat_completion', side_effect=complete)
+    mocker.patch.dict(app.config, {'SUMMARY_CHUNK_TOKENS': 30})
+    document = long_document()
+
+    response = client.post('/document/summary', json={'filename': 'long.txt'})
+
+    assert response.status_code == rival[0].status_code == 200
+    assert response.json['summary'] == rival[0].json['summary']
+    assert ChunkSummary.query.filter_by(document_id=document.id).count() == 4
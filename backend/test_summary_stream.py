@@ -0,0 +1,142 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import app, db, llm_cache, summary_streams
+from models import Document
+
+PIECES = ['The tenant ', 'pays rent ', 'monthly.']
+
+
+class StreamingModel:
+    """Stand-in for the OpenAI client: streams ``PIECES``, holding after the first until released."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = threading.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, model, stream=False):
+        assert stream
+        self.calls += 1
+        return self._chunks()
+
+    def _chunks(self):
+        for number, piece in enumerate(PIECES):
+            if number == 1:
+                self.release.wait(5)
+                if self.error:
+                    raise self.error
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+
+
+@pytest.fixture
+def client(client):
+    db.session.add(Document(filename='lease.txt', content='The tenant pays the rent every month.',
+                            content_hash='lease', sentiment='neutral', user_id='1'))
+    db.session.commit()
+    return client
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def model(mocker):
+    model = StreamingModel()
+    mocker.patch('app.get_openai_client', return_value=model)
+    return model
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            events.append((fields.get('event', 'message'), json.loads(fields['data'])))
+    return events
+
+
+def stream(client):
+    return client.get('/document/summary/stream', query_string={'filename': 'lease.txt'})
+
+
+def pieces(response):
+    """The body as it is written, one decoded piece at a time."""
+    return (piece.decode('utf-8') for piece in response.response)
+
+
+def test_summary_is_relayed_as_it_is_generated_and_cached(client, model):
+    response = stream(client)
+    chunks = pieces(response)
+
+    assert response.mimetype == 'text/event-stream'
+    assert parse_events(next(chunks)) == [('start', {'filename': 'lease.txt', 'attached': False})]
+    assert parse_events(next(chunks)) == [('message', {'text': 'The tenant '})]  # before the model finishes
+    model.release.set()
+    events = parse_events(''.join(chunks))
+
+    assert [data['text'] for name, data in events if name == 'message'] == PIECES[1:]
+    assert events[-1] == ('done', {'filename': 'lease.txt', 'summary': ''.join(PIECES)})
+    assert client.post('/document/summary', json={'filename': 'lease.txt'}).json['summary'] == ''.join(PIECES)
+    assert model.calls == 1
+
+
+def test_concurrent_requests_attach_to_the_stream_in_flight(client, model):
+    first = stream(client)
+    first_chunks = pieces(first)
+    next(first_chunks)
+    next(first_chunks)
+
+    second = stream(client)
+    model.release.set()
+    first_events = parse_events(''.join(first_chunks))
+    second_events = parse_events(second.get_data(as_text=True))
+
+    assert second_events[0] == ('start', {'filename': 'lease.txt', 'attached': True})
+    assert second_events[-1] == first_events[-1] == ('done', {'filename': 'lease.txt', 'summary': ''.join(PIECES)})
+    assert model.calls == 1
+
+
+def test_cached_summary_streams_at_once(client, model):
+    model.release.set()
+    stream(client).get_data()
+
+    events = parse_events(stream(client).get_data(as_text=True))
+
+    assert events[1:] == [('message', {'text': ''.join(PIECES)}),
+                          ('done', {'filename': 'lease.txt', 'summary': ''.join(PIECES)})]
+    assert model.calls == 1
+
+
+def test_failed_generation_ends_with_an_error_and_is_not_cached(client, model):
+    model.error = RuntimeError('quota')
+    model.release.set()
+
+    events = parse_events(stream(client).get_data(as_text=True))
+
+    assert events[-1] == ('error', {'error': 'Failed to summarize the document'})
+    assert not summary_streams.in_flight((1, 'lease'))
+    assert llm_cache.stats()['memoryEntries'] == 0
+
+
+def test_heartbeats_keep_an_idle_stream_open(client, model, monkeypatch):
+    monkeypatch.setitem(app.config, 'SUMMARY_STREAM_HEARTBEAT_SECONDS', 0.01)
+    chunks = pieces(stream(client))
+    next(chunks)
+    next(chunks)
+
+    assert next(chunks) == ': keep-alive\n\n'
+    model.release.set()
+    assert parse_events(''.join(chunks))[-1][0] == 'done'
+
+
+def test_unknown_document(client):
+    assert client.get('/document/summary/stream', query_string={'filename': 'missing.txt'}).status_code == 404
+    assert client.get('/document/summary/stream').status_code == 400
@@ -0,0 +1,85 @@
+import io
+import os
+
+import pytest
+
+from app import app, db, run_pending_jobs
+from jobs import JOB_DONE, JOB_QUEUED
+from models import Document, IngestionJob, Keyword, Paragraph, Sentence
+
+TEXT = b'The invoice total is due in March.\n\nPayment goes to the Berlin office.'
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+@pytest.fixture
+def upload(client, mocker):
+    wake_up = mocker.patch('app.file_processing_queue.put')
+
+    def post(content, filename, user_id='1'):
+        data = {'file': (io.BytesIO(content), filename), 'userId': user_id}
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
+        assert response.status_code == 202
+        return response.json['jobs'][0]
+
+    post.wake_up = wake_up
+    return post
+
+
+def row_counts(document_id):
+    paragraphs = Paragraph.query.filter_by(document_id=document_id).count()
+    sentences = Sentence.query.join(Paragraph).filter(Paragraph.document_id == document_id).count()
+    keywords = Keyword.query.join(Sentence).join(Paragraph).filter(Paragraph.document_id == document_id).count()
+    return paragraphs, sentences, keywords
+
+
+def test_reupload_by_same_user_links_to_existing_document(client, upload):
+    first = upload(TEXT, 'invoice.txt')
+    run_pending_jobs()
+    document = db.session.get(IngestionJob, first['jobId']).document_id
+    upload.wake_up.reset_mock()
+    files_before = set(os.listdir(app.config['UPLOAD_FOLDER']))
+
+    again = upload(TEXT, 'invoice-copy.txt')
+
+    assert again['duplicate'] is True
+    assert again['documentId'] == document
+    upload.wake_up.assert_not_called()
+    assert set(os.listdir(app.config['UPLOAD_FOLDER'])) == files_before
+    assert Document.query.count() == 1
+    assert client.get(f"/api/jobs/{again['jobId']}").json['status'] == JOB_DONE
+
+
+def test_same_name_with_different_content_gets_a_unique_name(client, upload):
+    upload(TEXT, 'report.txt')
+    run_pending_jobs()
+
+    renamed = upload(b'Completely different text.', 'report.txt')
+    run_pending_jobs()
+
+    assert renamed['filename'] == 'report-2.txt'
+    assert {document.filename for document in Document.query} == {'report.txt', 'report-2.txt'}
+
+
+def test_identical_upload_by_another_user_copies_the_analysis(client, upload, mocker):
+    upload(TEXT, 'shared.txt', user_id='1')
+    run_pending_jobs()
+    original = Document.query.one()
+
+    ingest = mocker.patch('app.ingest_file')
+    copy_job = upload(TEXT, 'shared.txt', user_id='2')
+    assert db.session.get(IngestionJob, copy_job['jobId']).status == JOB_QUEUED
+    run_pending_jobs()
+
+    ingest.assert_not_called()
+    job = client.get(f"/api/jobs/{copy_job['jobId']}").json
+    assert job['status'] == JOB_DONE and job['duplicate'] is True
+    copy = db.session.get(Document, job['documentId'])
+    assert copy.user_id == '2' and copy.filename == 'shared-2.txt'
+    assert copy.content == original.content
+    assert (copy.sentiment, copy.polarity, copy.term_count) == (original.sentiment, original.polarity,
+                                                                original.term_count)
+    assert row_counts(copy.id) == row_counts(original.id)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import pytest
+
+import app as app_module
+from app import app, process_file
+from models import Document, Paragraph, Sentence, Keyword
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-api-key')
+
+
+def fake_analysis(paragraphs, timer=None):
+    for i, paragraph in enumerate(paragraphs):
+        first, second = paragraph.split(' ', 1)
+        yield paragraph, [(first, [f'alpha{i}', f'beta{i}']), (second, [f'gamma{i}'])]
+
+
+def test_bulk_insert_keeps_foreign_keys(client, mocker):
+    mocker.patch('ingestion.analyze_paragraphs', side_effect=fake_analysis)
+    mocker.patch.dict(app.config, {'INGEST_CHUNK_ROWS': 5})  # force several chunks
+    write_chunk = mocker.spy(app_module, 'write_paragraph_chunk')
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as tmp:
+        tmp.write('\n\n'.join(f'Paragraph{i}. Paragraph{i} second.' for i in range(7)))
+    response = process_file(tmp.name, 'bulk.txt', 1)
+    os.remove(tmp.name)
+
+    assert response[1] == 200
+    assert write_chunk.call_count > 2
+
+    document = Document.query.filter_by(filename='bulk.txt').one()
+    paragraphs = Paragraph.query.filter_by(document_id=document.id).order_by(Paragraph.id).all()
+    assert [p.content for p in paragraphs] == [f'Paragraph{i}. Paragraph{i} second.' for i in range(7)]
+    for i, paragraph in enumerate(paragraphs):
+        sentences = Sentence.query.filter_by(paragraph_id=paragraph.id).order_by(Sentence.id).all()
+        assert [s.content for s in sentences] == [f'Paragraph{i}.', f'Paragraph{i} second.']
+        assert sorted(k.word for k in sentences[0].keywords) == [f'alpha{i}', f'beta{i}']
+        assert [k.word for k in sentences[1].keywords] == [f'gamma{i}']
+    assert Keyword.query.count() == 21
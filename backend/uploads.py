@@ -0,0 +1,172 @@
+import hashlib
+import os
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm.exc import ObjectDeletedError
+
+from models import db, UploadSession, utcnow
+
+try:
+    import fcntl
+except ImportError:  # Windows: uploads are only exclusive between the threads of one process
+    fcntl = None
+
+
+class OffsetMismatch(ValueError):
+    """A chunk was sent for an offset other than where the upload left off."""
+
+    def __init__(self, expected):
+        super().__init__(f'Expected offset {expected}')
+        self.expected = expected
+
+
+class ChunkTooLarge(ValueError):
+    """A chunk carried more than the per-request limit."""
+
+
+class UploadGone(LookupError):
+    """The upload was completed or discarded while the request waited for it."""
+
+
+# Running sha256 of each upload, as (bytes hashed, hash object). Rebuilt from the partial file
+# when missing, e.g. after a restart or when another process took the previous chunk.
+_hashers = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def partial_path(folder, upload_id):
+    return os.path.join(folder, f'{upload_id}.part')
+
+
+def _lock(upload_id):
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _forget(upload_id):
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+    _hashers.pop(upload_id, None)
+
+
+@contextmanager
+def hold_upload(upload, folder):
+    """Hold ``upload`` against concurrent requests for it, refreshing it once held.
+
+    Requests for one upload may reach different threads or processes. Threads queue on a lock,
+    processes on an flock of the partial file. UploadGone if the upload was completed or
+    discarded in the meantime.
+    """
+    path = partial_path(folder, upload.id)
+    with _lock(upload.id):
+        try:
+            lock_file = open(path, 'rb') if fcntl is not None else None
+        except FileNotFoundError:
+            raise UploadGone(upload.id) from None
+        try:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                db.session.refresh(upload)
+            except ObjectDeletedError:
+                raise UploadGone(upload.id) from None
+            if not os.path.exists(path):
+                raise UploadGone(upload.id)  # moved away by the request that held it before
+            yield
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+
+def _hasher(upload, folder, block_size):
+    hashed, digest = _hashers.get(upload.id, (None, None))
+    if hashed == upload.received:
+        return digest
+    digest = hashlib.sha256()
+    with open(partial_path(folder, upload.id), 'rb') as partial:
+        remaining = upload.received
+        while remaining:
+            block = partial.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def create_upload(user_id, filename, size, folder, update_existing=False):
+    """Start a chunked upload of ``size`` bytes with an empty partial file. The caller commits."""
+    upload = UploadSession(id=secrets.token_urlsafe(24), user_id=user_id, filename=filename, size=size, received=0,
+                           update_existing=update_existing)
+    open(partial_path(folder, upload.id), 'wb').close()
+    db.session.add(upload)
+    return upload
+
+
+def write_chunk(upload, folder, offset, stream, block_size, max_bytes):
+    """Write the bytes of ``stream`` at ``offset`` straight to the partial file, hashing them on the way.
+
+    ``offset`` must be where the upload left off (OffsetMismatch otherwise), and the chunk may
+    neither run past the declared size (ValueError) nor carry more than ``max_bytes``
+    (ChunkTooLarge). Whatever arrived before an error or a dropped connection is kept and
+    committed, so the client resumes from ``upload.received``.
+    """
+    with hold_upload(upload, folder):
+        if offset != upload.received:
+            raise OffsetMismatch(upload.received)
+        digest = _hasher(upload, folder, block_size)
+        written = 0
+        try:
+            with open(partial_path(folder, upload.id), 'r+b') as partial:
+                partial.seek(offset)
+                partial.truncate()  # bytes past the offset are left over from an interrupted chunk
+                for block in iter(lambda: stream.read(block_size), b''):
+                    room = min(upload.size - offset, max_bytes) - written
+                    partial.write(block[:room])
+                    digest.update(block[:room])
+                    written += min(len(block), room)
+                    if len(block) > room:
+                        if upload.size - offset > max_bytes:
+                            raise ChunkTooLarge(f'Chunks are limited to {max_bytes} bytes')
+                        raise ValueError('Chunk runs past the declared upload size')
+        finally:
+            upload.received = offset + written
+            upload.updated_at = utcnow()
+            db.session.commit()
+            _hashers[upload.id] = (upload.received, digest)
+    return upload.received
+
+
+def upload_digest(upload, folder, block_size):
+    """sha256 hex digest of the bytes received so far; call it while holding the upload."""
+    return _hasher(upload, folder, block_size).hexdigest()
+
+
+def release_upload(upload):
+    """Drop the session once its partial file has been moved away. The caller commits."""
+    _forget(upload.id)
+    db.session.delete(upload)
+
+
+def discard_upload(upload, folder):
+    """Delete an unfinished upload and its partial file. The caller commits."""
+    try:
+        os.remove(partial_path(folder, upload.id))
+    except FileNotFoundError:
+        pass
+    release_upload(upload)
+
+
+def expire_uploads(folder, ttl_seconds):
+    """Discard uploads that received nothing for ``ttl_seconds``; returns how many."""
+    stale_before = utcnow() - timedelta(seconds=ttl_seconds)
+    stale = db.session.scalars(select(UploadSession).where(UploadSession.updated_at < stale_before)).all()
+    for upload in stale:
+        discard_upload(upload, folder)
+    db.session.commit()
+    return len(stale)
@@ -4,10 +4,12 @@ import DocumentSummary from '../DocumentSummary/DocumentSummary';
 import KeywordList from '../KeywordList/KeywordList';
 import KeywordArticles from '../Dashboard/KeywordArticles';
 import { Button, Input, Select, List, Typography, Divider } from 'antd';
+import { useUser } from '../Auth/UserContext';
 const { Option } = Select;
 
 
 const DocumentList = ({ documents }) => {
+  const { user } = useUser();
   const [selectedDoc, setSelectedDoc] = useState(null);
   const [summary, setSummary] = useState('');
   const [keywords, setKeywords] = useState([]);
@@ -17,20 +19,26 @@ const [filteredSentences, setFilteredSentences] = useState([]);
 const [filteredParagraphs, setFilteredParagraphs] = useState([]);
 
 
-  const fetchSummary = async (filename) => {
-    try {
-        console.log(filename)
-      const response = await axios.post('http://localhost:5000/document/summary', { filename });
-      setSummary(response.data.summary);
-      setSelectedDoc(filename);
-      // Clear previous keywords and errors
-      setKeywords([]);
-      setError('');
-    } catch (err) {
+  // The summary streams in as it is generated, so text shows up long before the whole completion is done
+  const fetchSummary = (filename) => {
+    setSummary('');
+    setSelectedDoc(filename);
+    // Clear previous keywords and errors
+    setKeywords([]);
+    setError('');
+    const source = new EventSource(
+      `http://localhost:5000/document/summary/stream?filename=${encodeURIComponent(filename)}`);
+    source.onmessage = (event) => setSummary((text) => text + JSON.parse(event.data).text);
+    source.addEventListener('done', (event) => {
+      source.close();
+      setSummary(JSON.parse(event.data).summary);
+    });
+    // Both the server's 'error' event and a dropped connection end up here
+    source.onerror = () => {
+      source.close();
       setSummary('Failed to fetch summary. ChatGPT quota reached');
-      setKeywords([]);
       alert('Failed to fetch summary. ChatGPT quota reached');
-    }
+    };
   };
 
   const fetchKeywords = async (filename) => {
@@ -51,7 +59,7 @@ const [filteredParagraphs, setFilteredParagraphs] = useState([]);
 
 const fetchFilteredBySentiment = async (sentiment) => {
   try {
-    const response = await axios.get(`http://localhost:5000/api/filter/sentiment/${sentiment}`);
+    const response = await axios.get(`http://localhost:5000/api/filter/sentiment/${sentiment}`, { params: { userId: user.sub } });
     setFilteredSentences(response.data.sentences);
     setFilteredParagraphs(response.data.paragraphs);
     // Resetting other states as necessary
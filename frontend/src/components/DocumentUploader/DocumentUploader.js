@@ -1,11 +1,68 @@
 import React, { useState } from 'react';
 import { useUser } from '../Auth/UserContext';
-import { Upload, Button, Spin, message } from 'antd';
+import { Upload, Button, Checkbox, Spin, message } from 'antd';
 import { UploadOutlined } from '@ant-design/icons';
 
+const API_URL = "http://127.0.0.1:5000";
+// Files above the server's 16MB request limit go through the resumable chunked upload API
+const LARGE_FILE_BYTES = 16 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
+const jsonOrError = async (response) => {
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || 'File upload failed');
+  }
+  return data;
+};
+
+// Send one file in chunks; after a failed chunk, ask the server where to resume
+const uploadInChunks = async (file, userId, update) => {
+  const started = await jsonOrError(await fetch(`${API_URL}/api/uploads`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size, userId, update }),
+  }));
+  let offset = started.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const chunk = await jsonOrError(await fetch(`${API_URL}/api/uploads/${started.uploadId}?offset=${offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(offset, offset + started.chunkSize),
+      }));
+      offset = chunk.offset;
+      failures = 0;
+    } catch (error) {
+      failures += 1;
+      if (failures > CHUNK_RETRIES) {
+        throw error;
+      }
+      const status = await jsonOrError(await fetch(`${API_URL}/api/uploads/${started.uploadId}`));
+      offset = status.offset;
+    }
+  }
+  return completeUpload(started.uploadId);
+};
+
+// The bytes are already on the server, so a full queue (429) only delays queueing them
+const completeUpload = async (uploadId) => {
+  for (let attempt = 0; ; attempt += 1) {
+    const response = await fetch(`${API_URL}/api/uploads/${uploadId}/complete`, { method: 'POST' });
+    if (response.status !== 429 || attempt >= CHUNK_RETRIES) {
+      return jsonOrError(response);
+    }
+    const { retryAfter } = await response.json();
+    await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+  }
+};
+
 const DocumentUploader = ({ onNewDocument }) => {
   const [fileList, setFileList] = useState([]);
   const [uploading, setUploading] = useState(false);
+  // Re-uploading a file under the same name replaces that document; only changed paragraphs are re-analyzed
+  const [replaceExisting, setReplaceExisting] = useState(false);
   const { user } = useUser();
 
   const beforeUpload = (file) => {
@@ -25,14 +82,27 @@ const DocumentUploader = ({ onNewDocument }) => {
     }
 
     setUploading(true);
+    const smallFiles = fileList.filter((file) => file.size <= LARGE_FILE_BYTES);
+    const largeFiles = fileList.filter((file) => file.size > LARGE_FILE_BYTES);
     const formData = new FormData();
-    fileList.forEach((file) => {
+    smallFiles.forEach((file) => {
       formData.append('file', file);
     });
     formData.append('userId', user.sub);
+    formData.append('update', replaceExisting);
 
     try {
-      const response = await fetch("http://127.0.0.1:5000/upload", {
+      for (const file of largeFiles) {
+        onNewDocument(await uploadInChunks(file, user.sub, replaceExisting));
+      }
+      if (smallFiles.length === 0) {
+        message.success("Files uploaded successfully.");
+        setFileList([]);
+        return;
+      }
+      // userId and the file count up front let the server turn a full queue away before the body is read
+      const query = new URLSearchParams({ userId: user.sub, files: smallFiles.length });
+      const response = await fetch(`${API_URL}/upload?${query}`, {
         method: 'POST',
         body: formData,
       });
@@ -47,7 +117,12 @@ const DocumentUploader = ({ onNewDocument }) => {
         setFileList([]); // Clear the list after upload
       } else {
         const errorData = await response.json();
-        message.error(errorData.error || 'File upload failed');
+        if (response.status === 429) {
+          // From the body: a cross-origin response only exposes Retry-After if CORS lists it
+          message.warning(`The processing queue is full. Try again in ${errorData.retryAfter} seconds.`);
+        } else {
+          message.error(errorData.error || 'File upload failed');
+        }
       }
     } catch (error) {
       console.error('Error uploading files:', error);
@@ -67,6 +142,13 @@ const DocumentUploader = ({ onNewDocument }) => {
       >
         <Button icon={<UploadOutlined />}>Select Files</Button>
       </Upload>
+      <Checkbox
+        checked={replaceExisting}
+        onChange={(event) => setReplaceExisting(event.target.checked)}
+        style={{ marginTop: 16 }}
+      >
+        Replace documents with the same name
+      </Checkbox>
       <Button
         type="primary"
         onClick={handleUpload}